@@ -1,11 +1,12 @@
 from .connection import GibsonConnection, create_connection
 from .errors import (GibsonError, ProtocolError, ReplyError,
-                     ExpectedANumber, MemoryLimitError, KeyLockedError)
+                     ExpectedANumber, MemoryLimitError, KeyLockedError,
+                     OverloadError)
 from .pool import GibsonPool, create_pool, create_gibson
 
 __version__ = '0.1.3'
 
 # make pyflakes happy
 (GibsonConnection, create_connection, GibsonError, ProtocolError, ReplyError,
-    ExpectedANumber, MemoryLimitError, KeyLockedError, GibsonPool,
-    create_pool, create_gibson)
+    ExpectedANumber, MemoryLimitError, KeyLockedError, OverloadError,
+    GibsonPool, create_pool, create_gibson)
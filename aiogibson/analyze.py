@@ -0,0 +1,264 @@
+"""Keyspace size/TTL analyzer for capacity planning.
+
+Keys are streamed page by page with ``Gibson.iter_keys`` and grouped into
+tree of prefixes by ``separator``, up to ``depth`` levels. Key counts are
+exact, value sizes, TTLs and last access times are taken from random sample
+of every prefix with pipelined ``meta`` commands, so amount of work done by
+the server is bounded by ``page_size``, ``batch_size`` and ``pause``:
+
+.. code:: python
+
+    gibson = await create_gibson('/tmp/gibson.sock')
+    report = await analyze(gibson, b'user:', depth=2)
+    for node in report.walk():
+        print(node.prefix, node.keys, node.approx_bytes)
+
+or from command line::
+
+    $ python -m aiogibson.analyze /tmp/gibson.sock --depth 2
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from .commands import create_gibson
+from .connection import parse_address
+
+__all__ = ['analyze', 'format_report', 'PrefixReport']
+
+# upper bounds (seconds) of TTL histogram buckets, -1 is infinite TTL
+TTL_BUCKETS = (-1, 60, 3600, 86400, None)
+
+
+def _bucket_name(bound):
+    if bound == -1:
+        return 'none'
+    if bound is None:
+        return 'longer'
+    return '<{}s'.format(bound)
+
+
+class PrefixReport:
+    """Statistics of keys sharing the prefix.
+
+    Counters of the node include all keys of its subtree.
+    """
+
+    __slots__ = ('prefix', 'keys', 'key_bytes', 'children', '_sample',
+                 'sampled', 'value_bytes', 'idle', 'ttl_histogram')
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.keys = 0
+        self.key_bytes = 0
+        self.children = {}
+        self._sample = []
+        self.sampled = 0
+        self.value_bytes = 0
+        self.idle = 0
+        self.ttl_histogram = {_bucket_name(b): 0 for b in TTL_BUCKETS}
+
+    def __repr__(self):
+        return '<PrefixReport {!r} keys={}>'.format(self.prefix, self.keys)
+
+    @property
+    def avg_value_size(self):
+        """Average value size of sampled keys."""
+        return self.value_bytes / self.sampled if self.sampled else 0
+
+    @property
+    def approx_bytes(self):
+        """Approximate memory used by keys and values of the prefix."""
+        return int(self.key_bytes + self.avg_value_size * self.keys)
+
+    @property
+    def avg_idle(self):
+        """Average seconds since last access of sampled keys, bigger values
+        mean colder data."""
+        return self.idle / self.sampled if self.sampled else 0
+
+    def walk(self):
+        """Iterate over the node and all its descendants depth first."""
+        yield self
+        for prefix in sorted(self.children):
+            yield from self.children[prefix].walk()
+
+    def as_dict(self):
+        """Report tree as ``dict`` suitable for json serialization."""
+        return {
+            'prefix': self.prefix.decode('utf-8', 'replace'),
+            'keys': self.keys,
+            'approx_bytes': self.approx_bytes,
+            'sampled': self.sampled,
+            'avg_value_size': self.avg_value_size,
+            'avg_idle': self.avg_idle,
+            'ttl_histogram': dict(self.ttl_histogram),
+            'children': [self.children[p].as_dict()
+                         for p in sorted(self.children)],
+        }
+
+    def _offer(self, key, size):
+        # reservoir sampling keeps uniform sample of bounded size
+        self.keys += 1
+        self.key_bytes += len(key)
+        if len(self._sample) < size:
+            self._sample.append(key)
+        else:
+            i = random.randrange(self.keys)
+            if i < size:
+                self._sample[i] = key
+
+    def _account(self, meta, now):
+        self.sampled += 1
+        self.value_bytes += meta.size or 0
+        self.idle += max(now - (meta.access or now), 0)
+        ttl = -1 if meta.ttl is None else meta.ttl
+        for bound in TTL_BUCKETS:
+            if bound is None or ttl <= bound:
+                self.ttl_histogram[_bucket_name(bound)] += 1
+                break
+
+
+async def analyze(gibson, prefix=b'', *, depth=1, separator=b':', sample=100,
+                  page_size=1000, batch_size=100, pause=0):
+    """Analyze keys with given prefix.
+
+    :param gibson: ``Gibson`` instance.
+    :param prefix: ``bytes`` prefix of analyzed keys.
+    :param depth: ``int`` number of ``separator`` delimited key segments
+        used to group keys.
+    :param separator: ``bytes`` separator of key segments.
+    :param sample: ``int`` number of keys sampled per prefix.
+    :param page_size: ``int`` maximum number of keys fetched at once.
+    :param batch_size: ``int`` number of sampled keys whose meta fields are
+        fetched in one round trip.
+    :param pause: ``float`` seconds to sleep between round trips.
+    :return: ``PrefixReport`` root of prefix tree
+    """
+    root = PrefixReport(prefix)
+    it = gibson.iter_keys(prefix, page_size=page_size)
+    while True:
+        page = await it.next_page()
+        if page is None:
+            break
+        for key in page:
+            node = root
+            node._offer(key, sample)
+            for path in _prefixes(key, len(prefix), separator, depth):
+                child = node.children.get(path)
+                if child is None:
+                    child = node.children[path] = PrefixReport(path)
+                child._offer(key, sample)
+                node = child
+        if pause:
+            await asyncio.sleep(pause)
+
+    keys = sorted({key for node in root.walk() for key in node._sample})
+    metas = {}
+    for i in range(0, len(keys), batch_size):
+        batch = keys[i:i + batch_size]
+        records = await gibson.meta_many(
+            batch, fields=('size', 'ttl', 'access'))
+        metas.update(zip(batch, records))
+        if pause:
+            await asyncio.sleep(pause)
+
+    now = time.time()
+    for node in root.walk():
+        for key in node._sample:
+            meta = metas.get(key)
+            # key could expire meanwhile
+            if meta is not None:
+                node._account(meta, now)
+        node._sample = []
+    return root
+
+
+def _prefixes(key, start, separator, depth):
+    # b'user:42:name' -> b'user:', b'user:42:' (for depth 2)
+    for _ in range(depth):
+        pos = key.find(separator, start)
+        if pos == -1:
+            return
+        start = pos + len(separator)
+        yield key[:start]
+
+
+def _format_size(size):
+    for unit in ('B', 'K', 'M', 'G'):
+        if size < 1024:
+            return '{:.1f}{}'.format(size, unit)
+        size /= 1024
+    return '{:.1f}T'.format(size)
+
+
+def format_report(report, out=None):
+    """Print report tree as indented table.
+
+    :param report: ``PrefixReport`` returned by ``analyze``.
+    :param out: file object to write to, ``sys.stdout`` by default.
+    """
+    out = out or sys.stdout
+    buckets = [_bucket_name(b) for b in TTL_BUCKETS]
+    out.write('{:<40} {:>10} {:>10} {:>10}  ttl {}\n'.format(
+        'prefix', 'keys', 'bytes', 'idle', '/'.join(buckets)))
+    level = len(report.prefix)
+
+    def write(node, indent):
+        prefix = node.prefix[level:] or node.prefix or b'*'
+        out.write('{:<40} {:>10} {:>10} {:>9.0f}s  {}\n'.format(
+            ' ' * indent + prefix.decode('utf-8', 'replace'),
+            node.keys, _format_size(node.approx_bytes), node.avg_idle,
+            '/'.join(str(node.ttl_histogram[b]) for b in buckets)))
+        for child in sorted(node.children):
+            write(node.children[child], indent + 2)
+    write(report, 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m aiogibson.analyze',
+        description='Report memory usage and TTLs of gibson key prefixes.')
+    parser.add_argument('address', nargs='?', default='/tmp/gibson.sock',
+                        help='unix socket path or host:port')
+    parser.add_argument('--prefix', default='',
+                        help='analyze only keys with given prefix')
+    parser.add_argument('--depth', type=int, default=1,
+                        help='number of key segments in report tree')
+    parser.add_argument('--separator', default=':',
+                        help='key segments separator')
+    parser.add_argument('--sample', type=int, default=100,
+                        help='number of sampled keys per prefix')
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--pause', type=float, default=0,
+                        help='seconds to sleep between round trips')
+    parser.add_argument('--json', action='store_true',
+                        help='print report as json')
+    args = parser.parse_args(argv)
+
+    async def go():
+        gibson = await create_gibson(parse_address(args.address))
+        try:
+            return await analyze(
+                gibson, args.prefix.encode('utf-8'), depth=args.depth,
+                separator=args.separator.encode('utf-8'),
+                sample=args.sample, page_size=args.page_size,
+                batch_size=args.batch_size, pause=args.pause)
+        finally:
+            gibson.close()
+            await gibson.wait_closed()
+
+    report = asyncio.run(go())
+    if args.json:
+        json.dump(report.as_dict(), sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        format_report(report)
+
+
+if __name__ == '__main__':
+    main()
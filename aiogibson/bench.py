@@ -0,0 +1,389 @@
+"""Benchmarks and load generator.
+
+Micro benchmarks measure throughput of ``encode_command`` and ``Reader``
+without any I/O, workloads run ``get``, ``set`` or ``mget`` commands against
+gibson server over pool of connections, every connection keeps up to
+``pipeline`` commands in flight:
+
+.. code:: python
+
+    result = await run_workload('/tmp/gibson.sock', 'get',
+                                connections=4, pipeline=16,
+                                requests=100000)
+    print(result['throughput'], result['latency']['p99'])
+
+or from command line::
+
+    $ python -m aiogibson.bench /tmp/gibson.sock --micro \\
+        --workload get,set,mget --connections 4 --pipeline 16 --json
+
+With ``--in-process`` workloads run against ``aiogibson.server`` started in
+background thread on temporary unix socket instead of real server.
+
+Keys are drawn from zipfian distribution over ``keys`` distinct keys, sizes of
+written values are drawn from weighted mix, for instance ``64:0.9,4096:0.1``.
+Latency percentiles are taken from ``LatencyHistogram`` tracer of the pool,
+so they include time commands spent queued behind other pipelined commands.
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from . import consts
+from .connection import parse_address
+from .parser import Reader, encode_command, encode_reply
+from .pool import create_pool
+from .server import create_server
+from .tracing import LatencyHistogram
+
+__all__ = ['ZipfGenerator', 'parse_value_sizes', 'bench_encode',
+           'bench_parse', 'run_workload', 'InProcessServer']
+
+WORKLOADS = ('get', 'set', 'mget')
+PERCENTILES = (50, 90, 99, 99.9)
+# keys of one mget prefix: bench:0000012 matches bench:00000120-129
+MGET_GROUP = 10
+
+
+class ZipfGenerator:
+    """Zipfian distributed integers in range ``0..n-1``, ``0`` is the most
+    popular one.
+
+    :param n: ``int`` number of distinct values.
+    :param s: ``float`` skew, ``0`` gives uniform distribution.
+    :param rng: ``random.Random`` instance.
+    """
+
+    def __init__(self, n, s=0.99, rng=None):
+        if n <= 0:
+            raise ValueError('n must be positive')
+        self._rng = rng or random.Random()
+        total = 0.0
+        self._cdf = []
+        for i in range(1, n + 1):
+            total += 1.0 / i ** s
+            self._cdf.append(total)
+        self._total = total
+
+    def __call__(self):
+        point = self._rng.random() * self._total
+        return min(bisect.bisect_left(self._cdf, point), len(self._cdf) - 1)
+
+
+def parse_value_sizes(spec):
+    """Parse value size mix like ``64:0.9,4096:0.1``, weight may be omitted.
+
+    :return: ``list`` of (size, weight) pairs
+    """
+    mix = []
+    for item in spec.split(','):
+        size, _, weight = item.strip().partition(':')
+        mix.append((int(size), float(weight) if weight else 1.0))
+    if not mix or any(size < 0 or w <= 0 for size, w in mix):
+        raise ValueError('Invalid value size mix {!r}'.format(spec))
+    return mix
+
+
+def _percentiles(histogram, command):
+    latency = {'p{:g}'.format(q): histogram.percentile(command, q)
+               for q in PERCENTILES}
+    latency['max'] = histogram.percentile(command, 100)
+    return latency
+
+
+def bench_encode(number=100000, value_size=64):
+    """Measure ``encode_command`` throughput.
+
+    :param number: ``int`` number of encoded commands.
+    :param value_size: ``int`` size of value of encoded ``set`` command.
+    :return: ``dict`` with ``ops`` per second and ``bytes`` per second.
+    """
+    key, value = b'bench:00000001', b'x' * value_size
+    size = len(encode_command(b'set', 3600, key, value))
+    started = time.perf_counter()
+    for _ in range(number):
+        encode_command(b'set', 3600, key, value)
+    elapsed = time.perf_counter() - started
+    return {'name': 'encode', 'number': number, 'elapsed': elapsed,
+            'ops': number / elapsed, 'bytes': number * size / elapsed}
+
+
+def bench_parse(number=100000, value_size=64, pairs=0, chunk_size=65536):
+    """Measure ``Reader`` throughput.
+
+    :param number: ``int`` number of parsed replies.
+    :param value_size: ``int`` size of every value in replies.
+    :param pairs: ``int`` number of key/value pairs per ``mget`` style
+        reply, plain value replies are parsed if ``0``.
+    :param chunk_size: ``int`` size of chunks fed to reader.
+    :return: ``dict`` with ``ops`` per second and ``bytes`` per second.
+    """
+    value = b'x' * value_size
+    if pairs:
+        reply = encode_reply(consts.REPL_KVAL, [
+            ('bench:{:08d}'.format(i).encode('ascii'), value)
+            for i in range(pairs)])
+    else:
+        reply = encode_reply(consts.REPL_VAL, value)
+    stream = reply * number
+    reader = Reader()
+    parsed = 0
+    started = time.perf_counter()
+    for offset in range(0, len(stream), chunk_size):
+        reader.feed(stream[offset:offset + chunk_size])
+        while reader.gets() is not False:
+            parsed += 1
+    elapsed = time.perf_counter() - started
+    assert parsed == number, (parsed, number)
+    return {'name': 'parse_kv' if pairs else 'parse', 'number': number,
+            'elapsed': elapsed, 'ops': number / elapsed,
+            'bytes': len(stream) / elapsed}
+
+
+async def run_workload(address, workload='get', *, connections=10, pipeline=1,
+                       requests=100000, keys=10000, zipf=0.99,
+                       value_sizes=((64, 1.0),), prefix=b'bench:', seed=None):
+    """Run ``get``, ``set`` or ``mget`` workload against gibson server.
+
+    Keys are written before ``get`` and ``mget`` workloads, but are not
+    removed afterwards.
+
+    :param address: unix socket path or (host, port) tuple.
+    :param workload: ``str`` one of ``get``, ``set`` or ``mget``.
+    :param connections: ``int`` number of connections.
+    :param pipeline: ``int`` number of commands in flight per connection.
+    :param requests: ``int`` total number of commands.
+    :param keys: ``int`` number of distinct keys.
+    :param zipf: ``float`` skew of key distribution.
+    :param value_sizes: sequence of (size, weight) pairs of written values.
+    :param prefix: ``bytes`` prefix of benchmark keys.
+    :param seed: seed of random generator.
+    :return: ``dict`` with ``throughput`` in commands per second and
+        ``latency`` percentiles in seconds.
+    """
+    if workload not in WORKLOADS:
+        raise ValueError('Unknown workload {!r}'.format(workload))
+    rng = random.Random(seed)
+    sizes, weights = zip(*value_sizes)
+    cum_weights = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cum_weights.append(total)
+    values = {size: b'x' * size for size in sizes}
+    key_names = [prefix + '{:08d}'.format(i).encode('ascii')
+                 for i in range(keys)]
+    next_key = ZipfGenerator(keys, zipf, rng)
+
+    def next_value():
+        point = rng.random() * total
+        return values[sizes[bisect.bisect_left(cum_weights, point)]]
+
+    histogram = LatencyHistogram()
+    pool = await create_pool(address, minsize=connections,
+                             maxsize=connections, tracer=histogram)
+    try:
+        if workload != 'set':
+            async with pool.acquire() as gibson:
+                for i in range(0, keys, 1000):
+                    await asyncio.gather(
+                        *[gibson.set(key, next_value())
+                          for key in key_names[i:i + 1000]])
+            histogram.reset()
+
+        def command(gibson):
+            key = key_names[next_key()]
+            if workload == 'get':
+                return gibson.get(key)
+            elif workload == 'set':
+                return gibson.set(key, next_value())
+            return gibson.mget(key[:-1])
+
+        remaining = requests
+
+        async def worker():
+            nonlocal remaining
+            async with pool.acquire() as gibson:
+                while remaining > 0:
+                    batch = min(pipeline, remaining)
+                    remaining -= batch
+                    await asyncio.gather(
+                        *[command(gibson) for _ in range(batch)])
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(connections)])
+        elapsed = time.perf_counter() - started
+    finally:
+        await pool.clear()
+
+    command_name = workload.encode('ascii')
+    return {'name': workload, 'connections': connections,
+            'pipeline': pipeline, 'requests': requests, 'keys': keys,
+            'zipf': zipf, 'elapsed': elapsed,
+            'throughput': requests / elapsed,
+            'latency': _percentiles(histogram, command_name)}
+
+
+def _format_result(result):
+    if 'latency' not in result:
+        return '{:<10} {:>12.0f} ops/s {:>10.1f} MB/s'.format(
+            result['name'], result['ops'], result['bytes'] / 2 ** 20)
+    latency = result['latency']
+    return ('{:<10} {:>12.0f} ops/s  ' +
+            '  '.join('{}={:.3f}ms'.format(name, latency[name] * 1000)
+                      for name in sorted(latency, key=_latency_order)))\
+        .format(result['name'], result['throughput'])
+
+
+def _latency_order(name):
+    return float('inf') if name == 'max' else float(name[1:])
+
+
+class InProcessServer:
+    """``aiogibson.server`` running in background thread with its own event
+    loop, listening on temporary unix socket:
+
+    .. code:: python
+
+        with InProcessServer() as address:
+            result = asyncio.run(run_workload(address, 'get'))
+    """
+
+    def __init__(self):
+        self.address = None
+        self._loop = None
+        self._thread = None
+        self._server = None
+        self._tmpdir = None
+
+    def start(self):
+        """Start server, return its address once it accepts connections."""
+        self._tmpdir = tempfile.mkdtemp()
+        self.address = os.path.join(self._tmpdir, 'gibson.sock')
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+        errors = []
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._server = self._loop.run_until_complete(
+                    create_server(self.address))
+            except BaseException as exc:
+                errors.append(exc)
+                return
+            finally:
+                started.set()
+            self._loop.run_forever()
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            self.stop()
+            raise errors[0]
+        return self.address
+
+    def stop(self):
+        """Stop server and remove its socket."""
+        if self._thread is not None:
+            if self._thread.is_alive():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._thread = None
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m aiogibson.bench',
+        description='Benchmark aiogibson and gibson server.')
+    parser.add_argument('address', nargs='?', default='/tmp/gibson.sock',
+                        help='unix socket path or host:port')
+    parser.add_argument('--in-process', action='store_true',
+                        help='run workloads against aiogibson.server started '
+                             'in background thread, address is ignored')
+    parser.add_argument('--micro', action='store_true',
+                        help='run parser and encoder micro benchmarks')
+    parser.add_argument('--workload', default='',
+                        help='comma separated workloads: get, set, mget')
+    parser.add_argument('--connections', type=int, default=10)
+    parser.add_argument('--pipeline', type=int, default=1,
+                        help='commands in flight per connection')
+    parser.add_argument('--requests', type=int, default=100000)
+    parser.add_argument('--keys', type=int, default=10000,
+                        help='number of distinct keys')
+    parser.add_argument('--zipf', type=float, default=0.99,
+                        help='skew of key distribution, 0 is uniform')
+    parser.add_argument('--value-sizes', default='64',
+                        help='value size mix, for instance 64:0.9,4096:0.1')
+    parser.add_argument('--prefix', default='bench:',
+                        help='prefix of benchmark keys')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true',
+                        help='print results as json lines')
+    args = parser.parse_args(argv)
+    workloads = [w for w in args.workload.split(',') if w]
+    for workload in workloads:
+        if workload not in WORKLOADS:
+            parser.error('unknown workload {!r}'.format(workload))
+    try:
+        value_sizes = parse_value_sizes(args.value_sizes)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if not args.micro and not workloads:
+        parser.error('nothing to run, use --micro and/or --workload')
+
+    def report(result):
+        if args.json:
+            sys.stdout.write(json.dumps(result, sort_keys=True) + '\n')
+        else:
+            sys.stdout.write(_format_result(result) + '\n')
+        sys.stdout.flush()
+
+    if args.micro:
+        size = value_sizes[0][0]
+        report(bench_encode(value_size=size))
+        report(bench_parse(value_size=size))
+        report(bench_parse(number=10000, value_size=size, pairs=MGET_GROUP))
+
+    if not workloads:
+        return
+    server = InProcessServer()
+    if args.in_process:
+        address = server.start()
+    else:
+        address = parse_address(args.address)
+    try:
+        for workload in workloads:
+            report(asyncio.run(run_workload(
+                address, workload,
+                connections=args.connections, pipeline=args.pipeline,
+                requests=args.requests, keys=args.keys, zipf=args.zipf,
+                value_sizes=value_sizes, prefix=args.prefix.encode('utf-8'),
+                seed=args.seed)))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,701 @@
+"""Blocking client for code running without event loop.
+
+``GibsonClient`` talks to gibson server over plain socket using the same
+``Reader`` and ``encode_command`` as asynchronous connection and has the same
+methods as ``Gibson``, they just return replies instead of futures:
+
+.. code:: python
+
+    from aiogibson.blocking import create_client
+
+    with create_client('/tmp/gibson.sock', timeout=1.0) as gibson:
+        gibson.set(b'foo', b'bar')
+        value = gibson.get(b'foo')
+
+Commands queued in ``Batch`` are sent in single write and their replies are
+read back in one go:
+
+.. code:: python
+
+    batch = gibson.batch()
+    for key in keys:
+        batch.get(key)
+    values = batch.execute()
+
+``ClientPool`` shares connections between threads, every command acquires
+free connection for its round trip only:
+
+.. code:: python
+
+    pool = ClientPool('/tmp/gibson.sock', maxsize=8)
+    pool.set(b'foo', b'bar')
+    with pool.acquire() as gibson:
+        values = gibson.batch().get(b'foo').get(b'bar').execute()
+    pool.close()
+"""
+import socket
+import threading
+from collections import deque
+
+from . import consts
+from .commands import (Gibson, META_FIELDS, CHUNK_SIZE, _meta_names,
+                       _meta_records, _split_chunks, _join_chunks,
+                       _chunk_prefix, _chunk_key, _parse_manifest,
+                       _manifest_keys)
+from .errors import GibsonError, ProtocolError
+from .parser import Reader, encode_command
+from .scan import PrefixIterator
+
+__all__ = ['create_client', 'BlockingConnection', 'GibsonClient', 'Batch',
+           'ClientPool', 'BATCH_COMMANDS']
+
+MAX_CHUNK_SIZE = 65536
+_NOTSET = object()
+
+# commands of ``Gibson`` sent as single gibson command, so they can be
+# queued in ``Batch``
+BATCH_COMMANDS = frozenset([
+    'get', 'set', 'delete', 'ttl', 'inc', 'dec', 'lock', 'unlock', 'keys',
+    'stats', 'ping', 'meta_size', 'meta_encoding', 'meta_access',
+    'meta_created', 'meta_ttl', 'meta_left', 'meta_lock', 'mset', 'mget',
+    'mttl', 'minc', 'mdec', 'mlock', 'munlock', 'mdelete', 'count'])
+
+
+def create_client(address, *, encoding=None, timeout=None, tracer=None):
+    """Create blocking high-level Gibson interface.
+
+    :param address: ``str`` for unix socket path, or ``tuple``
+        for (host, port) tcp connection.
+    :param encoding: this argument can be used to decode byte-replies to
+        strings. By default no decoding is done.
+    :param timeout: ``float`` seconds to wait for connect and for every
+        socket operation, ``None`` waits forever.
+    :param tracer: ``aiogibson.tracing.Tracer`` notified about every
+        command sent and reply received.
+    :return: ``GibsonClient`` instance
+    """
+    conn = BlockingConnection.connect(address, encoding=encoding,
+                                      timeout=timeout, tracer=tracer)
+    return GibsonClient(conn)
+
+
+class BlockingConnection:
+    """Gibson connection over blocking socket, not thread safe.
+
+    Connection is closed on any socket error, timeout or protocol error,
+    since position in reply stream is unknown afterwards.
+    """
+
+    __slots__ = ('_sock', '_parser', '_address', '_encoding', '_tracer',
+                 '_closed')
+
+    def __init__(self, sock, address, *, encoding=None, tracer=None):
+        self._sock = sock
+        self._parser = Reader()
+        self._address = address
+        self._encoding = encoding
+        self._tracer = tracer
+        self._closed = False
+
+    @classmethod
+    def connect(cls, address, *, encoding=None, timeout=None, tracer=None):
+        """Open connection to Gibson server specified by address argument.
+
+        Arguments are the same as for ``create_client``.
+        """
+        assert isinstance(address, (tuple, list, str)), "tuple or str expected"
+
+        if isinstance(address, (list, tuple)):
+            sock = socket.create_connection(tuple(address), timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            try:
+                sock.connect(address)
+            except OSError:
+                sock.close()
+                raise
+        return cls(sock, address, encoding=encoding, tracer=tracer)
+
+    def __repr__(self):
+        return '<BlockingConnection {}>'.format(self._address)
+
+    @property
+    def closed(self):
+        """True if connection is closed."""
+        return self._closed
+
+    @property
+    def encoding(self):
+        """Current set codec or None."""
+        return self._encoding
+
+    def close(self):
+        """Close connection."""
+        if not self._closed:
+            self._closed = True
+            self._sock.close()
+
+    def execute(self, command, *args, encoding=_NOTSET):
+        """Executes raw gibson command and waits for its reply.
+
+        :param command: ``str`` or ``bytes`` gibson command.
+        :param args: tuple of arguments required for gibson command.
+        :param encoding: ``str`` default encoding for unpacked data.
+
+        :raises TypeError: if any of args can not be encoded as bytes.
+        :raises GibsonError: if server replied with error.
+        :raises ProtocolError: when response can not be decoded meaning
+            connection is broken.
+        """
+        result, = self.execute_many([(command, args)], encoding=encoding)
+        return result
+
+    def execute_many(self, commands, *, encoding=_NOTSET,
+                     raise_on_error=True):
+        """Sends several commands in single write and reads their replies.
+
+        :param commands: sequence of (command, args) pairs.
+        :param encoding: ``str`` default encoding for unpacked data.
+        :param raise_on_error: ``bool`` raise first error reply once all
+            replies are read, otherwise errors are returned in place of
+            replies.
+        :return: ``list`` of replies.
+        """
+        assert not self._closed, "Connection closed or corrupted"
+        if encoding is _NOTSET:
+            encoding = self._encoding
+        encoded = []
+        spans = []
+        tracer = self._tracer
+        for command, args in commands:
+            if command is None:
+                raise TypeError("command must not be None")
+            if None in args:
+                raise TypeError("args must not contain None")
+            command = command.strip()
+            data = encode_command(command, *args)
+            if tracer is not None:
+                spans.append(tracer.on_send(consts.command_map[command],
+                                            data, len(encoded)))
+            encoded.append(data)
+
+        results = []
+        try:
+            self._sock.sendall(b''.join(encoded))
+            for span in spans or encoded:
+                obj = self._read_reply()
+                if tracer is not None:
+                    tracer.on_reply(span, obj, self._parser.last_reply_size)
+                results.append(obj)
+        except BaseException:
+            # rest of replies would be read by the next command
+            self.close()
+            raise
+
+        error = None
+        for i, obj in enumerate(results):
+            if encoding is not None and isinstance(obj, bytes):
+                try:
+                    obj = results[i] = obj.decode(encoding)
+                except Exception as exc:
+                    obj = results[i] = exc
+            if error is None and isinstance(obj, Exception):
+                error = obj
+        if error is not None and raise_on_error:
+            raise error
+        return results
+
+    def _read_reply(self):
+        parser = self._parser
+        while True:
+            obj = parser.gets()
+            if obj is not False:
+                return obj
+            data = self._sock.recv(MAX_CHUNK_SIZE)
+            if not data:
+                raise ProtocolError('Connection closed by server')
+            parser.feed(data)
+
+
+class GibsonClient(Gibson):
+    """Blocking high-level Gibson interface, not thread safe, use
+    ``ClientPool`` to share connections between threads.
+
+    Commands are the same as of ``Gibson``, but return replies.
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return '<GibsonClient {!r}>'.format(self._conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def _convert(self, result, type_):
+        return type_(result)
+
+    def wait_closed(self):
+        """Connection is closed immediately, nothing to wait for."""
+
+    def batch(self):
+        """Create ``Batch`` of commands sent over this connection."""
+        return Batch(self._conn)
+
+    def meta(self, key, fields=META_FIELDS):
+        """Fetch several meta fields of the item in one round trip.
+
+        :param key: ``bytes``, key of interest.
+        :param fields: sequence of field names: ``size``, ``encoding``,
+            ``access``, ``created``, ``ttl``, ``left``, ``lock``.
+        :return: ``KeyMeta`` or ``None`` if key does not exist.
+        :raises ValueError: if unknown field requested
+        """
+        return self.meta_many([key], fields)[0]
+
+    def meta_many(self, keys, fields=META_FIELDS):
+        """Fetch meta fields of many items in single round trip.
+
+        :param keys: sequence of ``bytes`` keys.
+        :param fields: sequence of field names: ``size``, ``encoding``,
+            ``access``, ``created``, ``ttl``, ``left``, ``lock``.
+        :return: ``list`` of ``KeyMeta``, ``None`` for missing keys.
+        :raises ValueError: if unknown field requested
+        """
+        fields = tuple(fields)
+        names = _meta_names(fields)
+        values = self._conn.execute_many(
+            [(b'meta', (key, name)) for key in keys for name in names])
+        return _meta_records(fields, values)
+
+    def end(self):
+        """Disconnects from the client from gibson instance."""
+        res = self._conn.execute(b'end')
+        self._conn.close()
+        return res
+
+    def iter_prefix(self, prefix, page_size=1000, max_bytes=None):
+        """Iterator over key/value pairs with given prefix, see
+        ``Gibson.iter_prefix``.
+
+        :return: iterator of (key, value) pairs.
+        """
+        return _PrefixIterator(self, prefix, page_size=page_size,
+                               max_bytes=max_bytes)
+
+    def iter_keys(self, prefix, page_size=1000):
+        """Iterator over keys with given prefix.
+
+        :return: iterator of keys.
+        """
+        return _PrefixIterator(self, prefix, page_size=page_size,
+                               keys_only=True)
+
+    def set_chunked(self, key, value, expire=0, chunk_size=CHUNK_SIZE):
+        """Set value which may exceed server item size limit, see
+        ``Gibson.set_chunked``.
+
+        :return: ``int`` number of written chunks.
+        :raises TypeError: if expire argument is not ``int``
+        """
+        if not isinstance(expire, int):
+            raise TypeError('expire must be int')
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be positive')
+        prefix, chunks, manifest = _split_chunks(key, value, chunk_size)
+        count = len(chunks)
+        commands = [(b'get', (prefix,))]
+        commands.extend((b'set', (expire, chunk_key, chunk))
+                        for chunk_key, chunk in chunks)
+        commands.append((b'set', (expire, prefix, manifest)))
+        old = self._conn.execute_many(commands, encoding=None)[0]
+
+        # drop tail of previous, longer, value
+        old_count = _parse_manifest(old)[1] if old else 0
+        if old_count > count:
+            self._conn.execute_many(
+                [(b'del', (_chunk_key(prefix, i),))
+                 for i in range(count, old_count)])
+        return count
+
+    def get_chunked(self, key):
+        """Get value stored with ``set_chunked``.
+
+        :param key: ``bytes`` key to get.
+        :return: ``bytes`` if value exists and is complete else ``None``
+        """
+        prefix = _chunk_prefix(key)
+        resp = self._conn.execute(b'mget', prefix, encoding=None)
+        return _join_chunks(prefix, resp)
+
+    def ttl_chunked(self, key, expire):
+        """Set the TTL of value stored with ``set_chunked``, see
+        ``Gibson.ttl_chunked``.
+
+        :return: ``int``, number of modified items.
+        :raises TypeError: if expire argument is not ``int``
+        """
+        if not isinstance(expire, int):
+            raise TypeError('expire must be int')
+        res = self._conn.execute_many([(b'ttl', (chunk_key, expire))
+                                       for chunk_key in self._chunk_keys(key)])
+        return sum(1 for r in res if r)
+
+    def delete_chunked(self, key):
+        """Delete value stored with ``set_chunked``.
+
+        :return: ``int``, number of deleted items.
+        """
+        res = self._conn.execute_many([(b'del', (chunk_key,))
+                                       for chunk_key in self._chunk_keys(key)])
+        return sum(1 for r in res if r)
+
+    def _chunk_keys(self, key):
+        prefix = _chunk_prefix(key)
+        manifest = self._conn.execute(b'get', prefix, encoding=None)
+        return _manifest_keys(prefix, manifest)
+
+
+class _CommandQueue:
+    # stands for connection of ``_QueuedCommands``, every executed command
+    # is queued and its index in batch is returned instead of reply
+
+    __slots__ = ('commands', 'converters')
+
+    def __init__(self):
+        self.commands = []
+        self.converters = []
+
+    def execute(self, command, *args):
+        self.commands.append((command, args))
+        self.converters.append(None)
+        return len(self.commands) - 1
+
+
+class _QueuedCommands(Gibson):
+
+    __slots__ = ()
+
+    def _convert(self, index, type_):
+        self._conn.converters[index] = type_
+        return index
+
+
+class Batch:
+    """Commands queued to be sent in single write.
+
+    Methods listed in ``BATCH_COMMANDS`` queue command and return the
+    batch, so calls can be chained, ``execute`` sends queued commands and
+    returns their replies.
+
+    :param conn: ``BlockingConnection`` instance.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._queue = _QueuedCommands(_CommandQueue())
+
+    def __repr__(self):
+        return '<Batch {!r} commands={}>'.format(self._conn, len(self))
+
+    def __len__(self):
+        return len(self._queue._conn.commands)
+
+    def __getattr__(self, method):
+        if method not in BATCH_COMMANDS:
+            raise AttributeError(method)
+        queue = getattr(self._queue, method)
+
+        def caller(*args, **kw):
+            queue(*args, **kw)
+            return self
+        return caller
+
+    def execute(self, raise_on_error=True):
+        """Send queued commands and read their replies, batch is empty
+        afterwards.
+
+        :param raise_on_error: ``bool`` raise first error reply once all
+            replies are read, otherwise errors are returned in place of
+            replies.
+        :return: ``list`` of replies in order of commands.
+        """
+        queue = self._queue._conn
+        self._queue = _QueuedCommands(_CommandQueue())
+        if not queue.commands:
+            return []
+        results = self._conn.execute_many(queue.commands,
+                                          raise_on_error=raise_on_error)
+        for i, type_ in enumerate(queue.converters):
+            if type_ is not None and not isinstance(results[i], Exception):
+                results[i] = type_(results[i])
+        return results
+
+
+class _PrefixIterator(PrefixIterator):
+    # blocking counterpart of ``PrefixIterator``, pagination is the same
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self._buffer:
+            page = self.next_page()
+            if page is None:
+                raise StopIteration
+            self._buffer.extend(page)
+        return self._buffer.popleft()
+
+    def next_page(self):
+        gibson = self._gibson
+        steps = self._steps()
+        try:
+            commands = next(steps)
+            while True:
+                if len(commands) == 1:
+                    method, args = commands[0]
+                    replies = [getattr(gibson, method)(*args)]
+                else:
+                    batch = gibson.batch()
+                    for method, args in commands:
+                        getattr(batch, method)(*args)
+                    replies = batch.execute()
+                commands = steps.send(replies)
+        except StopIteration as exc:
+            return exc.value
+
+
+class _PoolPrefixIterator(_PrefixIterator):
+    # iterator over ``ClientPool``, connection is held from the first page
+    # until iteration is over or ``close`` is called
+
+    def __init__(self, pool, prefix, **kw):
+        super().__init__(None, prefix, **kw)
+        self._pool = pool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def next_page(self):
+        if self._gibson is None:
+            if not self._stack:
+                return None
+            self._gibson = self._pool._acquire()
+        try:
+            page = super().next_page()
+        except BaseException:
+            self.close()
+            raise
+        if page is None:
+            self.close()
+        return page
+
+    def close(self):
+        """Stop iteration and return connection to the pool."""
+        client, self._gibson = self._gibson, None
+        self._stack = []
+        self._buffer.clear()
+        if client is not None:
+            self._pool.release(client)
+
+
+class ClientPool:
+    """Thread safe pool of ``GibsonClient`` connections.
+
+    Commands called on the pool acquire free connection for single round
+    trip, ``acquire`` holds connection for several commands. Connections
+    broken by errors are dropped from the pool on release.
+
+    :param address: ``str`` for unix socket path, or ``tuple``
+        for (host, port) tcp connection.
+    :param minsize: ``int`` number of connections opened upfront.
+    :param maxsize: ``int`` maximum number of connections, ``acquire``
+        blocks while all of them are in use.
+    :param encoding: this argument can be used to decode byte-replies to
+        strings. By default no decoding is done.
+    :param timeout: ``float`` socket timeout of connections.
+    :param tracer: ``aiogibson.tracing.Tracer`` shared by connections, so
+        it has to be thread safe.
+    """
+
+    def __init__(self, address, *, minsize=1, maxsize=10, encoding=None,
+                 timeout=None, tracer=None):
+        if maxsize <= 0 or minsize > maxsize:
+            raise ValueError('Invalid pool size {}..{}'.format(minsize,
+                                                               maxsize))
+        self._address = address
+        self._minsize = minsize
+        self._maxsize = maxsize
+        self._encoding = encoding
+        self._timeout = timeout
+        self._tracer = tracer
+        self._free = deque()
+        self._used = set()
+        self._connecting = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        for _ in range(minsize):
+            self._free.append(self._create_client())
+
+    def __repr__(self):
+        return '<ClientPool {} size={}>'.format(self._address, self.size)
+
+    @property
+    def minsize(self):
+        """Minimum pool size."""
+        return self._minsize
+
+    @property
+    def maxsize(self):
+        """Maximum pool size."""
+        return self._maxsize
+
+    @property
+    def size(self):
+        """Current pool size."""
+        return len(self._free) + len(self._used)
+
+    @property
+    def freesize(self):
+        """Current number of free connections."""
+        return len(self._free)
+
+    @property
+    def closed(self):
+        """True if pool is closed."""
+        return self._closed
+
+    def acquire(self, timeout=None):
+        """Acquire connection, it is released when context manager exits:
+
+        .. code:: python
+
+            with pool.acquire() as gibson:
+                gibson.set(b'foo', b'bar')
+
+        :param timeout: ``float`` seconds to wait for free connection.
+        :raises TimeoutError: if no connection is freed in time
+        """
+        return _PoolContextManager(self, self._acquire(timeout))
+
+    def _acquire(self, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(self._can_acquire, timeout):
+                raise TimeoutError('No free connection in {}s'.format(
+                    timeout))
+            if self._closed:
+                raise GibsonError('Pool is closed')
+            if self._free:
+                client = self._free.pop()
+                self._used.add(client)
+                return client
+            # connect outside of the lock, slot is reserved meanwhile
+            self._connecting += 1
+        try:
+            client = self._create_client()
+        finally:
+            with self._cond:
+                self._connecting -= 1
+                self._cond.notify()
+        with self._cond:
+            self._used.add(client)
+        return client
+
+    def _can_acquire(self):
+        return (self._closed or self._free or
+                self.size + self._connecting < self._maxsize)
+
+    def release(self, client):
+        """Return connection acquired with ``_acquire`` back to pool."""
+        with self._cond:
+            assert client in self._used, (
+                "Invalid connection, maybe from other pool")
+            self._used.remove(client)
+            if client.closed or self._closed:
+                client.close()
+            else:
+                self._free.append(client)
+            self._cond.notify()
+
+    def close(self):
+        """Close free connections, connections in use are closed once
+        released."""
+        with self._cond:
+            self._closed = True
+            while self._free:
+                self._free.pop().close()
+            self._cond.notify_all()
+
+    def _create_client(self):
+        return create_client(self._address, encoding=self._encoding,
+                             timeout=self._timeout, tracer=self._tracer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def iter_prefix(self, prefix, page_size=1000, max_bytes=None):
+        """Iterator over key/value pairs with given prefix, see
+        ``Gibson.iter_prefix``. Connection is held until iteration is over
+        or iterator is closed:
+
+        .. code:: python
+
+            with pool.iter_prefix(b'user:') as it:
+                for key, value in it:
+                    ...
+
+        :return: iterator of (key, value) pairs.
+        """
+        return _PoolPrefixIterator(self, prefix, page_size=page_size,
+                                   max_bytes=max_bytes)
+
+    def iter_keys(self, prefix, page_size=1000):
+        """Iterator over keys with given prefix, see ``iter_prefix``.
+
+        :return: iterator of keys.
+        """
+        return _PoolPrefixIterator(self, prefix, page_size=page_size,
+                                   keys_only=True)
+
+    def __getattr__(self, method):
+        if method.startswith('_') or method == 'batch':
+            raise AttributeError(method)
+        getattr(GibsonClient, method)
+
+        def caller(*args, **kw):
+            client = self._acquire()
+            try:
+                return getattr(client, method)(*args, **kw)
+            finally:
+                self.release(client)
+        return caller
+
+
+class _PoolContextManager:
+
+    __slots__ = ('_pool', '_client')
+
+    def __init__(self, pool, client):
+        self._pool = pool
+        self._client = client
+
+    def __enter__(self):
+        return self._client
+
+    def __exit__(self, exc_type, exc_value, tb):
+        try:
+            self._pool.release(self._client)
+        finally:
+            self._pool = None
+            self._client = None
@@ -0,0 +1,216 @@
+"""Bridge between threaded code and asynchronous client.
+
+``GibsonBridge`` runs event loop with ``GibsonPool`` in background thread.
+Commands called from other threads are appended to shared queue and return
+``concurrent.futures.Future``, loop thread is woken up only if it is not
+already about to drain the queue, so many commands submitted meanwhile cost
+single wakeup and are pipelined over one connection:
+
+.. code:: python
+
+    bridge = GibsonBridge('/tmp/gibson.sock', maxsize=4)
+
+    # in any thread
+    value = bridge.get(b'foo').result(timeout=1)
+    futs = [bridge.get(key) for key in keys]
+    values = [fut.result() for fut in futs]
+
+    bridge.close()
+
+.. note:: Commands drained in different batches may run over different
+   connections, so wait for result of a write before issuing command
+   depending on it.
+"""
+import asyncio
+import concurrent.futures
+import threading
+from collections import deque
+
+from .commands import Gibson
+from .errors import GibsonError
+from .pool import create_pool
+
+__all__ = ['GibsonBridge']
+
+
+class GibsonBridge:
+    """Thread safe front end of ``GibsonPool`` running in its own thread.
+
+    :param address: ``str`` for unix socket path, or ``tuple``
+        for (host, port) tcp connection.
+    :param minsize: ``int`` minimum size of the pool.
+    :param maxsize: ``int`` maximum size of the pool, also maximum number
+        of batches in flight.
+    :param encoding: this argument can be used to decode byte-replies to
+        strings. By default no decoding is done.
+    :param max_batch: ``int`` maximum number of commands pipelined over
+        single connection at once.
+    :param tracer: ``aiogibson.tracing.Tracer`` installed into the pool,
+        it is called from the loop thread only.
+    """
+
+    def __init__(self, address, *, minsize=1, maxsize=4, encoding=None,
+                 max_batch=1000, tracer=None):
+        self._address = address
+        self._max_batch = max_batch
+        # deque append and popleft are atomic, producers never block
+        self._queue = deque()
+        self._scheduled = False
+        self._closed = False
+        self._batches = set()
+        self._counters = dict.fromkeys(('commands', 'batches', 'wakeups'), 0)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run, name='gibson-bridge', daemon=True)
+        self._thread.start()
+        try:
+            self._pool = self._call(create_pool(
+                address, encoding=encoding, minsize=minsize,
+                maxsize=maxsize, tracer=tracer))
+        except BaseException:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            raise
+
+    def __repr__(self):
+        return '<GibsonBridge {} queued={}>'.format(self._address,
+                                                    len(self._queue))
+
+    @property
+    def closed(self):
+        """True if bridge is closed."""
+        return self._closed
+
+    @property
+    def loop(self):
+        """Event loop running in background thread."""
+        return self._loop
+
+    @property
+    def counters(self):
+        """``dict`` with number of submitted ``commands``, ``batches`` sent
+        and loop ``wakeups`` requested by submitting threads."""
+        return dict(self._counters)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def submit(self, method, *args, **kw):
+        """Schedule command of ``Gibson`` high-level interface, can be
+        called from any thread.
+
+        :param method: ``str`` name of ``Gibson`` method.
+        :return: ``concurrent.futures.Future`` of the reply.
+        :raises GibsonError: if bridge is closed
+        """
+        if self._closed:
+            raise GibsonError('Bridge is closed')
+        fut = concurrent.futures.Future()
+        self._queue.append((fut, method, args, kw))
+        # flag is cleared by loop thread before it drains the queue, so
+        # command appended before that is always picked up
+        if not self._scheduled:
+            self._scheduled = True
+            self._loop.call_soon_threadsafe(self._drain)
+        return fut
+
+    def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        # AttributeError for unknown commands
+        getattr(Gibson, method)
+
+        def caller(*args, **kw):
+            return self.submit(method, *args, **kw)
+        return caller
+
+    def _drain(self):
+        self._scheduled = False
+        self._counters['wakeups'] += 1
+        queue = self._queue
+        while queue:
+            batch = []
+            while queue and len(batch) < self._max_batch:
+                batch.append(queue.popleft())
+            task = self._loop.create_task(self._send(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+            self._counters['batches'] += 1
+            self._counters['commands'] += len(batch)
+
+    async def _send(self, batch):
+        try:
+            async with self._pool.acquire() as gibson:
+                waiters = []
+                for fut, method, args, kw in batch:
+                    if not fut.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        waiter = asyncio.ensure_future(
+                            getattr(gibson, method)(*args, **kw))
+                    except Exception as exc:
+                        fut.set_exception(exc)
+                        continue
+                    waiter.add_done_callback(
+                        lambda waiter, fut=fut: _copy_state(waiter, fut))
+                    waiters.append(waiter)
+                # connection is released only after all replies arrive
+                if waiters:
+                    await asyncio.wait(waiters)
+        except Exception as exc:
+            # for instance connection could not be acquired
+            _fail(batch, exc)
+        except BaseException:
+            _fail(batch, GibsonError('Bridge is closed'))
+            raise
+
+    def close(self):
+        """Fail queued commands, close the pool and stop loop thread."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._call(self._close())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            # submitted while bridge was closing
+            _fail(self._queue, GibsonError('Bridge is closed'))
+            self._queue.clear()
+
+    async def _close(self):
+        self._drain()
+        if self._batches:
+            await asyncio.wait(list(self._batches))
+        await self._pool.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+def _copy_state(source, dest):
+    if dest.done():
+        return
+    if source.cancelled():
+        dest.set_exception(concurrent.futures.CancelledError())
+    elif source.exception() is not None:
+        dest.set_exception(source.exception())
+    else:
+        dest.set_result(source.result())
+
+
+def _fail(batch, exc):
+    for fut, *_ in batch:
+        if fut.running() or fut.set_running_or_notify_cancel():
+            if not fut.done():
+                fut.set_exception(exc)
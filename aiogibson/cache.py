@@ -0,0 +1,229 @@
+"""Cache-aside memoization on top of high-level Gibson interface:
+
+.. code:: python
+
+    gibson = await create_gibson('/tmp/gibson.sock')
+
+    @cached(gibson, expire=60, stale=30)
+    async def user_profile(user_id):
+        return await fetch_from_database(user_id)
+
+    profile = await user_profile(42)
+
+Only one worker recomputes an expired value: ``lock`` on a mutex key next to
+the cached one is used as recompute lock, other workers keep serving stale
+value during ``stale`` seconds after logical expiration. Values are
+recomputed a bit earlier with probability growing as expiration approaches
+(probabilistic early expiration, *XFetch*), remaining TTL is taken from
+``meta_left``, so hot keys are refreshed before they expire at all. TTLs are
+jittered to spread expiration of keys cached at the same moment.
+"""
+import asyncio
+import functools
+import hashlib
+import logging
+import math
+import pickle
+import random
+import struct
+import time
+import uuid
+
+from .errors import KeyLockedError
+
+__all__ = ['cached', 'CacheAside']
+
+logger = logging.getLogger(__name__)
+
+LOCK_SUFFIX = b':lock'
+# delta (seconds spent to compute value) stored in front of the value
+_HEADER = struct.Struct('<f')
+
+
+def cached(gibson, *, expire, **kwargs):
+    """Decorator caching results of coroutine function in Gibson.
+
+    :param gibson: ``Gibson`` or ``GibsonPool`` instance.
+    :param expire: ``int`` TTL of cached values in seconds.
+    :param kwargs: other arguments accepted by ``CacheAside``.
+    :return: decorator
+    """
+    return CacheAside(gibson, expire=expire, **kwargs)
+
+
+class CacheAside:
+    """Cache-aside loader with stampede protection.
+
+    :param gibson: ``Gibson`` or ``GibsonPool`` instance, connection must not
+        decode replies (no ``encoding``).
+    :param expire: ``int`` TTL of cached values in seconds.
+    :param stale: ``int`` seconds value is still served after logical
+        expiration while recompute is running.
+    :param lock_timeout: ``int`` recompute lock TTL in seconds, by default
+        equals to ``expire``.
+    :param beta: ``float`` early expiration factor, values greater than
+        ``1.0`` favor earlier recompute, ``0`` disables early expiration.
+    :param jitter: ``float`` fraction TTL randomly shortened by.
+    :param prefix: ``bytes`` prefix for all generated keys.
+    :param key_builder: callable ``(func, args, kwargs) -> bytes``,
+        by default key is derived from function name and arguments.
+    :param dumps: callable serializing values to ``bytes``.
+    :param loads: callable deserializing values from ``bytes``.
+    :param poll_interval: ``float`` seconds between checks while waiting
+        for other worker to compute missing value.
+    """
+
+    def __init__(self, gibson, *, expire, stale=0, lock_timeout=None,
+                 beta=1.0, jitter=0.1, prefix=b'cache:', key_builder=None,
+                 dumps=pickle.dumps, loads=pickle.loads, poll_interval=0.05):
+        if not isinstance(expire, int):
+            raise TypeError('expire must be int')
+        if not isinstance(stale, int):
+            raise TypeError('stale must be int')
+        self._gibson = gibson
+        self._expire = expire
+        self._stale = stale
+        self._lock_timeout = lock_timeout or expire
+        self._beta = beta
+        self._jitter = jitter
+        self._prefix = prefix
+        self._key_builder = key_builder or self._default_key
+        self._dumps = dumps
+        self._loads = loads
+        self._poll_interval = poll_interval
+        self._pending = set()
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kw):
+            key = self._key_builder(func, args, kw)
+            return await self.load(key, func, *args, **kw)
+        wrapper.cache = self
+        return wrapper
+
+    def _default_key(self, func, args, kw):
+        name = '{}.{}'.format(func.__module__, func.__qualname__)
+        params = repr((args, sorted(kw.items()))).encode('utf-8')
+        digest = hashlib.sha1(params).hexdigest()
+        # keys must not contain spaces, since they are separators in
+        # gibson protocol
+        return (self._prefix + name.replace(' ', '_').encode('utf-8') +
+                b':' + digest.encode('ascii'))
+
+    async def load(self, key, func, *args, **kw):
+        """Get value for given key, on miss compute it with
+        ``func(*args, **kw)`` coroutine and store it.
+
+        :param key: ``bytes`` key of cached value.
+        :param func: coroutine function computing value.
+        :return: cached or computed value
+        """
+        gibson = self._gibson
+        data, left = await asyncio.gather(
+            gibson.get(key), gibson.meta_left(key))
+        if data is None or left is None:
+            return await self._fill(key, func, args, kw)
+
+        delta, = _HEADER.unpack_from(data)
+        value = self._loads(data[_HEADER.size:])
+        if left < 0:
+            # infinite TTL, never recomputed
+            return value
+        fresh = left - self._stale
+        if (fresh <= 0 or
+                delta * self._beta * -math.log(1 - random.random()) >= fresh):
+            token = await self._acquire(key)
+            if token is not None:
+                task = asyncio.create_task(
+                    self._refresh(key, func, args, kw, token))
+                self._pending.add(task)
+                task.add_done_callback(self._pending.discard)
+        return value
+
+    async def invalidate(self, key):
+        """Delete cached value.
+
+        :param key: ``bytes`` key of cached value.
+        :return: ``bool`` True in case value existed.
+        """
+        return await self._gibson.delete(key)
+
+    async def wait_pending(self):
+        """Wait until all background recomputes are finished."""
+        if self._pending:
+            await asyncio.wait(self._pending)
+
+    async def _fill(self, key, func, args, kw):
+        token = await self._acquire(key)
+        if token is not None:
+            try:
+                return await self._compute(key, func, args, kw)
+            finally:
+                await self._release(key, token)
+
+        # other worker computes value, wait for it instead of hitting
+        # backend concurrently
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._lock_timeout
+        while loop.time() < deadline:
+            await asyncio.sleep(self._poll_interval)
+            data = await self._gibson.get(key)
+            if data is not None:
+                return self._loads(data[_HEADER.size:])
+        return await self._compute(key, func, args, kw)
+
+    async def _refresh(self, key, func, args, kw, token):
+        try:
+            try:
+                await self._compute(key, func, args, kw)
+            finally:
+                await self._release(key, token)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            # nobody awaits background recompute, stale value is kept
+            logger.warning("Failed to refresh %r: %r", key, exc)
+
+    async def _compute(self, key, func, args, kw):
+        started = time.monotonic()
+        value = await func(*args, **kw)
+        delta = time.monotonic() - started
+
+        expire = self._expire
+        if self._jitter:
+            # at least one second, so short TTLs are spread as well
+            expire -= random.randint(0, math.ceil(expire * self._jitter))
+        data = _HEADER.pack(delta) + self._dumps(value)
+        try:
+            await self._gibson.set(key, data, max(expire, 1) +
+                                   self._stale)
+        except KeyLockedError:
+            pass
+        return value
+
+    async def _acquire(self, key):
+        # gibson can not lock missing keys, so placeholder with unique token
+        # is created first, only one worker manages to lock it, others get
+        # KeyLockedError; locked placeholder can not be overwritten, so
+        # token read back identifies this lock
+        lock_key = key + LOCK_SUFFIX
+        timeout = self._lock_timeout
+        try:
+            await self._gibson.set(lock_key, uuid.uuid4().hex, timeout)
+            if not await self._gibson.lock(lock_key, timeout):
+                return None
+        except KeyLockedError:
+            return None
+        return await self._gibson.get(lock_key)
+
+    async def _release(self, key, token):
+        # lock could expire while value was computed and be taken by other
+        # worker, its lock is left alone
+        lock_key = key + LOCK_SUFFIX
+        if await self._gibson.get(lock_key) != token:
+            return
+        try:
+            await self._gibson.unlock(lock_key)
+            await self._gibson.delete(lock_key)
+        except KeyLockedError:
+            pass
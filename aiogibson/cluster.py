@@ -0,0 +1,385 @@
+"""Sharding over several gibson nodes and online rebalancing.
+
+``ShardedGibson`` routes key commands to the node owning the key on
+consistent hash ring, prefix commands are sent to every node and replies are
+merged:
+
+.. code:: python
+
+    nodes = {name: await create_pool(name)
+             for name in ('/tmp/gibson1.sock', '/tmp/gibson2.sock')}
+    gibson = ShardedGibson(nodes)
+    await gibson.set(b'user:1', b'John')
+    count = await gibson.count(b'user:')
+
+When node is added only keys moved to it on the ring change owner. Client
+created with ``previous`` list of old nodes runs in migration mode: command
+for moved key falls back to the old owner when key is not found on the new
+one, ``set`` and ``delete`` also drop the old copy. Meanwhile ``rebalance``
+streams keys from old owners page by page and copies moved ones with their
+remaining TTL, keys already written to the new owner or deleted by clients
+meanwhile are skipped. Copied keys are deleted from old owner, since prefix
+commands are sent to every node and replies are not deduplicated, until
+then prefix command may see migrated key twice:
+
+.. code:: python
+
+    nodes['/tmp/gibson3.sock'] = await create_pool(...)
+    gibson = ShardedGibson(nodes, previous=old_names)
+    await rebalance(nodes, old_names, list(nodes), max_latency=0.005)
+    gibson.finish_migration()
+
+or from command line::
+
+    $ python -m aiogibson.cluster --old /tmp/gibson1.sock,/tmp/gibson2.sock \\
+        --new /tmp/gibson1.sock,/tmp/gibson2.sock,/tmp/gibson3.sock
+
+Copying is throttled: with ``max_latency`` pause between batches grows
+while copy round trips are slower than the bound, so regular traffic served
+by the same nodes keeps its latency, ``rate`` caps number of copied keys per
+second.
+"""
+import argparse
+import asyncio
+import bisect
+import hashlib
+import logging
+import struct
+import sys
+from collections import OrderedDict
+
+from .commands import _to_bytes
+from .connection import parse_address
+from .errors import GibsonError
+from .pool import acquire, create_pool
+from .scan import PrefixIterator
+
+__all__ = ['HashRing', 'ShardedGibson', 'rebalance', 'KEY_COMMANDS',
+           'PREFIX_COMMANDS']
+
+logger = logging.getLogger(__name__)
+
+KEY_COMMANDS = frozenset([
+    'set', 'ttl', 'get', 'delete', 'inc', 'dec', 'lock', 'unlock', 'meta',
+    'meta_size', 'meta_encoding', 'meta_access', 'meta_created',
+    'meta_ttl', 'meta_left', 'meta_lock'])
+PREFIX_COMMANDS = frozenset([
+    'mset', 'mttl', 'mget', 'mdelete', 'minc', 'mdec', 'mlock', 'munlock',
+    'count', 'keys'])
+
+_POINT = struct.Struct('<I')
+MAX_PAUSE = 1.0
+
+
+class HashRing:
+    """Ketama style consistent hash ring.
+
+    :param nodes: iterable of ``str`` node names.
+    :param replicas: ``int`` number of ring points per node.
+    """
+
+    def __init__(self, nodes, replicas=160):
+        nodes = list(nodes)
+        if not nodes:
+            raise ValueError('At least one node is required')
+        ring = {}
+        for node in nodes:
+            for i in range(replicas // 4):
+                digest = hashlib.md5(
+                    '{}-{}'.format(node, i).encode('utf-8')).digest()
+                # every md5 digest gives four points
+                for j in range(4):
+                    ring[_POINT.unpack_from(digest, j * 4)[0]] = node
+        self._points = sorted(ring)
+        self._owners = [ring[point] for point in self._points]
+        self.nodes = nodes
+
+    def __repr__(self):
+        return '<HashRing {}>'.format(self.nodes)
+
+    def get_node(self, key):
+        """Name of node owning the key.
+
+        :param key: ``bytes`` key.
+        """
+        point = _POINT.unpack_from(hashlib.md5(_to_bytes(key)).digest())[0]
+        index = bisect.bisect(self._points, point)
+        if index == len(self._points):
+            index = 0
+        return self._owners[index]
+
+
+def _merge(replies):
+    replies = [reply for reply in replies if reply is not None]
+    if not replies:
+        return None
+    if isinstance(replies[0], list):
+        return [item for reply in replies for item in reply]
+    if isinstance(replies[0], bool):
+        return all(replies)
+    return sum(replies)
+
+
+class ShardedGibson:
+    """Gibson client sharding keys over several nodes.
+
+    :param nodes: ``dict`` mapping node name to ``Gibson`` or
+        ``GibsonPool`` instance.
+    :param previous: node names of the ring before nodes were added or
+        removed, enables migration mode.
+    :param replicas: ``int`` number of ring points per node.
+    """
+
+    def __init__(self, nodes, *, previous=None, replicas=160):
+        self._nodes = OrderedDict(nodes)
+        self._replicas = replicas
+        self._ring = HashRing(self._nodes, replicas)
+        self._previous = None
+        if previous is not None:
+            unknown = set(previous) - set(self._nodes)
+            if unknown:
+                raise ValueError('Unknown nodes {}'.format(sorted(unknown)))
+            self._previous = HashRing(previous, replicas)
+
+    def __repr__(self):
+        return '<ShardedGibson {}>'.format(list(self._nodes))
+
+    @property
+    def nodes(self):
+        """``dict`` of node name to target."""
+        return dict(self._nodes)
+
+    @property
+    def migrating(self):
+        """True if client runs in migration mode."""
+        return self._previous is not None
+
+    def node_for(self, key):
+        """Name of node owning the key."""
+        return self._ring.get_node(key)
+
+    def finish_migration(self):
+        """Leave migration mode once keys are rebalanced."""
+        self._previous = None
+
+    def __getattr__(self, method):
+        if method in KEY_COMMANDS:
+            async def key_caller(key, *args, **kw):
+                return await self._execute(method, key, args, kw)
+            return key_caller
+
+        if method in PREFIX_COMMANDS:
+            async def prefix_caller(prefix, *args, **kw):
+                replies = await asyncio.gather(
+                    *[getattr(node, method)(prefix, *args, **kw)
+                      for node in self._nodes.values()])
+                result = _merge(replies)
+                if method == 'mget' and result is not None:
+                    limit = args[0] if args else kw.get('limit')
+                    if limit is not None:
+                        result = result[:2 * limit]
+                return result
+            return prefix_caller
+
+        raise AttributeError(method)
+
+    async def _execute(self, method, key, args, kw):
+        owner = self._ring.get_node(key)
+        target = self._nodes[owner]
+        old_owner = owner
+        if self._previous is not None:
+            old_owner = self._previous.get_node(key)
+        if old_owner == owner:
+            return await getattr(target, method)(key, *args, **kw)
+
+        old = self._nodes[old_owner]
+        if method in ('set', 'delete'):
+            resp = await getattr(target, method)(key, *args, **kw)
+            try:
+                old_resp = await old.delete(key)
+            except GibsonError as exc:
+                logger.debug("Failed to drop old copy of %r: %r", key, exc)
+                old_resp = None
+            if method == 'delete':
+                return resp or old_resp
+            return resp
+
+        resp = await getattr(target, method)(key, *args, **kw)
+        # ttl, lock and unlock of missing key reply False instead of None
+        if resp is None or resp is False:
+            resp = await getattr(old, method)(key, *args, **kw)
+        return resp
+
+
+async def rebalance(nodes, old, new, prefix=b'', *, page_size=500,
+                    max_latency=None, rate=None, delete=True, replicas=160):
+    """Copy keys which changed owner between two rings.
+
+    :param nodes: ``dict`` mapping node name to ``Gibson`` or
+        ``GibsonPool`` instance, must hold nodes of both rings.
+    :param old: node names of the ring keys are stored by.
+    :param new: node names of the target ring.
+    :param prefix: ``bytes`` rebalance only keys with given prefix.
+    :param page_size: ``int`` maximum number of keys read at once.
+    :param max_latency: ``float`` seconds, copying slows down while batch
+        round trips take longer.
+    :param rate: ``float`` maximum number of copied keys per second.
+    :param delete: ``bool`` delete copied keys from old owner, prefix
+        commands query every node, so kept copies are counted twice and
+        stay subject to prefix writes.
+    :param replicas: ``int`` number of ring points per node.
+    :return: ``dict`` with number of ``scanned``, ``moved``, ``skipped``,
+        ``failed`` and ``deleted`` keys and ``throttled`` seconds.
+    """
+    loop = asyncio.get_running_loop()
+    new_ring = HashRing(new, replicas)
+    stats = dict.fromkeys(
+        ('scanned', 'moved', 'skipped', 'failed', 'deleted'), 0)
+    stats['throttled'] = 0.0
+    pause = 0.0
+
+    for name in old:
+        source = nodes[name]
+        it = PrefixIterator(source, prefix, page_size=page_size)
+        while True:
+            page = await it.next_page()
+            if page is None:
+                break
+            stats['scanned'] += len(page)
+            moved = [(key, value) for key, value in page
+                     if new_ring.get_node(key) != name]
+            if not moved:
+                continue
+
+            started = loop.time()
+            metas = await source.meta_many([key for key, _ in moved],
+                                           fields=('left',))
+            batches = {}
+            for (key, _), meta in zip(moved, metas):
+                # expired meanwhile or about to expire
+                if meta is None or meta.left == 0:
+                    continue
+                ttl = 0 if meta.left < 0 else meta.left
+                batches.setdefault(new_ring.get_node(key), []).append(
+                    (key, ttl))
+            results = await asyncio.gather(
+                *[_copy(source, nodes[owner], batch)
+                  for owner, batch in batches.items()])
+            copied = [key for keys, _ in results for key in keys]
+            skipped = sum(count for _, count in results)
+            stats['moved'] += len(copied)
+            stats['skipped'] += skipped
+            stats['failed'] += sum(map(len, batches.values())) - \
+                len(copied) - skipped
+            if delete and copied:
+                stats['deleted'] += await _delete(source, copied)
+            elapsed = loop.time() - started
+
+            if max_latency is not None:
+                if elapsed > max_latency:
+                    pause = min(max(pause * 2, 0.01), MAX_PAUSE)
+                else:
+                    pause /= 2
+            delay = pause
+            if rate:
+                delay = max(delay, len(copied) / rate - elapsed)
+            if delay > 0.001:
+                stats['throttled'] += delay
+                await asyncio.sleep(delay)
+    return stats
+
+
+async def _copy(source, target, batch):
+    # clients in migration mode write moved keys to the new owner and drop
+    # the old copy, so key present on target or missing on source was
+    # written or deleted meanwhile and must not be overwritten with value
+    # read from the page; both checks are made right before the set
+    keys = [key for key, _ in batch]
+    async with acquire(target) as gibson, acquire(source) as old:
+        existing, values = await asyncio.gather(
+            asyncio.gather(*[gibson.get(key) for key in keys],
+                           return_exceptions=True),
+            asyncio.gather(*[old.get(key) for key in keys],
+                           return_exceptions=True))
+        todo = []
+        skipped = 0
+        for (key, ttl), current, value in zip(batch, existing, values):
+            for res in (current, value):
+                if isinstance(res, BaseException) and \
+                        not isinstance(res, GibsonError):
+                    raise res
+            if isinstance(current, GibsonError) or \
+                    isinstance(value, GibsonError):
+                logger.debug("Failed to check %r: %r", key,
+                             current if isinstance(current, GibsonError)
+                             else value)
+            elif current is not None or value is None:
+                skipped += 1
+            else:
+                todo.append((key, value, ttl))
+        results = await asyncio.gather(
+            *[gibson.set(key, value, ttl) for key, value, ttl in todo],
+            return_exceptions=True)
+    copied = []
+    for (key, _, _), res in zip(todo, results):
+        if isinstance(res, GibsonError):
+            logger.debug("Failed to copy %r: %r", key, res)
+        elif isinstance(res, BaseException):
+            raise res
+        else:
+            copied.append(key)
+    return copied, skipped
+
+
+async def _delete(source, keys):
+    async with acquire(source) as gibson:
+        results = await asyncio.gather(
+            *[gibson.delete(key) for key in keys],
+            return_exceptions=True)
+    return sum(1 for res in results if res is True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m aiogibson.cluster',
+        description='Copy keys between gibson nodes after ring change.')
+    parser.add_argument('--old', required=True,
+                        help='comma separated addresses of old nodes')
+    parser.add_argument('--new', required=True,
+                        help='comma separated addresses of new nodes')
+    parser.add_argument('--prefix', default='',
+                        help='rebalance only keys with given prefix')
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--max-latency', type=float, default=None,
+                        help='slow down while batches take longer, seconds')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='maximum copied keys per second')
+    parser.add_argument('--keep', action='store_true',
+                        help='keep copied keys on old owners')
+    args = parser.parse_args(argv)
+    old = [name for name in args.old.split(',') if name]
+    new = [name for name in args.new.split(',') if name]
+
+    async def go():
+        nodes = {}
+        try:
+            for name in set(old) | set(new):
+                nodes[name] = await create_pool(
+                    parse_address(name), minsize=1, maxsize=1)
+            return await rebalance(
+                nodes, old, new, args.prefix.encode('utf-8'),
+                page_size=args.page_size, max_latency=args.max_latency,
+                rate=args.rate, delete=not args.keep)
+        finally:
+            for pool in nodes.values():
+                await pool.clear()
+
+    stats = asyncio.run(go())
+    sys.stdout.write('scanned {scanned}, moved {moved}, skipped {skipped}, '
+                     'failed {failed}, deleted {deleted}, '
+                     'throttled {throttled:.3f}s\n'
+                     .format(**stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,21 @@
 import asyncio
+import zlib
+from collections import namedtuple
 
 from .connection import create_connection
+from .scan import PrefixIterator
 
-__all__ = ['create_gibson', 'Gibson']
+__all__ = ['create_gibson', 'Gibson', 'KeyMeta']
+
+CHUNK_SIZE = 512 * 1024
+CHUNK_SEP = b':#'
+
+META_FIELDS = ('size', 'encoding', 'access', 'created', 'ttl', 'left', 'lock')
+
+KeyMeta = namedtuple('KeyMeta', META_FIELDS)
+KeyMeta.__new__.__defaults__ = (None,) * len(META_FIELDS)
+KeyMeta.__doc__ = """Meta fields of single item, fields which were not
+requested are ``None``."""
 
 
 class Gibson:
@@ -11,6 +24,8 @@ class Gibson:
     :see: http://gibson-db.in/commands/
     """
 
+    __slots__ = ('_conn', '__weakref__')
+
     def __init__(self, connection):
         self._conn = connection
 
@@ -20,15 +35,17 @@ class Gibson:
     def close(self):
         self._conn.close()
 
-    @asyncio.coroutine
-    def wait_closed(self):
-        yield from self._conn.wait_closed()
+    async def wait_closed(self):
+        await self._conn.wait_closed()
 
     @property
     def closed(self):
         """True if connection is closed."""
         return self._conn.closed
 
+    def _convert(self, result, type_):
+        return wait_convert(result, type_)
+
     def get(self, key):
         """Get the value for a given key.
 
@@ -56,7 +73,7 @@ class Gibson:
         :return: ``bool`` true in case of success.
         """
         result = self._conn.execute(b'del', key)
-        return wait_convert(result, bool)
+        return self._convert(result, bool)
 
     def ttl(self, key, expire):
         """Set the TTL of a key.
@@ -69,7 +86,7 @@ class Gibson:
         if not isinstance(expire, int):
             raise TypeError('expire must be int')
         result = self._conn.execute(b'ttl', key, expire)
-        return wait_convert(result, bool)
+        return self._convert(result, bool)
 
     def inc(self, key):
         """Increment by one the given key.
@@ -99,7 +116,7 @@ class Gibson:
         if not isinstance(expire, int):
             raise TypeError('expire must be int')
         result = self._conn.execute(b'lock', key, expire)
-        return wait_convert(result, bool)
+        return self._convert(result, bool)
 
     def unlock(self, key):
         """Remove the lock from the given key.
@@ -108,16 +125,16 @@ class Gibson:
         :return: ``bool``, True in case of success.
         """
         result = self._conn.execute(b'unlock', key)
-        return wait_convert(result, bool)
+        return self._convert(result, bool)
 
     def keys(self, prefix):
         """Return a list of keys matching the given prefix.
 
         :param prefix: key prefix to use as expression.
-        :return: ``list`` of available keys
+        :return: ``list`` of available keys, ``None`` if there are no keys
         """
         result = self._conn.execute(b'keys', prefix)
-        return wait_convert(result, key_pairs)
+        return self._convert(result, key_pairs)
 
     def stats(self):
         """Get system stats about the Gibson instance.
@@ -190,9 +207,41 @@ class Gibson:
         """
         return self._conn.execute(b'meta', key, b'lock')
 
-    def end(self):
+    async def meta(self, key, fields=META_FIELDS):
+        """Fetch several meta fields of the item in one round trip.
+
+        :param key: ``bytes``, key of interest.
+        :param fields: sequence of field names: ``size``, ``encoding``,
+            ``access``, ``created``, ``ttl``, ``left``, ``lock``.
+        :return: ``KeyMeta`` or ``None`` if key does not exist.
+        :raises ValueError: if unknown field requested
+        """
+        result = await self.meta_many([key], fields)
+        return result[0]
+
+    async def meta_many(self, keys, fields=META_FIELDS):
+        """Fetch meta fields of many items, all ``meta`` commands are
+        pipelined in single write.
+
+        :param keys: sequence of ``bytes`` keys.
+        :param fields: sequence of field names: ``size``, ``encoding``,
+            ``access``, ``created``, ``ttl``, ``left``, ``lock``.
+        :return: ``list`` of ``KeyMeta``, ``None`` for missing keys.
+        :raises ValueError: if unknown field requested
+        """
+        fields = tuple(fields)
+        names = _meta_names(fields)
+        execute = self._conn.execute
+        futs = [execute(b'meta', key, name) for key in keys for name in names]
+        values = await asyncio.gather(*futs)
+        return _meta_records(fields, values)
+
+    async def end(self):
         """Disconnects from the client from gibson instance."""
-        return self._conn.execute(b'end')
+        res = await self._conn.execute(b'end')
+        # server drops connection right after reply, do not wait for EOF
+        self._conn.close()
+        return res
 
     def mset(self, prefix, value):
         """Set the value for keys verifying the given prefix.
@@ -284,10 +333,121 @@ class Gibson:
         """
         return self._conn.execute(b'count', prefix)
 
+    def iter_prefix(self, prefix, page_size=1000, max_bytes=None):
+        """Asynchronous iterator over key/value pairs with given prefix.
+
+        Prefix is split into child prefixes (using ``count``) so that every
+        ``mget`` reply holds at most ``page_size`` items.
+
+        :param prefix: ``bytes`` prefix for keys.
+        :param page_size: ``int`` maximum number of items in one reply.
+        :param max_bytes: ``int`` approximate maximum size of one reply.
+        :return: ``PrefixIterator`` of (key, value) pairs.
+        :raises TypeError: if page_size argument is not ``int``
+        """
+        return PrefixIterator(self, prefix, page_size=page_size,
+                              max_bytes=max_bytes)
+
+    def iter_keys(self, prefix, page_size=1000):
+        """Asynchronous iterator over keys with given prefix.
+
+        :param prefix: ``bytes`` prefix for keys.
+        :param page_size: ``int`` maximum number of keys in one reply.
+        :return: ``PrefixIterator`` of keys.
+        :raises TypeError: if page_size argument is not ``int``
+        """
+        return PrefixIterator(self, prefix, page_size=page_size,
+                              keys_only=True)
+
+    async def set_chunked(self, key, value, expire=0, chunk_size=CHUNK_SIZE):
+        """Set value which may exceed server item size limit.
 
-@asyncio.coroutine
-def create_gibson(address, *, encoding=None, commands_factory=Gibson,
-                  loop=None):
+        Value is split into ``chunk_size`` pieces stored under
+        ``key:#0000``, ``key:#0001``, ... keys, plus manifest stored under
+        ``key:#``. All writes are pipelined, manifest is written last, so
+        readers never see manifest without its chunks.
+
+        :param key: ``bytes`` key to set.
+        :param value: ``bytes`` value to set.
+        :param expire: ``int`` optional ttl in seconds
+        :param chunk_size: ``int`` size of single chunk in bytes.
+        :return: ``int`` number of written chunks.
+        :raises TypeError: if expire argument is not ``int``
+        """
+        if not isinstance(expire, int):
+            raise TypeError('expire must be int')
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be positive')
+        prefix, chunks, manifest = _split_chunks(key, value, chunk_size)
+        count = len(chunks)
+
+        execute = self._conn.execute
+        old = execute(b'get', prefix, encoding=None)
+        futs = [execute(b'set', expire, chunk_key, chunk, encoding=None)
+                for chunk_key, chunk in chunks]
+        futs.append(execute(b'set', expire, prefix, manifest, encoding=None))
+        old, *_ = await asyncio.gather(old, *futs)
+
+        # drop tail of previous, longer, value
+        old_count = _parse_manifest(old)[1] if old else 0
+        futs = [execute(b'del', _chunk_key(prefix, i))
+                for i in range(count, old_count)]
+        if futs:
+            await asyncio.gather(*futs)
+        return count
+
+    async def get_chunked(self, key):
+        """Get value stored with ``set_chunked``.
+
+        All chunks are fetched with single ``mget`` and assembled into
+        preallocated buffer.
+
+        :param key: ``bytes`` key to get.
+        :return: ``bytes`` if value exists and is complete else ``None``
+        """
+        prefix = _chunk_prefix(key)
+        resp = await self._conn.execute(b'mget', prefix, encoding=None)
+        return _join_chunks(prefix, resp)
+
+    async def ttl_chunked(self, key, expire):
+        """Set the TTL of value stored with ``set_chunked``, TTL is set on
+        manifest and on every chunk it lists.
+
+        :param key: ``bytes``, key to set ttl.
+        :param expire: ``int``, TTL in seconds.
+        :return: ``int``, number of modified items.
+        :raises TypeError: if expire argument is not ``int``
+        """
+        if not isinstance(expire, int):
+            raise TypeError('expire must be int')
+        keys = await self._chunk_keys(key)
+        execute = self._conn.execute
+        res = await asyncio.gather(*[execute(b'ttl', chunk_key, expire)
+                                     for chunk_key in keys])
+        return sum(1 for r in res if r)
+
+    async def delete_chunked(self, key):
+        """Delete value stored with ``set_chunked``.
+
+        :param key: ``bytes`` key to delete.
+        :return: ``int``, number of deleted items.
+        """
+        keys = await self._chunk_keys(key)
+        execute = self._conn.execute
+        res = await asyncio.gather(*[execute(b'del', chunk_key)
+                                     for chunk_key in keys])
+        return sum(1 for r in res if r)
+
+    async def _chunk_keys(self, key):
+        # exact keys listed in manifest, prefix commands on ``key:#`` would
+        # also match chunks of other keys, ``key:#x`` for instance
+        prefix = _chunk_prefix(key)
+        manifest = await self._conn.execute(b'get', prefix, encoding=None)
+        return _manifest_keys(prefix, manifest)
+
+
+async def create_gibson(address, *, encoding=None, commands_factory=Gibson,
+                        tracer=None):
     """Create high-level Gibson interface.
 
     :param address: ``str`` for unix socket path, or ``tuple``
@@ -295,18 +455,110 @@ def create_gibson(address, *, encoding=None, commands_factory=Gibson,
     :param encoding: this argument can be used to decode byte-replies to
         strings. By default no decoding is done.
     :param commands_factory:
-    :param loop: event loop to use
+    :param tracer: ``aiogibson.tracing.Tracer`` notified about every
+        command sent and reply received.
     :return: high-level Gibson connection ``Gibson``
     """
-    conn = yield from create_connection(address, encoding=encoding, loop=loop)
+    conn = await create_connection(address, encoding=encoding, tracer=tracer)
     return commands_factory(conn)
 
 
-@asyncio.coroutine
-def wait_convert(fut, type_):
-    result = yield from fut
+async def wait_convert(fut, type_):
+    result = await fut
     return type_(result)
 
 
 def key_pairs(obj):
+    if obj is None:
+        return None
     return [r for i, r in enumerate(obj) if i % 2]
+
+
+def _to_bytes(obj):
+    if isinstance(obj, str):
+        return obj.encode('utf-8')
+    return obj
+
+
+# commands modifying value of single key
+_KEY_WRITES = frozenset(['set', 'delete', 'ttl', 'inc', 'dec'])
+
+
+def _chunk_prefix(key):
+    return _to_bytes(key) + CHUNK_SEP
+
+
+def _chunk_key(prefix, index):
+    return prefix + '{:04d}'.format(index).encode('ascii')
+
+
+def _parse_manifest(manifest):
+    size, count, crc = _to_bytes(manifest).split(b':')
+    return int(size), int(count), int(crc)
+
+
+def _manifest_keys(prefix, manifest):
+    # manifest goes first, so readers do not see it without its chunks
+    if manifest is None:
+        return []
+    count = _parse_manifest(manifest)[1]
+    return [prefix] + [_chunk_key(prefix, i) for i in range(count)]
+
+
+def _split_chunks(key, value, chunk_size):
+    prefix = _chunk_prefix(key)
+    view = memoryview(_to_bytes(value))
+    size = len(view)
+    count = (size + chunk_size - 1) // chunk_size
+    manifest = '{}:{}:{}'.format(
+        size, count, zlib.crc32(view) & 0xffffffff).encode('ascii')
+    chunks = [(_chunk_key(prefix, i),
+               view[i * chunk_size:(i + 1) * chunk_size])
+              for i in range(count)]
+    return prefix, chunks, manifest
+
+
+def _join_chunks(prefix, resp):
+    if resp is None:
+        return None
+    pairs = dict(zip(resp[::2], resp[1::2]))
+    manifest = pairs.pop(prefix, None)
+    if manifest is None:
+        return None
+    size, count, crc = _parse_manifest(manifest)
+
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    offset = 0
+    for i in range(count):
+        chunk = pairs.get(_chunk_key(prefix, i))
+        if chunk is None or offset + len(chunk) > size:
+            return None
+        view[offset:offset + len(chunk)] = chunk
+        offset += len(chunk)
+    # chunks could be overwritten by concurrent writer, in that case
+    # value is torn and treated as missing
+    if offset != size or zlib.crc32(buffer) & 0xffffffff != crc:
+        return None
+    return bytes(buffer)
+
+
+def _meta_names(fields):
+    if not fields:
+        raise ValueError('At least one meta field expected')
+    for field in fields:
+        if field not in META_FIELDS:
+            raise ValueError('Unknown meta field {!r}'.format(field))
+    return [field.encode('ascii') for field in fields]
+
+
+def _meta_records(fields, values):
+    result = []
+    step = len(fields)
+    for i in range(0, len(values), step):
+        record = values[i:i + step]
+        if all(value is None for value in record):
+            result.append(None)
+        else:
+            result.append(KeyMeta(**dict(zip(fields, record))))
+    return result
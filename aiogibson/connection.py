@@ -5,18 +5,18 @@
 import asyncio
 from collections import deque
 
+from . import consts
 from .errors import GibsonError, ProtocolError
 from .parser import Reader, encode_command
 
 
-__all__ = ['create_connection', 'GibsonConnection']
+__all__ = ['create_connection', 'GibsonConnection', 'parse_address']
 
 MAX_CHUNK_SIZE = 65536
 _NOTSET = object()
 
 
-@asyncio.coroutine
-def create_connection(address, *, encoding=None, loop=None):
+async def create_connection(address, *, encoding=None, tracer=None):
     """Creates GibsonConnection connection.
     Opens connection to Gibson server specified by address argument.
 
@@ -24,48 +24,63 @@ def create_connection(address, *, encoding=None, loop=None):
         for (host, port) tcp connection.
     :param encoding: this argument can be used to decode byte-replies to
         strings. By default no decoding is done.
+    :param tracer: ``aiogibson.tracing.Tracer`` notified about every
+        command sent and reply received.
     """
     assert isinstance(address, (tuple, list, str)), "tuple or str expected"
 
     if isinstance(address, (list, tuple)):
         host, port = address
-        reader, writer = yield from asyncio.open_connection(
-            host, port, loop=loop)
+        reader, writer = await asyncio.open_connection(host, port)
     else:
-        reader, writer = yield from asyncio.open_unix_connection(
-            address, loop=loop)
+        reader, writer = await asyncio.open_unix_connection(address)
     conn = GibsonConnection(reader, writer, address=address,
-                            encoding=encoding, loop=loop)
+                            encoding=encoding, tracer=tracer)
     return conn
 
 
+def parse_address(address):
+    """Parses address given as string, for instance in command line.
+
+    :param address: ``str`` unix socket path or ``host:port``.
+    :return: ``str`` or ``tuple`` suitable for ``create_connection``.
+    """
+    host, sep, port = address.rpartition(':')
+    if sep and host and port.isdigit() and '/' not in address:
+        return host, int(port)
+    return address
+
+
 class GibsonConnection:
-    """Gibson connection."""
+    """Gibson connection, must be created from a running event loop."""
 
-    def __init__(self, reader, writer, address, *, encoding=None, loop=None):
-        if loop is None:
-            loop = asyncio.get_event_loop()
+    __slots__ = ('_reader', '_writer', '_loop', '_waiters', '_parser',
+                 '_reader_task', '_closing', '_closed', '_close_waiter',
+                 '_address', '_encoding', '_tracer')
+
+    def __init__(self, reader, writer, address, *, encoding=None,
+                 tracer=None):
         self._reader = reader
         self._writer = writer
-        self._loop = loop
+        self._loop = asyncio.get_running_loop()
         self._waiters = deque()
         self._parser = Reader()
-        self._reader_task = asyncio.Task(self._read_data(), loop=self._loop)
+        self._reader_task = asyncio.create_task(self._read_data())
         self._closing = False
         self._closed = False
-        self._close_waiter = asyncio.Future(loop=self._loop)
+        self._close_waiter = self._loop.create_future()
         self._reader_task.add_done_callback(self._close_waiter.set_result)
         self._address = address
         self._encoding = encoding
+        self._tracer = tracer
 
     def __repr__(self):
         return '<GibsonConnection {}>'.format(self._address)
 
-    @asyncio.coroutine
-    def _read_data(self):
+    async def _read_data(self):
         """Responses reader task."""
         while not self._reader.at_eof() and not self._closed:
-            data = yield from self._reader.read(MAX_CHUNK_SIZE)
+            data = await self._reader.read(MAX_CHUNK_SIZE)
             self._parser.feed(data)
             while True:
                 try:
@@ -79,7 +94,10 @@ class GibsonConnection:
                 else:
                     if obj is False:
                         break
-                    fut, encoding = self._waiters.popleft()
+                    fut, encoding, trace = self._waiters.popleft()
+                    if self._tracer is not None:
+                        self._tracer.on_reply(
+                            trace, obj, self._parser.last_reply_size)
                     if fut.done():  # waiter possibly
                         assert fut.cancelled(), (
                             "waiting future is in wrong state", fut, obj)
@@ -91,7 +109,9 @@ class GibsonConnection:
                             try:
                                 obj = obj.decode(encoding)
                             except Exception as exc:
-                                fut.set_exception(exc)
+                                # traceback would hold frame of this task,
+                                # clearing it (as unittest does) kills reader
+                                fut.set_exception(exc.with_traceback(None))
                                 continue
                         fut.set_result(obj)
 
@@ -113,14 +133,21 @@ class GibsonConnection:
             "Connection closed or corrupted")
         if command is None:
             raise TypeError("command must not be None")
-        if None in set(args):
+        if None in args:
             raise TypeError("args must not contain None")
         command = command.strip()
         data = encode_command(command, *args)
         if encoding is _NOTSET:
             encoding = self._encoding
-        fut = asyncio.Future(loop=self._loop)
-        self._waiters.append((fut, encoding))
+        # plain loop future is the fastest to create and resolve, reply
+        # encoding and tracer span wait next to it
+        fut = self._loop.create_future()
+        if self._tracer is None:
+            trace = None
+        else:
+            trace = self._tracer.on_send(consts.command_map[command], data,
+                                         len(self._waiters))
+        self._waiters.append((fut, encoding, trace))
         self._writer.write(data)
         return fut
 
@@ -139,15 +166,14 @@ class GibsonConnection:
         self._writer = None
         self._reader = None
         while self._waiters:
-            (waiter, _) = self._waiters.pop()
+            waiter, _, _ = self._waiters.pop()
             if exc is None:
                 waiter.cancel()
             else:
                 waiter.set_exception(exc)
 
-    @asyncio.coroutine
-    def wait_closed(self):
-        yield from self._close_waiter
+    async def wait_closed(self):
+        await self._close_waiter
 
     @property
     def closed(self):
@@ -162,3 +188,8 @@ class GibsonConnection:
     def encoding(self):
         """Current set codec or None."""
         return self._encoding
+
+    @property
+    def tracer(self):
+        """Installed tracer or None."""
+        return self._tracer
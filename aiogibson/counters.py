@@ -0,0 +1,225 @@
+"""Write-behind aggregation of counter increments:
+
+.. code:: python
+
+    counters = CounterAggregator(pool, interval=1)
+    counters.start()
+
+    counters.incr(b'hits:index')
+    counters.incr(b'bytes:sent', 512)
+    counters.decr(b'quota:user:42')
+    ...
+    counters.close()
+    await counters.wait_closed()
+
+Deltas are accumulated in memory per key and flushed every ``interval``
+seconds, or as soon as ``max_keys`` distinct keys are pending. Flush pipelines
+``inc``/``dec`` bursts over single connection, at most ``max_burst`` commands
+at once, the rest of big deltas is carried over to the next flush. Counters
+missing on the server are created with one ``set`` of the whole delta.
+"""
+import asyncio
+import logging
+
+from .pool import acquire
+
+__all__ = ['CounterAggregator']
+
+logger = logging.getLogger(__name__)
+
+
+class CounterAggregator:
+    """Local aggregator of ``inc``/``dec`` commands.
+
+    :param gibson: ``Gibson`` or ``GibsonPool`` instance.
+    :param interval: ``float`` seconds between periodic flushes.
+    :param max_keys: ``int`` number of pending keys triggering flush,
+        at most twice as many keys are kept, deltas of other keys are
+        dropped and counted in ``dropped``.
+    :param expire: ``int`` TTL for counters created by aggregator.
+    :param max_burst: ``int`` maximum number of ``inc``/``dec`` commands
+        repeating increments of existing counters in single flush.
+    """
+
+    def __init__(self, gibson, *, interval=1.0, max_keys=10000, expire=0,
+                 max_burst=10000):
+        if not isinstance(expire, int):
+            raise TypeError('expire must be int')
+        self._gibson = gibson
+        self._interval = interval
+        self._max_keys = max_keys
+        self._max_burst = max_burst
+        self._expire = expire
+        self._pending = {}
+        self._dropped = 0
+        self._task = None
+        self._flushing = None
+        self._closed = False
+
+    def __repr__(self):
+        return '<CounterAggregator pending={}>'.format(len(self._pending))
+
+    @property
+    def pending(self):
+        """``dict`` of deltas not flushed to server yet."""
+        return dict(self._pending)
+
+    @property
+    def dropped(self):
+        """Number of increments dropped because of memory bound."""
+        return self._dropped
+
+    @property
+    def closed(self):
+        """True if aggregator is closed."""
+        return self._closed
+
+    def incr(self, key, delta=1):
+        """Increment counter by given delta.
+
+        :param key: ``bytes`` counter key.
+        :param delta: ``int`` increment, may be negative.
+        :raises TypeError: if delta argument is not ``int``
+        """
+        if not isinstance(delta, int):
+            raise TypeError('delta must be int')
+        assert not self._closed, "CounterAggregator is closed"
+        pending = self._pending
+        if key in pending:
+            pending[key] += delta
+            return
+        if len(pending) >= 2 * self._max_keys:
+            self._dropped += abs(delta)
+            return
+        pending[key] = delta
+        if len(pending) >= self._max_keys and self._flushing is None:
+            self._flushing = asyncio.create_task(self._safe_flush())
+            self._flushing.add_done_callback(self._flush_done)
+
+    def decr(self, key, delta=1):
+        """Decrement counter by given delta.
+
+        :param key: ``bytes`` counter key.
+        :param delta: ``int`` decrement.
+        :raises TypeError: if delta argument is not ``int``
+        """
+        if not isinstance(delta, int):
+            raise TypeError('delta must be int')
+        self.incr(key, -delta)
+
+    def start(self):
+        """Start periodic flushes."""
+        assert not self._closed, "CounterAggregator is closed"
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def close(self):
+        """Stop periodic flushes and flush pending deltas."""
+        if self._closed:
+            return
+        self._closed = True
+        periodic = self._task
+        if periodic is not None:
+            periodic.cancel()
+        self._task = asyncio.create_task(self._final_flush(periodic))
+
+    async def wait_closed(self):
+        """Wait for final flush, deltas which failed to flush are left
+        in ``pending``."""
+        if self._task is not None:
+            await asyncio.wait([self._task])
+
+    async def flush(self):
+        """Flush pending deltas to server.
+
+        Deltas of commands failed with error are kept in ``pending``.
+
+        :return: ``int`` number of flushed keys.
+        """
+        batch, self._pending = self._pending, {}
+        batch = {key: delta for key, delta in batch.items() if delta}
+        try:
+            if batch:
+                failed, carried = await self._send(batch)
+                for rest in (failed, carried):
+                    for key, delta in rest.items():
+                        self._pending[key] = self._pending.get(key, 0) + delta
+                return len(batch) - len(failed)
+            return 0
+        except BaseException:
+            # connection failed, everything should be retried
+            for key, delta in batch.items():
+                self._pending[key] = self._pending.get(key, 0) + delta
+            raise
+
+    async def _send(self, batch):
+        failed = {}
+        carried = {}
+        budget = self._max_burst
+        async with acquire(self._gibson) as gibson:
+            # first command of each key also tells whether counter exists
+            keys = list(batch)
+            futs = [gibson.inc(key) if batch[key] > 0 else gibson.dec(key)
+                    for key in keys]
+            results = await asyncio.gather(
+                *futs, return_exceptions=True)
+
+            ops, futs = [], []
+            for key, res in zip(keys, results):
+                delta = batch[key]
+                if isinstance(res, BaseException):
+                    failed[key] = delta
+                elif res is None:
+                    ops.append((key, delta))
+                    futs.append(gibson.set(key, delta, self._expire))
+                else:
+                    step = 1 if delta > 0 else -1
+                    command = gibson.inc if delta > 0 else gibson.dec
+                    burst = min(abs(delta) - 1, budget)
+                    budget -= burst
+                    if abs(delta) - 1 > burst:
+                        carried[key] = delta - step * (burst + 1)
+                    for _ in range(burst):
+                        ops.append((key, step))
+                        futs.append(command(key))
+            results = await asyncio.gather(
+                *futs, return_exceptions=True)
+
+        for (key, delta), res in zip(ops, results):
+            if isinstance(res, BaseException) or res is None:
+                failed[key] = failed.get(key, 0) + delta
+        return failed, carried
+
+    def _flush_done(self, fut):
+        self._flushing = None
+
+    async def _safe_flush(self):
+        try:
+            await self.flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Failed to flush counters: %r", exc)
+
+    async def _final_flush(self, periodic):
+        # flushes started before close must finish first, their failed
+        # deltas are returned to pending
+        for task in (periodic, self._flushing):
+            if task is not None:
+                await asyncio.wait([task])
+        while self._pending:
+            try:
+                flushed = await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Failed to flush counters: %r", exc)
+                return
+            # big deltas are carried over, failed ones are left pending
+            if not flushed:
+                return
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._interval)
+            await self._safe_flush()
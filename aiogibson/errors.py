@@ -5,6 +5,7 @@ __all__ = [
     'ExpectedANumber',
     'MemoryLimitError',
     'KeyLockedError',
+    'OverloadError',
     ]
 
 
@@ -38,3 +39,8 @@ class MemoryLimitError(GibsonError):
 
 class KeyLockedError(GibsonError):
     """The specified key was locked by a `OP_LOCK` or a `OP_MLOCK` query."""
+
+
+class OverloadError(GibsonError):
+    """Command was shed by client side limiter without being sent, since
+    too many commands were waiting for their turn."""
@@ -0,0 +1,355 @@
+"""Hot key detection and client side caching of hot keys.
+
+``HotKeyTracer`` samples sent commands, key (or prefix) of every sampled
+command is counted in count-min sketch of its command and the most frequent
+ones are kept in top-K table, so hot keys are known before they overload the
+server:
+
+.. code:: python
+
+    hot = HotKeyTracer(sample=0.01)
+    pool = await create_pool('/tmp/gibson.sock', tracer=hot)
+    ...
+    for key, rate in hot.hot_keys(b'get', 10):
+        print(key, rate)
+    print(hot.hot_prefixes(b'get', separator=b':'))
+
+Counters are halved every ``window`` seconds, so estimates follow current
+traffic. ``HotCache`` wraps ``Gibson`` or ``GibsonPool`` and keeps values of
+keys read faster than ``threshold`` per second in small local cache for
+``ttl`` seconds, full cache admits new key only if it is estimated more
+frequent than the least recently used one (TinyLFU):
+
+.. code:: python
+
+    gibson = HotCache(pool, hot, threshold=1000, ttl=0.5, size=256)
+    value = await gibson.get(b'config:main')
+"""
+import random
+import time
+from collections import OrderedDict
+
+from . import consts
+from .commands import _KEY_WRITES, _to_bytes
+from .tracing import Tracer
+
+__all__ = ['CountMinSketch', 'HotKeyTracer', 'HotCache']
+
+_HEADER_SIZE = consts.REPL_SIZE + consts.OP_CODE_SIZE
+# commands without key or prefix argument are not counted
+_KEYLESS = frozenset([consts.OP_STATS, consts.OP_PING, consts.OP_END])
+
+
+class CountMinSketch:
+    """Count-min sketch, estimated counts are never lower than real ones.
+
+    :param width: ``int`` counters per row, error is about
+        ``total / width``.
+    :param depth: ``int`` number of rows, probability of bigger error
+        drops exponentially with depth.
+    """
+
+    __slots__ = ('_rows', '_width', 'total')
+
+    def __init__(self, width=2048, depth=4):
+        self._width = width
+        self._rows = [[0] * width for _ in range(depth)]
+        #: sum of all added counts
+        self.total = 0
+
+    def __repr__(self):
+        return '<CountMinSketch {}x{} total={}>'.format(
+            len(self._rows), self._width, self.total)
+
+    def _positions(self, key):
+        # double hashing, builtin hash is stable within process
+        h1 = hash(key)
+        h2 = hash((key, len(self._rows))) | 1
+        width = self._width
+        return [(h1 + i * h2) % width for i in range(len(self._rows))]
+
+    def add(self, key, count=1):
+        """Add ``count`` occurrences of the key.
+
+        :return: ``int`` new estimated count of the key.
+        """
+        self.total += count
+        estimate = None
+        for row, pos in zip(self._rows, self._positions(key)):
+            value = row[pos] + count
+            row[pos] = value
+            if estimate is None or value < estimate:
+                estimate = value
+        return estimate
+
+    def estimate(self, key):
+        """Estimated count of the key."""
+        return min(row[pos]
+                   for row, pos in zip(self._rows, self._positions(key)))
+
+    def halve(self):
+        """Halve all counters, so old occurrences fade away."""
+        self._rows = [[value >> 1 for value in row] for row in self._rows]
+        self.total >>= 1
+
+
+class _TopK:
+    # the most frequent keys with their estimates, minimum is searched only
+    # when key replaces another one or the minimal key grows
+
+    __slots__ = ('_size', 'counts', '_floor')
+
+    def __init__(self, size):
+        self._size = size
+        self.counts = {}
+        self._floor = 0
+
+    def offer(self, key, estimate):
+        counts = self.counts
+        if key in counts:
+            previous = counts[key]
+            counts[key] = estimate
+            if previous <= self._floor < estimate:
+                self._floor = min(counts.values())
+        elif len(counts) < self._size:
+            counts[key] = estimate
+            self._floor = min(self._floor, estimate) if len(counts) > 1 \
+                else estimate
+        elif estimate > self._floor:
+            del counts[min(counts, key=counts.get)]
+            counts[key] = estimate
+            self._floor = min(counts.values())
+
+    def halve(self):
+        self.counts = {key: value >> 1 for key, value in self.counts.items()
+                       if value > 1}
+        self._floor = min(self.counts.values()) if self.counts else 0
+
+
+class HotKeyTracer(Tracer):
+    """Tracer counting keys of sampled commands.
+
+    :param sample: ``float`` fraction of commands counted.
+    :param top: ``int`` number of the most frequent keys kept per command.
+    :param window: ``float`` seconds after which all counters are halved.
+    :param width: ``int`` width of count-min sketches.
+    :param depth: ``int`` depth of count-min sketches.
+    """
+
+    def __init__(self, *, sample=0.01, top=32, window=10.0, width=2048,
+                 depth=4):
+        self._sample = sample
+        self._top = top
+        self._window = window
+        self._width = width
+        self._depth = depth
+        self._random = random.random
+        self._sketches = {}
+        self._tops = {}
+        self._halved = self.clock()
+
+    def __repr__(self):
+        return '<HotKeyTracer sample={}>'.format(self._sample)
+
+    def on_send(self, op_code, data, queue_depth):
+        if self._sample < 1.0 and self._random() >= self._sample:
+            return None
+        if op_code in _KEYLESS:
+            return None
+        query = bytes(memoryview(data)[_HEADER_SIZE:])
+        if op_code == consts.OP_SET:
+            # set command starts with TTL
+            key = query.split(b' ', 2)[1]
+        else:
+            key = query.split(b' ', 1)[0]
+        self._record(op_code, key)
+        return None
+
+    def on_reply(self, span, reply, reply_size):
+        pass
+
+    def observe(self, command, key):
+        """Count command which did not reach the connection, for instance
+        served from local cache, it is sampled as well.
+
+        :param command: ``bytes`` gibson command, for instance ``b'get'``.
+        :param key: ``bytes`` key of the command.
+        """
+        if self._sample < 1.0 and self._random() >= self._sample:
+            return
+        self._record(consts.command_map[command], _to_bytes(key))
+
+    def _record(self, op_code, key):
+        now = self.clock()
+        if now - self._halved >= self._window:
+            self._halve(now)
+        sketch = self._sketches.get(op_code)
+        if sketch is None:
+            sketch = self._sketches[op_code] = CountMinSketch(
+                self._width, self._depth)
+            self._tops[op_code] = _TopK(self._top)
+        self._tops[op_code].offer(key, sketch.add(key))
+
+    def _halve(self, now):
+        # several windows could pass without traffic
+        while now - self._halved >= self._window:
+            for sketch in self._sketches.values():
+                sketch.halve()
+            for top in self._tops.values():
+                top.halve()
+            self._halved += self._window
+
+    def _rate(self, count):
+        # decayed count is between one and two windows worth of samples
+        return count / (self._sample * self._window * 1.5)
+
+    def rate(self, command, key):
+        """Approximate number of commands per second for the key.
+
+        :param command: ``bytes`` gibson command, for instance ``b'get'``.
+        :param key: ``bytes`` key of the command.
+        """
+        sketch = self._sketches.get(consts.command_map[command])
+        if sketch is None:
+            return 0.0
+        return self._rate(sketch.estimate(_to_bytes(key)))
+
+    def hot_keys(self, command, n=10):
+        """The most frequent keys of the command.
+
+        :param command: ``bytes`` gibson command, for instance ``b'get'``.
+        :param n: ``int`` number of returned keys.
+        :return: ``list`` of (key, commands per second) pairs, the hottest
+            first.
+        """
+        top = self._tops.get(consts.command_map[command])
+        if top is None:
+            return []
+        items = sorted(top.counts.items(), key=lambda item: -item[1])[:n]
+        return [(key, self._rate(count)) for key, count in items]
+
+    def hot_prefixes(self, command, n=10, separator=b':', depth=1):
+        """The most frequent prefixes among hot keys of the command.
+
+        :param command: ``bytes`` gibson command, for instance ``b'get'``.
+        :param n: ``int`` number of returned prefixes.
+        :param separator: ``bytes`` separator of key parts.
+        :param depth: ``int`` number of key parts in prefix.
+        :return: ``list`` of (prefix, commands per second) pairs, the
+            hottest first.
+        """
+        top = self._tops.get(consts.command_map[command])
+        if top is None:
+            return []
+        prefixes = {}
+        for key, count in top.counts.items():
+            parts = key.split(separator, depth)
+            prefix = separator.join(parts[:depth])
+            if len(parts) > depth:
+                prefix += separator
+            prefixes[prefix] = prefixes.get(prefix, 0) + count
+        items = sorted(prefixes.items(), key=lambda item: -item[1])[:n]
+        return [(prefix, self._rate(count)) for prefix, count in items]
+
+    def reset(self):
+        """Drop all counters."""
+        self._sketches = {}
+        self._tops = {}
+        self._halved = self.clock()
+
+
+class HotCache:
+    """``Gibson`` or ``GibsonPool`` wrapper caching hot keys locally.
+
+    :param gibson: ``Gibson`` or ``GibsonPool`` instance, ``tracer`` has to
+        be installed into its connections.
+    :param tracer: ``HotKeyTracer`` instance.
+    :param threshold: ``float`` gets per second key is promoted at.
+    :param ttl: ``float`` seconds values are cached for.
+    :param size: ``int`` maximum number of cached keys.
+    """
+
+    def __init__(self, gibson, tracer, *, threshold=1000, ttl=1.0,
+                 size=1024):
+        self._gibson = gibson
+        self._tracer = tracer
+        self._threshold = threshold
+        self._ttl = ttl
+        self._size = size
+        self._cache = OrderedDict()
+        self._clock = time.monotonic
+        self._counters = dict.fromkeys(
+            ('hits', 'misses', 'admitted', 'rejected'), 0)
+
+    def __repr__(self):
+        return '<HotCache {!r} keys={}>'.format(
+            self._gibson, len(self._cache))
+
+    @property
+    def counters(self):
+        """``dict`` with number of local ``hits`` and ``misses``, keys
+        ``admitted`` into cache and ``rejected`` by admission policy."""
+        return dict(self._counters)
+
+    @property
+    def keys(self):
+        """List of cached keys, the least recently used first."""
+        return list(self._cache)
+
+    async def get(self, key):
+        """Get the value for a given key, from local cache if key is hot.
+
+        :param key: ``bytes``  key to get.
+        :return: ``bytes`` if value exists else ``None``
+        """
+        key = _to_bytes(key)
+        entry = self._cache.get(key)
+        if entry is not None:
+            value, expires = entry
+            if expires > self._clock():
+                self._cache.move_to_end(key)
+                self._counters['hits'] += 1
+                self._tracer.observe(b'get', key)
+                return value
+            del self._cache[key]
+        self._counters['misses'] += 1
+        value = await self._gibson.get(key)
+        if value is not None and \
+                self._tracer.rate(b'get', key) >= self._threshold:
+            self._admit(key, value)
+        return value
+
+    def _admit(self, key, value):
+        cache = self._cache
+        if len(cache) >= self._size:
+            victim = next(iter(cache))
+            # TinyLFU: newcomer has to be more frequent than the victim
+            if self._tracer.rate(b'get', key) <= \
+                    self._tracer.rate(b'get', victim):
+                self._counters['rejected'] += 1
+                return
+            del cache[victim]
+        cache[key] = (value, self._clock() + self._ttl)
+        self._counters['admitted'] += 1
+
+    def invalidate(self, key=None):
+        """Drop cached copy of the key, or all of them."""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(_to_bytes(key), None)
+
+    def __getattr__(self, method):
+        func = getattr(self._gibson, method)
+        if method not in _KEY_WRITES:
+            return func
+
+        async def writer(key, *args, **kw):
+            key = _to_bytes(key)
+            self._cache.pop(key, None)
+            try:
+                return await func(key, *args, **kw)
+            finally:
+                # concurrent get could cache old value meanwhile
+                self._cache.pop(key, None)
+        return writer
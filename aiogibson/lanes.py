@@ -0,0 +1,221 @@
+"""Separate connection lanes for interactive and bulk commands.
+
+Reply of ``mget(b'')`` or ``keys`` over big keyspace takes long to produce
+and to parse, commands waiting for its connection, or for any connection
+when scans took the whole pool, wait as long. ``LanePool`` keeps two
+``GibsonPool`` lanes with their own size limits: single key commands go to
+the ``interactive`` lane, prefix commands and ``set`` of big values to the
+``bulk`` one, so ``get`` latency does not depend on concurrent scans:
+
+.. code:: python
+
+    pool = await create_lane_pool('/tmp/gibson.sock',
+                                  interactive=(4, 16), bulk=(1, 2))
+    value = await pool.get(b'user:1')
+    keys = await pool.keys(b'user:')
+    print(pool.lane('interactive').latency.summary())
+    print(pool.counters)
+
+Every lane records latency histogram of its commands, number of issued
+``commands``, ``errors``, commands which had to ``wait`` for free connection
+and ``in_flight`` commands.
+"""
+import asyncio
+
+from .commands import Gibson
+from .errors import GibsonError
+from .pool import create_pool
+from .tracing import LatencyHistogram, MultiTracer
+
+__all__ = ['create_lane_pool', 'LanePool', 'Lane', 'INTERACTIVE', 'BULK',
+           'BULK_COMMANDS']
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+# commands with prefix argument or big reply
+BULK_COMMANDS = frozenset([
+    'mset', 'mttl', 'mget', 'mdelete', 'minc', 'mdec', 'mlock', 'munlock',
+    'count', 'keys', 'meta_many', 'set_chunked', 'get_chunked',
+    'ttl_chunked', 'delete_chunked'])
+
+# set of value this big is routed to bulk lane
+BULK_VALUE_SIZE = 64 * 1024
+
+
+async def create_lane_pool(address, *, encoding=None, interactive=(2, 10),
+                           bulk=(1, 2), bulk_value_size=BULK_VALUE_SIZE,
+                           commands_factory=Gibson, tracer=None):
+    """Creates ``LanePool``.
+
+    :param address: unix socket path or (host, port) tuple.
+    :param encoding: ``str`` encoding used to decode replies.
+    :param interactive: (minsize, maxsize) of interactive lane.
+    :param bulk: (minsize, maxsize) of bulk lane.
+    :param bulk_value_size: ``int`` size of ``set`` value routed to bulk
+        lane.
+    :param commands_factory: see ``create_pool``.
+    :param tracer: ``aiogibson.tracing.Tracer`` installed into connections
+        of both lanes.
+    :return: ``LanePool`` instance.
+    """
+    lanes = []
+    try:
+        for name, (minsize, maxsize) in ((INTERACTIVE, interactive),
+                                         (BULK, bulk)):
+            latency = LatencyHistogram()
+            lane_tracer = latency
+            if tracer is not None:
+                lane_tracer = MultiTracer(latency, tracer)
+            pool = await create_pool(
+                address, encoding=encoding, minsize=minsize, maxsize=maxsize,
+                commands_factory=commands_factory, tracer=lane_tracer)
+            lanes.append(Lane(name, pool, latency))
+    except BaseException:
+        for lane in lanes:
+            await lane.pool.clear()
+        raise
+    return LanePool(*lanes, bulk_value_size=bulk_value_size)
+
+
+class Lane:
+    """Single lane of ``LanePool``.
+
+    :param name: ``str`` lane name.
+    :param pool: ``GibsonPool`` instance.
+    :param latency: ``LatencyHistogram`` installed into pool connections.
+    """
+
+    __slots__ = ('name', 'pool', 'latency', '_counters')
+
+    def __init__(self, name, pool, latency):
+        self.name = name
+        self.pool = pool
+        self.latency = latency
+        self._counters = dict.fromkeys(
+            ('commands', 'errors', 'waits', 'in_flight'), 0)
+
+    def __repr__(self):
+        return '<Lane {} size={} freesize={}>'.format(
+            self.name, self.pool.size, self.pool.freesize)
+
+    @property
+    def counters(self):
+        """``dict`` with number of issued ``commands``, ``errors`` replied,
+        commands which had to ``wait`` for connection and ``in_flight``
+        commands."""
+        return dict(self._counters)
+
+    async def call(self, method, *args, **kw):
+        """Run high level command on free connection of the lane."""
+        pool = self.pool
+        counters = self._counters
+        counters['commands'] += 1
+        if not pool.freesize and pool.size >= pool.maxsize:
+            counters['waits'] += 1
+        try:
+            async with pool.acquire() as gibson:
+                # commands waiting for connection are not in flight yet
+                counters['in_flight'] += 1
+                try:
+                    return await getattr(gibson, method)(*args, **kw)
+                finally:
+                    counters['in_flight'] -= 1
+        except GibsonError:
+            counters['errors'] += 1
+            raise
+
+
+class LanePool:
+    """Routes commands to interactive or bulk lane, see ``create_lane_pool``.
+
+    :param interactive: ``Lane`` of single key commands.
+    :param bulk: ``Lane`` of prefix commands and big values.
+    :param bulk_value_size: ``int`` size of ``set`` value routed to bulk
+        lane.
+    """
+
+    def __init__(self, interactive, bulk, *, bulk_value_size=BULK_VALUE_SIZE):
+        self._lanes = {INTERACTIVE: interactive, BULK: bulk}
+        self._bulk_value_size = bulk_value_size
+        self._callers = {}
+
+    def __repr__(self):
+        return '<LanePool {!r} {!r}>'.format(self._lanes[INTERACTIVE],
+                                             self._lanes[BULK])
+
+    def lane(self, name):
+        """``Lane`` by its name, ``INTERACTIVE`` or ``BULK``."""
+        return self._lanes[name]
+
+    @property
+    def counters(self):
+        """``dict`` mapping lane name to its counters."""
+        return {name: lane.counters for name, lane in self._lanes.items()}
+
+    def classify(self, method, args, kw=None):
+        """Name of the lane command is routed to.
+
+        :param method: ``str`` name of ``Gibson`` method.
+        :param args: positional arguments of the call.
+        :param kw: keyword arguments of the call.
+        """
+        if method in BULK_COMMANDS:
+            return BULK
+        if method == 'set':
+            if len(args) > 1:
+                value = args[1]
+            else:
+                value = (kw or {}).get('value')
+            if isinstance(value, (bytes, bytearray, str)) and \
+                    len(value) >= self._bulk_value_size:
+                return BULK
+        return INTERACTIVE
+
+    def acquire(self, lane=INTERACTIVE):
+        """Acquires connection of the lane, see ``GibsonPool.acquire``:
+
+        .. code:: python
+
+            async with pool.acquire(BULK) as gibson:
+                await gibson.mget(b'user:')
+        """
+        return self._lanes[lane].pool.acquire()
+
+    def iter_prefix(self, prefix, page_size=1000, max_bytes=None):
+        """Asynchronous iterator over key/value pairs with given prefix,
+        pages are fetched over bulk lane, see ``GibsonPool.iter_prefix``.
+
+        :return: ``PrefixIterator`` of (key, value) pairs.
+        """
+        return self._lanes[BULK].pool.iter_prefix(
+            prefix, page_size=page_size, max_bytes=max_bytes)
+
+    def iter_keys(self, prefix, page_size=1000):
+        """Asynchronous iterator over keys with given prefix, pages are
+        fetched over bulk lane.
+
+        :return: ``PrefixIterator`` of keys.
+        """
+        return self._lanes[BULK].pool.iter_keys(prefix, page_size=page_size)
+
+    async def clear(self):
+        """Close free connections of both lanes."""
+        await asyncio.gather(*[lane.pool.clear()
+                               for lane in self._lanes.values()])
+
+    def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        try:
+            return self._callers[method]
+        except KeyError:
+            pass
+        lanes = self._lanes
+        classify = self.classify
+
+        async def caller(*args, **kw):
+            lane = lanes[classify(method, args, kw)]
+            return await lane.call(method, *args, **kw)
+        self._callers[method] = caller
+        return caller
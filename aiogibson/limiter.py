@@ -0,0 +1,220 @@
+"""Adaptive limit of commands in flight.
+
+Server close to its memory limit replies with ``MemoryLimitError`` and gets
+slower, clients sending at full rate only make it worse. ``AdaptiveLimiter``
+wraps ``Gibson`` or ``GibsonPool`` and lets at most ``limit`` commands run at
+once, limit is adjusted AIMD way: it is multiplied by ``backoff`` when
+smoothed latency exceeds ``target_latency`` or server pushes back with
+``MemoryLimitError`` or ``KeyLockedError``, and grows by about one every
+``limit`` successful commands otherwise:
+
+.. code:: python
+
+    pool = await create_pool('/tmp/gibson.sock', minsize=4, maxsize=32)
+    gibson = AdaptiveLimiter(pool, initial=32, target_latency=0.005,
+                             max_queue=1000, queue_timeout=1.0)
+    await gibson.set(b'user:1', b'John')
+    print(gibson.limit, gibson.counters)
+
+Commands over the limit wait in FIFO queue, ``OverloadError`` is raised
+without sending the command when queue holds ``max_queue`` commands already
+or command waited longer than ``queue_timeout``.
+"""
+import asyncio
+import collections
+import time
+
+from .errors import (GibsonError, KeyLockedError, MemoryLimitError,
+                     OverloadError)
+
+__all__ = ['AdaptiveLimiter']
+
+# weight of the newest latency in smoothed one
+SMOOTHING = 0.2
+# errors meaning server asks clients to slow down
+PUSHBACK_ERRORS = (MemoryLimitError, KeyLockedError)
+
+
+class AdaptiveLimiter:
+    """``Gibson`` or ``GibsonPool`` wrapper limiting commands in flight.
+
+    :param gibson: ``Gibson`` or ``GibsonPool`` instance.
+    :param initial: ``int`` initial limit.
+    :param min_limit: ``int`` limit never drops below.
+    :param max_limit: ``int`` limit never grows over.
+    :param target_latency: ``float`` seconds, higher smoothed latency
+        shrinks the limit, ``None`` leaves only server pushback.
+    :param backoff: ``float`` factor limit is multiplied by on decrease.
+    :param max_queue: ``int`` maximum number of waiting commands, ``None``
+        for unbounded queue, ``0`` sheds every command over the limit.
+    :param queue_timeout: ``float`` seconds command may wait in queue,
+        ``None`` waits forever.
+    """
+
+    def __init__(self, gibson, *, initial=16, min_limit=1, max_limit=256,
+                 target_latency=0.05, backoff=0.7, max_queue=None,
+                 queue_timeout=None):
+        assert 0 < min_limit <= initial <= max_limit, (
+            min_limit, initial, max_limit)
+        assert 0 < backoff < 1, backoff
+        self._gibson = gibson
+        self._limit = float(initial)
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._target_latency = target_latency
+        self._backoff = backoff
+        self._max_queue = max_queue
+        self._queue_timeout = queue_timeout
+        self._in_flight = 0
+        self._waiters = collections.deque()
+        self._latency = None
+        # commands sent before last decrease do not decrease limit again
+        self._decreased_at = float('-inf')
+        self._clock = time.monotonic
+        self._callers = {}
+        self._counters = dict.fromkeys(
+            ('commands', 'queued', 'shed', 'pushbacks', 'increases',
+             'decreases'), 0)
+
+    def __repr__(self):
+        return '<AdaptiveLimiter {!r} limit={} in_flight={}>'.format(
+            self._gibson, self.limit, self._in_flight)
+
+    @property
+    def limit(self):
+        """Current limit of commands in flight."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        """Number of commands in flight."""
+        return self._in_flight
+
+    @property
+    def queued(self):
+        """Number of commands waiting for their turn."""
+        return len(self._waiters)
+
+    @property
+    def latency(self):
+        """Smoothed latency in seconds, ``None`` before first reply."""
+        return self._latency
+
+    @property
+    def counters(self):
+        """``dict`` with number of ``commands``, ``queued`` and ``shed``
+        commands, ``pushbacks`` of server and limit ``increases`` and
+        ``decreases``."""
+        return dict(self._counters)
+
+    async def _enter(self):
+        self._counters['commands'] += 1
+        if not self._waiters and self._in_flight < int(self._limit):
+            self._in_flight += 1
+            return
+        if self._max_queue is not None and \
+                len(self._waiters) >= self._max_queue:
+            self._counters['shed'] += 1
+            raise OverloadError("Too many commands waiting")
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self._counters['queued'] += 1
+        try:
+            if self._queue_timeout is None:
+                await fut
+            else:
+                await asyncio.wait_for(fut, self._queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(fut)
+            self._counters['shed'] += 1
+            raise OverloadError("Command waited too long") from None
+        except BaseException:
+            if fut.done() and not fut.cancelled():
+                # slot was granted to cancelled command, pass it on
+                self._leave()
+            else:
+                self._discard(fut)
+            raise
+
+    def _discard(self, fut):
+        try:
+            self._waiters.remove(fut)
+        except ValueError:
+            pass
+
+    def _leave(self):
+        self._in_flight -= 1
+        self._wakeup()
+
+    def _wakeup(self):
+        waiters = self._waiters
+        while waiters and self._in_flight < int(self._limit):
+            fut = waiters.popleft()
+            if not fut.done():
+                self._in_flight += 1
+                fut.set_result(None)
+
+    def _update(self, started, pushback):
+        now = self._clock()
+        latency = now - started
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency += SMOOTHING * (latency - self._latency)
+        if pushback:
+            self._counters['pushbacks'] += 1
+        slow = self._target_latency is not None and \
+            self._latency > self._target_latency
+        if pushback or slow:
+            # one decrease per round trip, replies of commands sent before
+            # it reflect old limit
+            if started >= self._decreased_at and \
+                    self._limit > self._min_limit:
+                self._limit = max(self._min_limit,
+                                  self._limit * self._backoff)
+                self._decreased_at = now
+                self._counters['decreases'] += 1
+        elif self._in_flight * 2 >= int(self._limit) and \
+                self._limit < self._max_limit:
+            # grow only if limit is actually used
+            self._limit = min(self._max_limit, self._limit + 1 / self._limit)
+            self._counters['increases'] += 1
+
+    async def call(self, method, *args, **kw):
+        """Call command of wrapped instance once limit allows.
+
+        :param method: ``str`` name of ``Gibson`` method.
+        :raises OverloadError: if command was shed.
+        """
+        await self._enter()
+        started = self._clock()
+        try:
+            result = await getattr(self._gibson, method)(*args, **kw)
+        except PUSHBACK_ERRORS:
+            self._update(started, True)
+            raise
+        except GibsonError:
+            self._update(started, False)
+            raise
+        else:
+            self._update(started, False)
+            return result
+        finally:
+            # cancelled commands and broken connections do not change limit
+            self._leave()
+
+    def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        try:
+            return self._callers[method]
+        except KeyError:
+            pass
+        # nice AttributeError in case method is not found
+        getattr(self._gibson, method)
+        call = self.call
+
+        async def caller(*args, **kw):
+            return await call(method, *args, **kw)
+        self._callers[method] = caller
+        return caller
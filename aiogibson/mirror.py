@@ -0,0 +1,189 @@
+"""Dual-write mirroring for migration between gibson servers.
+
+``Mirror`` wraps two targets, every command is executed on the primary one
+and its reply is returned to the caller. Successful writes are then repeated
+on the secondary target in background, without waiting for its reply, so
+slow or failing secondary never adds latency to the primary path:
+
+.. code:: python
+
+    old = await create_pool('/tmp/gibson.sock')
+    new = await create_pool(('10.0.0.2', 10128))
+    gibson = Mirror(old, new, shadow_reads=0.01)
+
+    await gibson.set(b'foo', b'bar')
+    value = await gibson.get(b'foo')
+    print(gibson.counters)
+
+Fraction of reads can be shadowed to the secondary as well, its replies are
+compared with primary ones and mismatches are counted as divergences.
+Number of in flight secondary commands is bounded by ``max_pending``, extra
+writes are dropped (and counted) instead of queued.
+
+.. note:: Commands mirrored through ``GibsonPool`` may be reordered since
+   they run over different connections, wrap single ``Gibson`` instance if
+   strict ordering of writes matters.
+"""
+import asyncio
+import logging
+import random
+
+from .commands import Gibson
+
+__all__ = ['Mirror', 'WRITE_COMMANDS', 'READ_COMMANDS']
+
+logger = logging.getLogger(__name__)
+
+READ_COMMANDS = frozenset(['get', 'mget', 'keys', 'count', 'get_chunked'])
+# commands executed on primary target only
+_PRIMARY_COMMANDS = frozenset([
+    'ping', 'stats', 'end', 'close', 'wait_closed', 'closed', 'iter_prefix',
+    'iter_keys'])
+# every other command of ``Gibson`` is mirrored, so new writers are not
+# missed
+WRITE_COMMANDS = frozenset(
+    name for name in dir(Gibson)
+    if not name.startswith(('_', 'meta')) and
+    name not in READ_COMMANDS and name not in _PRIMARY_COMMANDS)
+# replies of these commands are compared regardless of item order
+_UNORDERED_COMMANDS = frozenset(['mget', 'keys'])
+
+
+class Mirror:
+    """Mirroring wrapper of two ``Gibson`` or ``GibsonPool`` instances.
+
+    Commands which are neither writes nor shadowed reads (``ping``,
+    ``stats``, ``meta_*``...) are executed on primary target only.
+
+    :param primary: ``Gibson`` or ``GibsonPool`` instance serving replies.
+    :param secondary: ``Gibson`` or ``GibsonPool`` instance receiving
+        copies of writes.
+    :param shadow_reads: ``float`` fraction of reads repeated on secondary
+        target for comparison.
+    :param max_pending: ``int`` maximum number of secondary commands in
+        flight.
+    :param on_divergence: callable called as ``on_divergence(command, args,
+        primary_reply, secondary_reply)`` when shadowed read differs.
+    """
+
+    def __init__(self, primary, secondary, *, shadow_reads=0.0,
+                 max_pending=1000, on_divergence=None):
+        self._primary = primary
+        self._secondary = secondary
+        self._shadow_reads = shadow_reads
+        self._max_pending = max_pending
+        self._on_divergence = on_divergence
+        self._pending = set()
+        self._counters = dict.fromkeys(
+            ('mirrored', 'dropped', 'secondary_errors', 'shadow_reads',
+             'divergences'), 0)
+
+    def __repr__(self):
+        return '<Mirror {!r} -> {!r}>'.format(self._primary, self._secondary)
+
+    @property
+    def primary(self):
+        """Target serving replies."""
+        return self._primary
+
+    @property
+    def secondary(self):
+        """Target receiving mirrored writes."""
+        return self._secondary
+
+    @property
+    def pending(self):
+        """Number of secondary commands in flight."""
+        return len(self._pending)
+
+    @property
+    def counters(self):
+        """``dict`` with number of ``mirrored`` writes, ``dropped`` writes,
+        ``secondary_errors``, ``shadow_reads`` and ``divergences``."""
+        return dict(self._counters)
+
+    async def wait_pending(self):
+        """Wait for secondary commands in flight."""
+        while self._pending:
+            await asyncio.wait(list(self._pending))
+
+    def __getattr__(self, method):
+        if method in WRITE_COMMANDS:
+            async def writer(*args, **kw):
+                resp = await getattr(self._primary, method)(*args, **kw)
+                self._send_secondary(method, args, kw, self._write_done)
+                self._counters['mirrored'] += 1
+                return resp
+            return writer
+
+        if method in READ_COMMANDS:
+            async def reader(*args, **kw):
+                resp = await getattr(self._primary, method)(*args, **kw)
+                if self._shadow_reads and \
+                        random.random() < self._shadow_reads:
+                    self._send_secondary(
+                        method, args, kw,
+                        lambda fut: self._read_done(fut, method, args, resp))
+                    self._counters['shadow_reads'] += 1
+                return resp
+            return reader
+
+        return getattr(self._primary, method)
+
+    def _send_secondary(self, method, args, kw, callback):
+        if len(self._pending) >= self._max_pending:
+            self._counters['dropped'] += 1
+            return
+        try:
+            fut = getattr(self._secondary, method)(*args, **kw)
+        except Exception as exc:
+            # for instance secondary connection is already closed
+            self._counters['secondary_errors'] += 1
+            logger.debug("Mirrored %s failed: %r", method, exc)
+            return
+        if asyncio.iscoroutine(fut):
+            fut = asyncio.create_task(fut)
+        self._pending.add(fut)
+        fut.add_done_callback(self._pending.discard)
+        fut.add_done_callback(callback)
+
+    def _failed(self, fut):
+        if fut.cancelled():
+            self._counters['secondary_errors'] += 1
+            return True
+        exc = fut.exception()
+        if exc is not None:
+            self._counters['secondary_errors'] += 1
+            logger.debug("Mirrored command failed: %r", exc)
+            return True
+        return False
+
+    def _write_done(self, fut):
+        self._failed(fut)
+
+    def _read_done(self, fut, method, args, primary_resp):
+        if self._failed(fut):
+            return
+        resp = fut.result()
+        if method in _UNORDERED_COMMANDS:
+            # items are listed in server order, which may differ
+            diverged = _unordered(method, resp) != \
+                _unordered(method, primary_resp)
+        else:
+            diverged = resp != primary_resp
+        if diverged:
+            self._counters['divergences'] += 1
+            if self._on_divergence is not None:
+                try:
+                    self._on_divergence(method, args, primary_resp, resp)
+                except Exception:
+                    logger.exception("Divergence callback %r failed",
+                                     self._on_divergence)
+
+
+def _unordered(method, resp):
+    if resp is None:
+        return None
+    if method == 'mget':
+        return sorted(zip(resp[::2], resp[1::2]), key=lambda pair: pair[0])
+    return sorted(resp)
@@ -0,0 +1,342 @@
+"""Near cache shared by worker processes of one host.
+
+``SharedCache`` is hash table in memory mapped file, ``/dev/shm`` for
+instance, so all local workers share single copy of hot values. Table is
+split into buckets of ``BUCKET_SIZE`` fixed size slots, key is stored in any
+slot of its bucket, the one expiring first is evicted when bucket is full.
+Readers never lock: every slot has sequence number which writer makes odd
+while slot is modified, readers retry if number changed under them
+(seqlock). Writers of the same bucket are serialized with ``fcntl`` record
+lock on bucket.
+
+``NearCache`` wraps ``Gibson`` or ``GibsonPool`` and serves ``get`` from the
+shared cache, other commands are passed through, the ones modifying keys
+drop local copy first:
+
+.. code:: python
+
+    cache = SharedCache('/dev/shm/gibson.cache', slots=65536)
+    gibson = NearCache(await create_pool('/tmp/gibson.sock'), cache,
+                       ttl=0.5)
+    value = await gibson.get(b'config:main')
+
+Writes made by other hosts are not seen until cached copy expires, so
+``ttl`` bounds staleness of values.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import time
+
+from .commands import _KEY_WRITES, _to_bytes
+
+__all__ = ['SharedCache', 'NearCache', 'BUCKET_SIZE']
+
+MAGIC = b'AGBNEAR1'
+BUCKET_SIZE = 8
+# seqlock readers give up after this many attempts, miss is reported
+READ_RETRIES = 16
+
+# magic, number of slots, slot size
+_FILE_HEADER = struct.Struct('<8sII')
+# sequence, key hash, expiration timestamp, value type, key size,
+# value size
+_SLOT = struct.Struct('<IQdBHI')
+_SEQ = struct.Struct('<I')
+_NUMBER = struct.Struct('<q')
+
+_BYTES, _INT, _STR = 1, 2, 3
+
+
+def _hash(key):
+    # builtin hash is randomized per process
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(),
+                          'little')
+
+
+class SharedCache:
+    """Fixed size hash table in shared memory mapped file.
+
+    File is created if it does not exist, processes opening the same file
+    must use the same ``slots`` and ``slot_size``.
+
+    :param path: ``str`` path of backing file.
+    :param slots: ``int`` number of slots, rounded up to multiple of
+        ``BUCKET_SIZE``.
+    :param slot_size: ``int`` size of slot in bytes, key and value have to
+        fit into it together with 27 bytes of slot header.
+    :raises ValueError: if existing file has different geometry
+    """
+
+    def __init__(self, path, *, slots=65536, slot_size=512):
+        if slot_size <= _SLOT.size:
+            raise ValueError('slot_size must be greater than {}'.format(
+                _SLOT.size))
+        buckets = max(1, -(-slots // BUCKET_SIZE))
+        self._path = path
+        self._buckets = buckets
+        self._slot_size = slot_size
+        self._bucket_bytes = BUCKET_SIZE * slot_size
+        size = _FILE_HEADER.size + buckets * self._bucket_bytes
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # concurrent creators wait for the first one to write header
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self._fd).st_size == 0:
+                    os.ftruncate(self._fd, size)
+                    os.pwrite(self._fd, _FILE_HEADER.pack(
+                        MAGIC, buckets * BUCKET_SIZE, slot_size), 0)
+                header = os.pread(self._fd, _FILE_HEADER.size, 0)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            magic, file_slots, file_slot_size = _FILE_HEADER.unpack(header)
+            if (magic != MAGIC or file_slots != buckets * BUCKET_SIZE or
+                    file_slot_size != slot_size):
+                raise ValueError('{!r} is not a cache of {} slots of {} '
+                                 'bytes'.format(path, slots, slot_size))
+            self._mm = mmap.mmap(self._fd, size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def __repr__(self):
+        return '<SharedCache {!r} slots={}>'.format(
+            self._path, self._buckets * BUCKET_SIZE)
+
+    @property
+    def max_item_size(self):
+        """Maximum size of key and value stored together."""
+        return self._slot_size - _SLOT.size
+
+    def close(self):
+        """Unmap the file, it is kept for other processes."""
+        if self._fd is not None:
+            self._mm.close()
+            os.close(self._fd)
+            self._fd = None
+
+    def _bucket(self, hash_):
+        return _FILE_HEADER.size + (hash_ % self._buckets) * \
+            self._bucket_bytes
+
+    def _read(self, offset):
+        # consistent copy of slot header and data, None while slot is
+        # being modified
+        mm = self._mm
+        for _ in range(READ_RETRIES):
+            seq, = _SEQ.unpack_from(mm, offset)
+            if seq & 1:
+                continue
+            header = _SLOT.unpack_from(mm, offset)
+            start = offset + _SLOT.size
+            data = mm[start:start + header[4] + header[5]]
+            if _SEQ.unpack_from(mm, offset)[0] == seq:
+                return header, data
+        return None
+
+    def get(self, key):
+        """Get cached value.
+
+        :param key: ``bytes`` key.
+        :return: cached value or ``None`` if key is missing or expired.
+        """
+        key = _to_bytes(key)
+        hash_ = _hash(key)
+        bucket = self._bucket(hash_)
+        now = time.time()
+        mm = self._mm
+        for offset in self._slots(bucket):
+            # cheap check of the hash before consistent read
+            if _SLOT.unpack_from(mm, offset)[1] != hash_:
+                continue
+            slot = self._read(offset)
+            if slot is None:
+                continue
+            (_, slot_hash, expires, type_, key_size, _), data = slot
+            if slot_hash != hash_ or not type_ or data[:key_size] != key:
+                continue
+            if expires <= now:
+                return None
+            value = data[key_size:]
+            if type_ == _INT:
+                return _NUMBER.unpack(value)[0]
+            if type_ == _STR:
+                return value.decode('utf-8')
+            return value
+        return None
+
+    def set(self, key, value, ttl):
+        """Store value for ``ttl`` seconds.
+
+        :param key: ``bytes`` key.
+        :param value: ``bytes``, ``str`` or ``int`` value.
+        :param ttl: ``float`` seconds to keep value.
+        :return: ``bool`` False if value does not fit into slot.
+        """
+        key = _to_bytes(key)
+        if isinstance(value, int):
+            type_, data = _INT, _NUMBER.pack(value)
+        elif isinstance(value, str):
+            type_, data = _STR, value.encode('utf-8')
+        else:
+            type_, data = _BYTES, bytes(value)
+        if len(key) + len(data) > self.max_item_size:
+            self.delete(key)
+            return False
+        hash_ = _hash(key)
+        bucket = self._bucket(hash_)
+        now = time.time()
+        with self._locked(bucket):
+            offset = self._slot_for(bucket, key, hash_, now)
+            self._write(offset, hash_, now + ttl, type_, key, data)
+        return True
+
+    def delete(self, key):
+        """Drop cached value.
+
+        :param key: ``bytes`` key.
+        :return: ``bool`` True if value was cached.
+        """
+        key = _to_bytes(key)
+        hash_ = _hash(key)
+        bucket = self._bucket(hash_)
+        found = False
+        with self._locked(bucket):
+            for offset in self._slots(bucket):
+                if self._matches(offset, key, hash_):
+                    self._write(offset, 0, 0.0, 0, b'', b'')
+                    found = True
+        return found
+
+    def clear(self):
+        """Drop all cached values."""
+        for bucket in range(self._buckets):
+            offset = _FILE_HEADER.size + bucket * self._bucket_bytes
+            with self._locked(offset):
+                for slot in self._slots(offset):
+                    self._write(slot, 0, 0.0, 0, b'', b'')
+
+    def _slots(self, bucket):
+        return range(bucket, bucket + self._bucket_bytes, self._slot_size)
+
+    def _matches(self, offset, key, hash_):
+        # called under bucket lock, so slot is consistent
+        _, slot_hash, _, type_, key_size, _ = _SLOT.unpack_from(
+            self._mm, offset)
+        start = offset + _SLOT.size
+        return (type_ and slot_hash == hash_ and
+                self._mm[start:start + key_size] == key)
+
+    def _slot_for(self, bucket, key, hash_, now):
+        victim, victim_expires = bucket, None
+        for offset in self._slots(bucket):
+            if self._matches(offset, key, hash_):
+                return offset
+            _, _, expires, type_, _, _ = _SLOT.unpack_from(self._mm, offset)
+            if not type_ or expires <= now:
+                expires = 0.0
+            if victim_expires is None or expires < victim_expires:
+                victim, victim_expires = offset, expires
+        return victim
+
+    def _write(self, offset, hash_, expires, type_, key, data):
+        mm = self._mm
+        seq, = _SEQ.unpack_from(mm, offset)
+        # odd sequence tells readers slot is being modified
+        _SEQ.pack_into(mm, offset, (seq + 1) & 0xffffffff)
+        start = offset + _SLOT.size
+        mm[start:start + len(key)] = key
+        mm[start + len(key):start + len(key) + len(data)] = data
+        _SLOT.pack_into(mm, offset, (seq + 1) & 0xffffffff, hash_, expires,
+                        type_, len(key), len(data))
+        _SEQ.pack_into(mm, offset, (seq + 2) & 0xffffffff)
+
+    def _locked(self, bucket):
+        return _RecordLock(self._fd, bucket, self._bucket_bytes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+class _RecordLock:
+
+    __slots__ = ('_fd', '_start', '_length')
+
+    def __init__(self, fd, start, length):
+        self._fd = fd
+        self._start = start
+        self._length = length
+
+    def __enter__(self):
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, self._length, self._start)
+
+    def __exit__(self, exc_type, exc_value, tb):
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, self._length, self._start)
+
+
+class NearCache:
+    """``Gibson`` or ``GibsonPool`` wrapper serving ``get`` from
+    ``SharedCache``.
+
+    Prefix commands (``mset``, ``mdelete``...) do not invalidate cached
+    copies, they expire after ``ttl``.
+
+    :param gibson: ``Gibson`` or ``GibsonPool`` instance.
+    :param cache: ``SharedCache`` instance.
+    :param ttl: ``float`` seconds values are cached for.
+    """
+
+    def __init__(self, gibson, cache, *, ttl=1.0):
+        self._gibson = gibson
+        self._cache = cache
+        self._ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return '<NearCache {!r} {!r}>'.format(self._gibson, self._cache)
+
+    @property
+    def cache(self):
+        """``SharedCache`` instance."""
+        return self._cache
+
+    async def get(self, key):
+        """Get the value for a given key, from shared cache if possible.
+
+        :param key: ``bytes``  key to get.
+        :return: ``bytes`` if value exists else ``None``
+        """
+        value = self._cache.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = await self._gibson.get(key)
+        if value is not None:
+            self._cache.set(key, value, self._ttl)
+        return value
+
+    def invalidate(self, key):
+        """Drop cached copy of the key."""
+        return self._cache.delete(key)
+
+    def __getattr__(self, method):
+        func = getattr(self._gibson, method)
+        if method not in _KEY_WRITES:
+            return func
+
+        async def writer(key, *args, **kw):
+            self._cache.delete(key)
+            try:
+                return await func(key, *args, **kw)
+            finally:
+                # concurrent reader could cache old value meanwhile
+                self._cache.delete(key)
+        return writer
@@ -0,0 +1,270 @@
+"""Negative lookup cache for keys known to be missing.
+
+``NegativeCache`` wraps ``Gibson`` or ``GibsonPool``, ``get`` of a key which
+was reported missing less than ``ttl`` seconds ago returns ``None`` without
+round trip. Optionally Bloom filter of all keys with given prefix is built
+from ``keys`` snapshot and rebuilt every ``rebuild_interval`` seconds, keys
+absent from the filter are definitely missing and skipped as well:
+
+.. code:: python
+
+    pool = await create_pool('/tmp/gibson.sock')
+    gibson = NegativeCache(pool, ttl=1.0, bloom_prefix=b'user:')
+    gibson.start()
+    value = await gibson.get(b'user:42')
+    print(gibson.counters)
+    ...
+    gibson.close()
+    await gibson.wait_closed()
+
+Keys written with ``set`` through the wrapper are added to the filter and
+dropped from recent misses, keys created by other clients become visible
+after next rebuild, or once their miss expires.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+from collections import OrderedDict
+
+from .commands import _to_bytes
+
+__all__ = ['BloomFilter', 'NegativeCache']
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Bloom filter of ``bytes`` keys.
+
+    :param capacity: ``int`` expected number of keys.
+    :param error_rate: ``float`` false positive rate at ``capacity`` keys.
+    """
+
+    __slots__ = ('_bits', '_size', '_hashes', 'count')
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        size = int(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self._size = max(size, 8)
+        self._hashes = max(1, round(self._size / capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+        #: number of added keys
+        self.count = 0
+
+    def __repr__(self):
+        return '<BloomFilter bits={} hashes={} count={}>'.format(
+            self._size, self._hashes, self.count)
+
+    def _positions(self, key):
+        # double hashing, two 64 bit halves of single digest
+        digest = hashlib.blake2b(_to_bytes(key), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        size = self._size
+        return [(h1 + i * h2) % size for i in range(self._hashes)]
+
+    def add(self, key):
+        """Add key to the filter."""
+        bits = self._bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self._bits
+        for pos in self._positions(key):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class NegativeCache:
+    """``Gibson`` or ``GibsonPool`` wrapper skipping ``get`` of keys known
+    to be missing, other commands are passed through.
+
+    :param gibson: ``Gibson`` or ``GibsonPool`` instance.
+    :param ttl: ``float`` seconds missing key is remembered, ``0`` disables
+        recent misses.
+    :param max_misses: ``int`` maximum number of remembered misses, the
+        oldest ones are forgotten first.
+    :param bloom_prefix: ``bytes`` prefix of keys covered by Bloom filter,
+        ``None`` disables the filter.
+    :param rebuild_interval: ``float`` seconds between filter rebuilds.
+    :param error_rate: ``float`` false positive rate of the filter.
+    """
+
+    def __init__(self, gibson, *, ttl=1.0, max_misses=10000,
+                 bloom_prefix=None, rebuild_interval=60.0, error_rate=0.01):
+        self._gibson = gibson
+        self._ttl = ttl
+        self._max_misses = max_misses
+        self._misses = OrderedDict()
+        self._bloom_prefix = _to_bytes(bloom_prefix)
+        self._rebuild_interval = rebuild_interval
+        self._error_rate = error_rate
+        self._bloom = None
+        # keys set while filter is being rebuilt, added to the new one
+        self._written = None
+        # key of get in flight -> [number of gets, generation], generation
+        # is bumped when key is set meanwhile
+        self._lookups = {}
+        self._loop = asyncio.get_running_loop()
+        self._task = None
+        self._closed = False
+        self._counters = dict.fromkeys(
+            ('lookups', 'miss_skips', 'bloom_skips', 'false_positives',
+             'rebuilds'), 0)
+
+    def __repr__(self):
+        return '<NegativeCache {!r}>'.format(self._gibson)
+
+    @property
+    def counters(self):
+        """``dict`` with number of ``lookups``, gets skipped thanks to
+        recent misses (``miss_skips``) and to the filter
+        (``bloom_skips``), ``false_positives`` of the filter and filter
+        ``rebuilds``."""
+        return dict(self._counters)
+
+    @property
+    def bloom(self):
+        """Current ``BloomFilter`` or ``None``."""
+        return self._bloom
+
+    @property
+    def closed(self):
+        """True if cache is closed."""
+        return self._closed
+
+    async def get(self, key):
+        """Get the value for a given key, ``None`` without round trip if
+        key is known to be missing.
+
+        :param key: ``bytes``  key to get.
+        :return: ``bytes`` if value exists else ``None``
+        """
+        self._counters['lookups'] += 1
+        key = _to_bytes(key)
+        expires = self._misses.get(key)
+        if expires is not None:
+            if expires > self._loop.time():
+                self._counters['miss_skips'] += 1
+                return None
+            del self._misses[key]
+
+        bloom = self._bloom
+        covered = bloom is not None and key.startswith(self._bloom_prefix)
+        if covered and key not in bloom:
+            self._counters['bloom_skips'] += 1
+            return None
+
+        lookup = self._lookups.get(key)
+        if lookup is None:
+            lookup = self._lookups[key] = [0, 0]
+        lookup[0] += 1
+        generation = lookup[1]
+        try:
+            value = await self._gibson.get(key)
+        finally:
+            lookup[0] -= 1
+            if not lookup[0]:
+                del self._lookups[key]
+        if value is None:
+            if covered:
+                self._counters['false_positives'] += 1
+            # reply could be sent before concurrent set of the key
+            if lookup[1] == generation:
+                self._remember(key)
+        return value
+
+    def _remember(self, key):
+        if not self._ttl:
+            return
+        self._misses[key] = self._loop.time() + self._ttl
+        self._misses.move_to_end(key)
+        while len(self._misses) > self._max_misses:
+            self._misses.popitem(last=False)
+
+    async def set(self, key, value, expire=0):
+        """Set the value for the given key, see ``Gibson.set``, key stops
+        being known missing."""
+        key = _to_bytes(key)
+        self._forget(key)
+        return await self._gibson.set(key, value, expire)
+
+    def _forget(self, key):
+        self._misses.pop(key, None)
+        lookup = self._lookups.get(key)
+        if lookup is not None:
+            lookup[1] += 1
+        if self._bloom_prefix is not None and \
+                key.startswith(self._bloom_prefix):
+            if self._bloom is not None:
+                self._bloom.add(key)
+            if self._written is not None:
+                self._written.append(key)
+
+    def invalidate(self, key=None):
+        """Forget recent miss of the key, or all of them."""
+        if key is None:
+            self._misses.clear()
+        else:
+            self._misses.pop(_to_bytes(key), None)
+
+    def __getattr__(self, method):
+        return getattr(self._gibson, method)
+
+    async def rebuild(self):
+        """Build Bloom filter from snapshot of keys with ``bloom_prefix``.
+
+        :return: ``BloomFilter`` instance.
+        """
+        assert self._bloom_prefix is not None, "Bloom filter is disabled"
+        self._written = []
+        try:
+            keys = (await self._gibson.keys(self._bloom_prefix)) or []
+            written = self._written
+            # room for keys written till next rebuild
+            bloom = BloomFilter(int((len(keys) + len(written)) * 1.25) + 64,
+                                self._error_rate)
+            for key in keys:
+                bloom.add(key)
+            for key in written:
+                bloom.add(key)
+        finally:
+            self._written = None
+        self._bloom = bloom
+        self._counters['rebuilds'] += 1
+        return bloom
+
+    def start(self):
+        """Start periodic rebuilds of Bloom filter."""
+        assert not self._closed, "NegativeCache is closed"
+        if self._bloom_prefix is not None and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def close(self):
+        """Stop rebuilds and drop the filter."""
+        if self._closed:
+            return
+        self._closed = True
+        self._bloom = None
+        if self._task is not None:
+            self._task.cancel()
+
+    async def wait_closed(self):
+        if self._task is not None:
+            await asyncio.wait([self._task])
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                await self.rebuild()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # stale filter could hide new keys, so it is dropped
+                self._bloom = None
+                logger.warning("Failed to rebuild Bloom filter: %r", exc)
+            await asyncio.sleep(self._rebuild_interval)
@@ -0,0 +1,291 @@
+"""Prefix scans spread over several processes.
+
+Parsing ``mget`` replies of millions of keys is CPU bound, so single process
+does not get faster with more cores. Here prefix is split into child
+prefixes of similar size (using ``count``, the same way ``PrefixIterator``
+does), parts are scanned by worker processes, every one over its own
+connection, and only results of ``mapper`` called on every page travel back
+to the parent, streamed through bounded queue as pages are scanned:
+
+.. code:: python
+
+    def value_bytes(page):
+        return sum(len(value) for key, value in page)
+
+    total = await reduce_parallel('/tmp/gibson.sock', b'user:',
+                                  value_bytes, operator.add, processes=8)
+
+    async for keys in iter_parallel('/tmp/gibson.sock', b'user:',
+                                    keys_only=True):
+        print(len(keys))
+
+``mapper`` and ``combine`` are sent to workers, so they must be picklable,
+module level functions for instance. ``combine`` has to be associative,
+since pages are combined within every part first and part results are
+combined in the order parts finish. ``reduce_parallel`` folds results of
+every part in the worker as pages arrive, so it holds single aggregate per
+part.
+"""
+import asyncio
+import concurrent.futures
+import heapq
+import multiprocessing
+import os
+from queue import Empty
+
+from .commands import Gibson, create_gibson
+from .connection import create_connection
+from .scan import PrefixIterator, CHILD_BYTES
+
+__all__ = ['split_prefix', 'iter_parallel', 'reduce_parallel']
+
+# parts per worker, more parts balance load better but every part costs
+# its own connection and few count commands
+PARTS_PER_PROCESS = 4
+# results of ``iter_parallel`` waiting for consumer, bounds memory used
+# when consumer is slower than workers
+QUEUE_SIZE = 64
+
+
+async def split_prefix(gibson, prefix=b'', parts=16):
+    """Split prefix into at least ``parts`` disjoint parts if there are
+    enough keys, the largest part is split first.
+
+    :param gibson: ``Gibson`` or ``GibsonPool`` instance.
+    :param prefix: ``bytes`` prefix to split.
+    :param parts: ``int`` wanted number of parts.
+    :return: sorted ``list`` of (prefix, exact) pairs, exact part stands
+        for single key equal to its prefix.
+    """
+    if isinstance(prefix, str):
+        prefix = prefix.encode('utf-8')
+    count = (await gibson.count(prefix)) or 0
+    if not count:
+        return []
+    heap = [(-count, prefix)]
+    exact = []
+    while heap and len(heap) + len(exact) < parts:
+        count, prefix = heap[0]
+        if -count <= 1:
+            break
+        heapq.heappop(heap)
+        counts = await asyncio.gather(
+            *[gibson.count(prefix + byte) for byte in CHILD_BYTES])
+        counts = [child_count or 0 for child_count in counts]
+        if -count > sum(counts):
+            exact.append((prefix, True))
+        for byte, child_count in zip(CHILD_BYTES, counts):
+            if child_count:
+                heapq.heappush(heap, (-child_count, prefix + byte))
+    return sorted([(prefix, False) for _, prefix in heap] + exact)
+
+
+async def _pages(gibson, prefix, exact, page_size, keys_only):
+    if exact:
+        value = await gibson.get(prefix)
+        if value is not None:
+            yield [prefix] if keys_only else [(prefix, value)]
+        return
+    it = PrefixIterator(gibson, prefix, page_size=page_size,
+                        keys_only=keys_only)
+    while True:
+        page = await it.next_page()
+        if page is None:
+            return
+        yield page
+
+
+async def _scan(address, part, mapper, combine, page_size, keys_only,
+                encoding, stream):
+    prefix, exact = part
+    if stream is not None:
+        queue, stop = stream
+        if stop.is_set():
+            return 0
+    conn = await create_connection(address, encoding=encoding)
+    gibson = Gibson(conn)
+    # part could be emptied meanwhile, there is nothing to combine then
+    found, result = False, None
+    pages = 0
+    try:
+        async for page in _pages(gibson, prefix, exact, page_size,
+                                 keys_only):
+            if stream is None:
+                result = combine(result, mapper(page)) if found \
+                    else mapper(page)
+                found = True
+                continue
+            if stop.is_set():
+                break
+            # worker runs single part, so blocking put only waits for
+            # parent to catch up
+            queue.put(mapper(page))
+            pages += 1
+    finally:
+        conn.close()
+        await conn.wait_closed()
+    if stream is not None:
+        return pages
+    return found, result
+
+
+def _scan_part(*args):
+    # runs in worker process
+    return asyncio.run(_scan(*args))
+
+
+def _identity(page):
+    return page
+
+
+async def _run_parts(address, prefix, mapper, combine, *, processes,
+                     parts, page_size, keys_only, encoding, executor,
+                     queue_size=None):
+    gibson = await create_gibson(address)
+    try:
+        if parts is None:
+            parts = (processes or os.cpu_count() or 1) * PARTS_PER_PROCESS
+        split = await split_prefix(gibson, prefix, parts)
+    finally:
+        gibson.close()
+        await gibson.wait_closed()
+
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ProcessPoolExecutor(processes)
+    manager = stream = None
+    if queue_size is not None:
+        manager = multiprocessing.Manager()
+        stream = manager.Queue(queue_size), manager.Event()
+    tasks = [executor.submit(
+        _scan_part, address, part, mapper or _identity, combine, page_size,
+        keys_only, encoding, stream) for part in split]
+    futs = [asyncio.wrap_future(task) for task in tasks]
+    results = None
+    finished = False
+    try:
+        if stream is None:
+            for fut in asyncio.as_completed(futs):
+                yield await fut
+        else:
+            results = _drain(stream, futs)
+            async for result in results:
+                yield result
+        finished = True
+    finally:
+        for task in tasks:
+            task.cancel()
+        if stream is not None:
+            if results is not None:
+                await results.aclose()
+            await _stop(stream, tasks)
+            manager.shutdown()
+        if own_executor:
+            # do not block the loop waiting for abandoned parts
+            executor.shutdown(wait=finished)
+
+
+async def _drain(stream, futs):
+    # workers put results into the queue as pages are scanned, every part
+    # returns number of results it has put, so it is known when all of
+    # them were received
+    queue, _ = stream
+    loop = asyncio.get_running_loop()
+    pending = set(futs)
+    expected = 0
+    received = 0
+    getter = None
+    try:
+        while pending or received < expected:
+            if getter is None:
+                getter = loop.run_in_executor(None, queue.get)
+            done, pending = await asyncio.wait(
+                pending | {getter}, return_when=asyncio.FIRST_COMPLETED)
+            pending.discard(getter)
+            for fut in done:
+                if fut is not getter:
+                    expected += fut.result()
+            if getter in done:
+                result = getter.result()
+                getter = None
+                received += 1
+                yield result
+    finally:
+        if getter is not None:
+            # iteration was abandoned, wake up the getter
+            queue.put(None)
+            await asyncio.wait([getter])
+
+
+async def _stop(stream, tasks):
+    # parts still running are asked to stop and blocked ones released, so
+    # proxies they hold do not outlive the manager
+    queue, stop = stream
+    stop.set()
+    while not all(task.done() for task in tasks):
+        try:
+            while True:
+                queue.get_nowait()
+        except Empty:
+            pass
+        await asyncio.sleep(0.01)
+
+
+async def iter_parallel(address, prefix=b'', mapper=None, *,
+                        processes=None, parts=None, page_size=1000,
+                        keys_only=False, encoding=None, executor=None,
+                        queue_size=QUEUE_SIZE):
+    """Asynchronous iterator over results of ``mapper`` called on every
+    page of keys with given prefix, pages are scanned in parallel and
+    results are sent back as soon as they are produced.
+
+    :param address: unix socket path or (host, port) tuple.
+    :param prefix: ``bytes`` prefix of keys.
+    :param mapper: picklable callable called on every page in worker
+        process, ``None`` sends pages themselves.
+    :param processes: ``int`` number of worker processes, number of cores
+        by default.
+    :param parts: ``int`` number of parts prefix is split into, four per
+        process by default.
+    :param page_size: ``int`` maximum number of items in one reply.
+    :param keys_only: ``bool`` pages hold keys instead of (key, value)
+        pairs.
+    :param encoding: ``str`` encoding used to decode values in workers.
+    :param executor: ``concurrent.futures.Executor`` to run parts in,
+        process pool with ``processes`` workers is created if ``None``.
+    :param queue_size: ``int`` maximum number of results waiting to be
+        consumed, workers pause scanning when it is reached.
+    """
+    results = _run_parts(
+        address, prefix, mapper, None, processes=processes, parts=parts,
+        page_size=page_size, keys_only=keys_only, encoding=encoding,
+        executor=executor, queue_size=queue_size)
+    try:
+        async for result in results:
+            yield result
+    finally:
+        # workers are stopped as soon as iteration is abandoned
+        await results.aclose()
+
+
+async def reduce_parallel(address, prefix, mapper, combine, initial=None, *,
+                          processes=None, parts=None, page_size=1000,
+                          keys_only=False, encoding=None, executor=None):
+    """Aggregate keys with given prefix in parallel, ``mapper`` result of
+    every page is folded with ``combine`` in worker process and only
+    aggregates of parts are sent back.
+
+    Arguments are the same as for ``iter_parallel``.
+
+    :param combine: picklable associative callable of two mapper results.
+    :param initial: result returned if there are no keys.
+    :return: aggregate of all pages.
+    """
+    result = initial
+    async for found, part in _run_parts(
+            address, prefix, mapper, combine, processes=processes,
+            parts=parts, page_size=page_size, keys_only=keys_only,
+            encoding=encoding, executor=executor):
+        if found:
+            result = part if result is None else combine(result, part)
+    return result
@@ -28,13 +28,18 @@ suitable to send over socket to *gibson* server:
 
 >>> encode_command(b'set', 3600, 'foo', 3.14)
 b'\\x0f\\x00\\x00\\x00\\x01\\x003600 foo 3.14'
+
+and ``encode_reply``, its server side counterpart:
+
+>>> encode_reply(consts.REPL_VAL, b'bar')
+b'\\x06\\x00\\x00\\x03\\x00\\x00\\x00bar'
 """
 import struct
 from . import consts
 from . import errors
 
 
-__all__ = ['encode_command', 'Reader']
+__all__ = ['encode_command', 'encode_reply', 'Reader']
 
 
 class Reader(object):
@@ -43,14 +48,12 @@ class Reader(object):
     functionality to handle I/O
     """
 
+    __slots__ = ('_buffer', 'last_reply_size')
+
     def __init__(self):
         self._buffer = bytearray()
-        self._payload = bytearray()
-        self._is_header = False
-        self._is_payload = False
-        self._resp_size = None
-        self._gb_encoding = None
-        self._code = None
+        #: size in bytes of the last parsed reply payload
+        self.last_reply_size = 0
 
     def feed(self, data):
         """Put raw chunk of data obtained from connection to buffer.
@@ -68,105 +71,81 @@ class Reader(object):
 
         :return: ``False`` there is no full reply or parsed obj.
         """
-        if not self._is_header and len(self._buffer) >= consts.HEADER_SIZE:
-            reply = self._buffer[:consts.HEADER_SIZE]
-            unpacked = struct.unpack(b'<HBI', reply)
-            self._code, self._gb_encoding, self._resp_size = unpacked
-            self._is_header = True
-
-        if (self._is_header and not self._is_payload and
-                (len(self._buffer) >= self._resp_size + consts.HEADER_SIZE)):
-
-            start = consts.HEADER_SIZE
-            end = consts.HEADER_SIZE + self._resp_size
-            data = self._buffer[start:end]
-            self._payload.extend(data)
-            self._is_payload = True
-
-        if self._is_header and self._is_payload:
-            values = self._parse_replay()
-            self._reset()
-            return values
-        return False
-
-    def _parse_replay(self):
-        if self._code == consts.REPL_ERR:
-            resp = errors.GibsonServerError()
-        elif self._code == consts.REPL_OK:
+        buffer = self._buffer
+        if len(buffer) < consts.HEADER_SIZE:
+            return False
+        code, encoding, size = _REPLY_HEADER.unpack_from(buffer)
+        end = consts.HEADER_SIZE + size
+        if len(buffer) < end:
+            return False
+
+        if code == consts.REPL_VAL:
+            resp = _parse_value(buffer, consts.HEADER_SIZE, end, encoding)
+        elif code == consts.REPL_KVAL:
+            resp = _parse_kv(buffer, consts.HEADER_SIZE)
+        elif code == consts.REPL_OK:
             resp = True
-        elif self._code == consts.REPL_ERR_NOT_FOUND:
+        elif code == consts.REPL_ERR_NOT_FOUND:
             resp = None
-        elif self._code == consts.REPL_ERR_NAN:
+        elif code == consts.REPL_ERR:
+            resp = errors.GibsonServerError()
+        elif code == consts.REPL_ERR_NAN:
             resp = errors.ExpectedANumber()
-        elif self._code == consts.REPL_ERR_MEM:
+        elif code == consts.REPL_ERR_MEM:
             resp = errors.MemoryLimitError()
-        elif self._code == consts.REPL_ERR_LOCKED:
+        elif code == consts.REPL_ERR_LOCKED:
             resp = errors.KeyLockedError()
-        elif self._code == consts.REPL_VAL:
-            resp = self._parse_value(self._payload, self._gb_encoding)
-        elif self._code == consts.REPL_KVAL:
-            resp = self._parse_kv(self._payload)
         else:
             raise errors.ProtocolError()
+        # bytearray drops its head in place, without copying the rest
+        del buffer[:end]
+        self.last_reply_size = size
         return resp
 
-    def _parse_kv(self, data):
-        # parse key/value replay from Gibson server
-        pairs_num = struct.unpack('I', data[:consts.REPL_SIZE])[0]
-        result = []
-        offset = consts.REPL_SIZE
-
-        for i in range(pairs_num):
-            # unpack key size
-            key_size = \
-                struct.unpack('I', data[offset: offset + consts.REPL_SIZE])[0]
-            offset += consts.REPL_SIZE
-            # unpack key
-            key = bytes(data[offset: offset + key_size])
-            result.append(key)
-            offset += key_size
-            # unpack value encoding
-            value_gb_encoding = struct.unpack('B', data[offset: offset + 1])[0]
-            offset += 1
-            # unpack value size
-            value_size = \
-                struct.unpack('I', data[offset: offset + consts.REPL_SIZE])[0]
-            offset += consts.REPL_SIZE
-            # unpack value
-            value = self._parse_value(data[offset: offset + value_size],
-                                      value_gb_encoding)
-            result.append(value)
-            offset += value_size
-        return result
-
-    def _parse_value(self, data, encoding):
-        # parse simple value replay from Gibson server.
-        # apply gibson encoding if needed
-        if encoding == consts.GB_ENC_NUMBER:
-            return struct.unpack('q', data)[0]
-        elif encoding == consts.GB_ENC_PLAIN:
-            return bytes(data)
-        else:
-            raise errors.ProtocolError()
 
-    def _reset(self):
-        # replay parsed, buffer should be prepared for next server
-        # reply
-        self._buffer = self._buffer[consts.HEADER_SIZE + self._resp_size:]
-        self._payload = bytearray()
-        self._is_header = False
-        self._is_payload = False
-        self._resp_size = None
-        self._gb_encoding = None
-        self._code = None
+def _parse_value(data, start, end, encoding):
+    # parse simple value replay from Gibson server.
+    # apply gibson encoding if needed
+    if encoding == consts.GB_ENC_PLAIN:
+        return bytes(data[start:end])
+    elif encoding == consts.GB_ENC_NUMBER:
+        return _NUMBER.unpack_from(data, start)[0]
+    else:
+        raise errors.ProtocolError()
+
+
+def _parse_kv(data, offset):
+    # parse key/value replay from Gibson server
+    pairs_num, = _SIZE.unpack_from(data, offset)
+    offset += consts.REPL_SIZE
+    result = []
+    for _ in range(pairs_num):
+        key_size, = _SIZE.unpack_from(data, offset)
+        offset += consts.REPL_SIZE
+        result.append(bytes(data[offset:offset + key_size]))
+        offset += key_size
+        encoding, value_size = _KV_VALUE_HEADER.unpack_from(data, offset)
+        offset += _KV_VALUE_HEADER.size
+        result.append(_parse_value(data, offset, offset + value_size,
+                                   encoding))
+        offset += value_size
+    return result
+
+
+_REQUEST_HEADER = struct.Struct('<IH')
+_REPLY_HEADER = struct.Struct('<HBI')
+_SIZE = struct.Struct('<I')
+_KV_VALUE_HEADER = struct.Struct('<BI')
+_NUMBER = struct.Struct('<q')
 
 
 _converters = {
-    bytes: lambda val: val,
-    bytearray: lambda val: val,
+    bytes: None,
+    bytearray: None,
+    memoryview: None,
     str: lambda val: val.encode('utf-8'),
-    int: lambda val: str(val).encode('utf-8'),
-    float: lambda val: str(val).encode('utf-8'),
+    int: lambda val: b'%d' % val,
+    float: lambda val: repr(val).encode('ascii'),
     }
 
 
@@ -179,16 +158,51 @@ def encode_command(command, *args):
     :param args: required arguments for given command.
     :return: ``bytes`` packed and encoded command.
     """
-    _args = []
-    for arg in args:
-        if type(arg) in _converters:
-            _args.append(_converters[type(arg)](arg))
-        else:
-            raise TypeError("Argument {!r} expected to be of bytes,"
-                            " str, int or float type".format(arg))
+    if len(args) == 1 and type(args[0]) is bytes:
+        # most of commands take single key, send it as is
+        query = args[0]
+    else:
+        query = []
+        for arg in args:
+            try:
+                convert = _converters[type(arg)]
+            except KeyError:
+                raise TypeError(
+                    "Argument {!r} expected to be of bytes, str, int or "
+                    "float type".format(arg)) from None
+            query.append(arg if convert is None else convert(arg))
+        query = b' '.join(query)
 
     op_code = consts.command_map[command]
-    query = b' '.join(_args)
-    fmt = '<IH{}s'.format(len(query))
-    data = struct.pack(fmt, consts.OP_CODE_SIZE + len(query), op_code, query)
-    return data
+    return _REQUEST_HEADER.pack(consts.OP_CODE_SIZE + len(query),
+                                op_code) + query
+
+
+def _encode_value(value):
+    if isinstance(value, int):
+        return consts.GB_ENC_NUMBER, _NUMBER.pack(value)
+    return consts.GB_ENC_PLAIN, bytes(value)
+
+
+def encode_reply(code, value=None):
+    """Pack *gibson* reply according to gibson binary protocol.
+
+    :param code: ``int``, reply code, one of ``consts.REPL_*``.
+    :param value: ``bytes`` or ``int`` for ``REPL_VAL`` reply, list of
+        (key, value) pairs for ``REPL_KVAL`` reply, ignored otherwise.
+    :return: ``bytes`` packed reply.
+    """
+    if code == consts.REPL_VAL:
+        encoding, data = _encode_value(value)
+        return _REPLY_HEADER.pack(code, encoding, len(data)) + data
+    if code == consts.REPL_KVAL:
+        parts = [_SIZE.pack(len(value))]
+        for key, val in value:
+            encoding, data = _encode_value(val)
+            parts.append(_SIZE.pack(len(key)))
+            parts.append(key)
+            parts.append(_KV_VALUE_HEADER.pack(encoding, len(data)))
+            parts.append(data)
+        data = b''.join(parts)
+        return _REPLY_HEADER.pack(code, consts.GB_ENC_PLAIN, len(data)) + data
+    return _REPLY_HEADER.pack(code, consts.GB_ENC_PLAIN, 1) + b'\x00'
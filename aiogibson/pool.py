@@ -6,26 +6,22 @@
     import asyncio
     from aiogibson import create_pool
 
-    loop = asyncio.get_event_loop()
+    async def go():
+        pool = await create_pool('/tmp/gibson.sock', minsize=5, maxsize=10)
 
-    @asyncio.coroutine
-    def go():
-        pool = yield from create_pool('/tmp/gibson.sock', minsize=5,
-                                      maxsize=10, loop=loop)
-
-        with (yield from pool) as gibson:
-            yield from gibson.set('foo', 'bar')
-            value = yield from gibson.get('foo')
+        async with pool.acquire() as gibson:
+            await gibson.set('foo', 'bar')
+            value = await gibson.get('foo')
             print(value)
 
         # or without context manager
-        yield from pool.set('foo', 'bar')
-        resp = yield from pool.get('foo')
-        yield from pool.delete('foo')
+        await pool.set('foo', 'bar')
+        resp = await pool.get('foo')
+        await pool.delete('foo')
 
-        pool.clear()
+        await pool.clear()
 
-    loop.run_until_complete(go())
+    asyncio.run(go())
 """
 # reference implementation:
 # https://github.com/aio-libs/aioredis/blob/master/aioredis/pool.py
@@ -34,13 +30,13 @@
 import asyncio
 
 from .commands import create_gibson, Gibson
+from .scan import PrefixIterator
 
-__all__ = ['create_pool', 'GibsonPool']
+__all__ = ['create_pool', 'GibsonPool', 'PoolPrefixIterator', 'acquire']
 
 
-@asyncio.coroutine
-def create_pool(address, *, encoding=None, minsize=10, maxsize=10,
-                commands_factory=Gibson, loop=None):
+async def create_pool(address, *, encoding=None, minsize=10, maxsize=10,
+                      commands_factory=Gibson, tracer=None):
     """Creates Gibson Pool.
 
     By default it creates pool of commands_factory instances, but it is
@@ -53,26 +49,28 @@ def create_pool(address, *, encoding=None, minsize=10, maxsize=10,
     pool = GibsonPool(address, encoding=encoding,
                       minsize=minsize, maxsize=maxsize,
                       commands_factory=commands_factory,
-                      loop=loop)
-    yield from pool._fill_free()
+                      tracer=tracer)
+    await pool._fill_free()
     return pool
 
 
 class GibsonPool:
-    """Gibson connections pool.
+    """Gibson connections pool, must be created from a running event loop.
     """
 
+    __slots__ = ('_address', '_minsize', '_factory', '_pool', '_used',
+                 '_encoding', '_tracer', '_callers', '__weakref__')
+
     def __init__(self, address, encoding=None,
-                 *, minsize, maxsize, commands_factory, loop=None):
-        if loop is None:
-            loop = asyncio.get_event_loop()
+                 *, minsize, maxsize, commands_factory, tracer=None):
         self._address = address
         self._minsize = minsize
         self._factory = commands_factory
-        self._loop = loop
-        self._pool = asyncio.Queue(maxsize, loop=loop)
+        self._pool = asyncio.Queue(maxsize)
         self._used = set()
         self._encoding = encoding
+        self._tracer = tracer
+        self._callers = {}
 
     @property
     def minsize(self):
@@ -98,33 +96,41 @@ class GibsonPool:
         """
         return self._pool.qsize()
 
-    @asyncio.coroutine
-    def clear(self):
+    async def clear(self):
         """Clear pool connections.
 
         Close and remove all free connections.
         """
         while not self._pool.empty():
-            conn = yield from self._pool.get()
+            conn = await self._pool.get()
             conn.close()
-            yield from conn.wait_closed()
+            await conn.wait_closed()
 
     @property
     def encoding(self):
         """Current set codec or None."""
         return self._encoding
 
-    @asyncio.coroutine
     def acquire(self):
         """Acquires a connection from free pool.
 
-        Creates new connection if needed.
+        Creates new connection if needed. Result can be awaited for the
+        connection, which must be returned with ``release``, or used as
+        asynchronous context manager releasing connection on exit:
+
+        .. code:: python
+
+            async with pool.acquire() as gibson:
+                await gibson.set('foo', 'bar')
         """
-        yield from self._fill_free()
+        return _PoolContextManager(self)
+
+    async def _acquire(self):
+        await self._fill_free()
         if self.minsize > 0 or not self._pool.empty():
-            conn = yield from self._pool.get()
+            conn = await self._pool.get()
         else:
-            conn = yield from self._create_new_connection()
+            conn = await self._create_new_connection()
         assert not conn.closed, conn
         assert conn not in self._used, (conn, self._used)
         self._used.add(conn)
@@ -143,55 +149,129 @@ class GibsonPool:
                 # consider this connection as old and close it.
                 conn.close()
 
-    @asyncio.coroutine
-    def _fill_free(self):
+    async def _fill_free(self):
         while self.freesize < self.minsize and self.size < self.maxsize:
-            conn = yield from self._create_new_connection()
-            yield from self._pool.put(conn)
-
-    @asyncio.coroutine
-    def _create_new_connection(self):
-        conn = yield from create_gibson(self._address,
-                                        encoding=self._encoding,
-                                        commands_factory=self._factory,
-                                        loop=self._loop)
+            conn = await self._create_new_connection()
+            await self._pool.put(conn)
+
+    async def _create_new_connection(self):
+        conn = await create_gibson(self._address,
+                                   encoding=self._encoding,
+                                   commands_factory=self._factory,
+                                   tracer=self._tracer)
         return conn
 
+    def iter_prefix(self, prefix, page_size=1000, max_bytes=None):
+        """Asynchronous iterator over key/value pairs with given prefix,
+        see ``Gibson.iter_prefix``. Connection is acquired for every page,
+        so it is not held while the caller processes items.
+
+        :return: ``PrefixIterator`` of (key, value) pairs.
+        """
+        return PoolPrefixIterator(self, prefix, page_size=page_size,
+                                  max_bytes=max_bytes)
+
+    def iter_keys(self, prefix, page_size=1000):
+        """Asynchronous iterator over keys with given prefix, see
+        ``Gibson.iter_keys``.
+
+        :return: ``PrefixIterator`` of keys.
+        """
+        return PoolPrefixIterator(self, prefix, page_size=page_size,
+                                  keys_only=True)
+
     def __enter__(self):
         raise RuntimeError(
-            "'yield from' should be used as a context manager expression")
+            "'async with pool.acquire()' should be used instead")
 
     def __exit__(self, *args):
         pass    # pragma: nocover
 
-    def __iter__(self):
-        # this method is needed to allow `yield`ing from pool
-        conn = yield from self.acquire()
-        return _ConnectionContextManager(self, conn)
-
     def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        try:
+            return self._callers[method]
+        except KeyError:
+            pass
+
         # we have nice AttributeError here in case *method* is not found in
         # Gibson class (high level interface)
-        @asyncio.coroutine
-        def caller(*args, **kw):
-            with (yield from self) as gibson:
-                resp = yield from getattr(gibson, method)(*args, **kw)
-            return resp
+        async def caller(*args, **kw):
+            conn = await self._acquire()
+            try:
+                return await getattr(conn, method)(*args, **kw)
+            finally:
+                self.release(conn)
+        self._callers[method] = caller
         return caller
 
 
+class PoolPrefixIterator(PrefixIterator):
+    """``PrefixIterator`` over ``GibsonPool``, or any object with
+    ``acquire`` method, holding connection only while page is fetched, so
+    ``count`` commands of single page are still pipelined.
+    """
+
+    async def next_page(self):
+        pool = self._gibson
+        async with pool.acquire() as gibson:
+            self._gibson = gibson
+            try:
+                return await super().next_page()
+            finally:
+                self._gibson = pool
+
+
+def acquire(target):
+    """Acquires single high-level connection from ``GibsonPool``, or
+    wraps ``Gibson`` instance, so commands issued in a row are pipelined
+    over one connection regardless of target type:
+
+    .. code:: python
+
+        async with acquire(target) as gibson:
+            futs = [gibson.meta_left(key) for key in keys]
+            lefts = await asyncio.gather(*futs)
+
+    :param target: ``Gibson`` or ``GibsonPool`` instance.
+    :return: asynchronous context manager returning ``Gibson`` instance.
+    """
+    if isinstance(target, GibsonPool):
+        return target.acquire()
+    return _ConnectionContextManager(target)
+
+
 class _ConnectionContextManager:
 
+    __slots__ = ('_conn',)
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    async def __aenter__(self):
+        return self._conn
+
+    async def __aexit__(self, exc_type, exc_value, tb):
+        self._conn = None
+
+
+class _PoolContextManager:
+
     __slots__ = ('_pool', '_conn')
 
-    def __init__(self, pool, conn):
+    def __init__(self, pool):
         self._pool = pool
-        self._conn = conn
+        self._conn = None
 
-    def __enter__(self):
+    def __await__(self):
+        return self._pool._acquire().__await__()
+
+    async def __aenter__(self):
+        self._conn = await self._pool._acquire()
         return self._conn
 
-    def __exit__(self, exc_type, exc_value, tb):
+    async def __aexit__(self, exc_type, exc_value, tb):
         try:
             self._pool.release(self._conn)
         finally:
@@ -0,0 +1,261 @@
+"""Traffic recording and replay.
+
+``Recorder`` is a tracer writing every sent command with its timestamp to
+binary log, install it into connection or pool to capture production
+traffic:
+
+.. code:: python
+
+    recorder = Recorder('/tmp/gibson.rec', sample=0.1)
+    pool = await create_pool('/tmp/gibson.sock', tracer=recorder)
+    ...
+    recorder.close()
+
+Log can be played back against another server with ``replay`` coroutine or
+from command line, at recorded speed, ``N`` times faster or as fast as
+possible (``--speed 0``)::
+
+    $ python -m aiogibson.record info /tmp/gibson.rec
+    $ python -m aiogibson.record replay /tmp/gibson.rec /tmp/gibson.sock \\
+        --speed 2 --connections 4
+
+Log starts with ``MAGIC`` followed by records, every record is ``RECORD``
+header (seconds since recording started, operation code, query size) and
+query bytes exactly as sent over the wire. Records are buffered in memory
+and written to file in ``buffer_size`` blocks, recording stops once
+``max_bytes`` are written.
+"""
+import argparse
+import asyncio
+import json
+import random
+import struct
+import sys
+
+from . import consts
+from .connection import create_connection, parse_address
+from .errors import GibsonError
+from .tracing import Tracer, LatencyHistogram, command_name
+
+__all__ = ['Recorder', 'read_log', 'replay']
+
+MAGIC = b'AGBREC\x00\x01'
+RECORD = struct.Struct('<dHI')
+_HEADER_SIZE = consts.REPL_SIZE + consts.OP_CODE_SIZE
+
+
+class Recorder(Tracer):
+    """Tracer writing sent commands to binary log.
+
+    :param path: ``str`` path of log file, it is truncated.
+    :param sample: ``float`` fraction of commands to record.
+    :param buffer_size: ``int`` bytes buffered before writing to file.
+    :param max_bytes: ``int`` maximum size of log, ``None`` for unbounded.
+    """
+
+    def __init__(self, path, *, sample=1.0, buffer_size=65536,
+                 max_bytes=None):
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._sample = sample
+        self._buffer_size = buffer_size
+        self._max_bytes = max_bytes
+        self._buffer = bytearray()
+        self._written = len(MAGIC)
+        self._started = self.clock()
+        self._random = random.random
+        self.recorded = 0
+        self.dropped = 0
+
+    def __repr__(self):
+        return '<Recorder {!r} recorded={}>'.format(self._file.name,
+                                                    self.recorded)
+
+    @property
+    def closed(self):
+        """True if recorder is closed."""
+        return self._file.closed
+
+    def on_send(self, op_code, data, queue_depth):
+        if self._file.closed:
+            return None
+        if self._sample < 1.0 and self._random() >= self._sample:
+            return None
+        size = len(data) - _HEADER_SIZE
+        if (self._max_bytes is not None and self._written +
+                len(self._buffer) + RECORD.size + size > self._max_bytes):
+            self.dropped += 1
+            return None
+        self._buffer += RECORD.pack(self.clock() - self._started, op_code,
+                                    size)
+        self._buffer += memoryview(data)[_HEADER_SIZE:]
+        self.recorded += 1
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+        return None
+
+    def on_reply(self, span, reply, reply_size):
+        pass
+
+    def flush(self):
+        """Write buffered records to file."""
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._written += len(self._buffer)
+            self._buffer = bytearray()
+        self._file.flush()
+
+    def close(self):
+        """Flush buffered records and close log file."""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def read_log(path):
+    """Iterate over records of the log.
+
+    :param path: ``str`` path of log file.
+    :return: iterator of (timestamp, op_code, query) tuples, timestamp
+        is seconds since recording started.
+    :raises ValueError: if file is not a recorder log
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{!r} is not a gibson traffic log'.format(path))
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                # log could be cut off in the middle of a record
+                return
+            timestamp, op_code, size = RECORD.unpack(header)
+            query = f.read(size)
+            if len(query) < size:
+                return
+            yield timestamp, op_code, query
+
+
+async def replay(path, address, *, speed=1.0, connections=1,
+                 max_inflight=1000):
+    """Play back recorded log against gibson server.
+
+    :param path: ``str`` path of log file.
+    :param address: unix socket path or (host, port) tuple.
+    :param speed: ``float`` replay speed relative to recorded one, ``0``
+        sends commands as fast as possible.
+    :param connections: ``int`` number of connections, commands are
+        distributed between them round robin.
+    :param max_inflight: ``int`` maximum number of commands waiting for
+        reply.
+    :return: ``dict`` with number of ``commands``, ``errors``,
+        ``throughput`` and per command ``latency`` summary in seconds.
+    """
+    loop = asyncio.get_running_loop()
+    histogram = LatencyHistogram()
+    conns = []
+    for _ in range(connections):
+        conn = await create_connection(address, tracer=histogram)
+        conns.append(conn)
+    semaphore = asyncio.Semaphore(max_inflight)
+    commands = {op_code: command
+                for command, op_code in consts.command_map.items()}
+    pending = set()
+    count = errors = 0
+
+    def done(fut):
+        nonlocal errors
+        pending.discard(fut)
+        semaphore.release()
+        if not fut.cancelled() and isinstance(fut.exception(), GibsonError):
+            errors += 1
+
+    try:
+        started = loop.time()
+        for timestamp, op_code, query in read_log(path):
+            if op_code == consts.OP_END:
+                # replayed connections are kept open till the end
+                continue
+            if speed:
+                delay = started + timestamp / speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await semaphore.acquire()
+            conn = conns[count % connections]
+            # query is passed as single argument, so it is sent unchanged
+            args = (query,) if query else ()
+            fut = conn.execute(commands[op_code], *args)
+            fut.add_done_callback(done)
+            pending.add(fut)
+            count += 1
+        if pending:
+            await asyncio.wait(list(pending))
+        elapsed = loop.time() - started
+    finally:
+        for conn in conns:
+            conn.close()
+            await conn.wait_closed()
+
+    return {'commands': count, 'errors': errors, 'elapsed': elapsed,
+            'throughput': count / elapsed if elapsed else 0,
+            'latency': histogram.summary()}
+
+
+def _log_info(path):
+    commands = {}
+    duration = 0
+    for timestamp, op_code, query in read_log(path):
+        item = commands.setdefault(command_name(op_code),
+                                   {'count': 0, 'bytes': 0})
+        item['count'] += 1
+        item['bytes'] += len(query)
+        duration = timestamp
+    return {'duration': duration, 'commands': commands}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m aiogibson.record',
+        description='Inspect and replay recorded gibson traffic.')
+    subparsers = parser.add_subparsers(dest='action')
+    info = subparsers.add_parser('info', help='print command mix of log')
+    info.add_argument('log')
+    play = subparsers.add_parser('replay', help='replay log against server')
+    play.add_argument('log')
+    play.add_argument('address', nargs='?', default='/tmp/gibson.sock',
+                      help='unix socket path or host:port')
+    play.add_argument('--speed', type=float, default=1.0,
+                      help='replay speed multiplier, 0 for maximum speed')
+    play.add_argument('--connections', type=int, default=1)
+    play.add_argument('--max-inflight', type=int, default=1000)
+    play.add_argument('--json', action='store_true',
+                      help='print results as json')
+    args = parser.parse_args(argv)
+
+    if args.action == 'info':
+        result = _log_info(args.log)
+        json.dump(result, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    elif args.action == 'replay':
+        result = asyncio.run(replay(
+            args.log, parse_address(args.address), speed=args.speed,
+            connections=args.connections, max_inflight=args.max_inflight))
+        if args.json:
+            json.dump(result, sys.stdout, indent=2, sort_keys=True)
+            sys.stdout.write('\n')
+        else:
+            sys.stdout.write('{} commands, {} errors in {:.3f}s, '
+                             '{:.0f} ops/s\n'.format(
+                                 result['commands'], result['errors'],
+                                 result['elapsed'], result['throughput']))
+            for name, item in sorted(result['latency'].items()):
+                sys.stdout.write('{:<10} {:>8}  p50={:.3f}ms  p99={:.3f}ms'
+                                 '  max={:.3f}ms\n'.format(
+                                     name, item['count'],
+                                     item['p50'] * 1000, item['p99'] * 1000,
+                                     item['max'] * 1000))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
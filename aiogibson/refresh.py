@@ -0,0 +1,156 @@
+"""Refresh-ahead reloader for hot keys:
+
+.. code:: python
+
+    pool = await create_pool('/tmp/gibson.sock')
+    refresher = Refresher(pool, threshold=10, interval=1)
+    refresher.register(b'top:articles', load_top_articles, expire=60)
+    refresher.start()
+    ...
+    refresher.close()
+    await refresher.wait_closed()
+
+Every ``interval`` seconds remaining TTL of all registered keys is checked
+with pipelined ``meta_left`` commands, keys which are about to expire
+(or already missing) are recomputed by their loaders and set again in
+background, so readers never see a miss for them.
+"""
+import asyncio
+import logging
+
+from .pool import acquire
+
+__all__ = ['Refresher']
+
+logger = logging.getLogger(__name__)
+
+
+class Refresher:
+    """Background reloader of registered keys.
+
+    :param gibson: ``Gibson`` or ``GibsonPool`` instance.
+    :param threshold: ``int`` key is recomputed when less than
+        ``threshold`` seconds left before its expiration.
+    :param interval: ``float`` seconds between TTL checks.
+    :param concurrency: ``int`` maximum number of loaders running at once.
+    :param batch_size: ``int`` maximum number of ``meta_left`` commands
+        pipelined at once.
+    """
+
+    def __init__(self, gibson, *, threshold=10, interval=1.0, concurrency=4,
+                 batch_size=512):
+        self._gibson = gibson
+        self._threshold = threshold
+        self._interval = interval
+        self._batch_size = batch_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._loaders = {}
+        self._inflight = {}
+        self._task = None
+        self._closed = False
+
+    def __repr__(self):
+        return '<Refresher keys={}>'.format(len(self._loaders))
+
+    @property
+    def keys(self):
+        """List of registered keys."""
+        return list(self._loaders)
+
+    @property
+    def closed(self):
+        """True if refresher is closed."""
+        return self._closed
+
+    def register(self, key, loader, expire):
+        """Register key to be kept in cache.
+
+        :param key: ``bytes`` key to refresh.
+        :param loader: coroutine function without arguments returning
+            value for the key.
+        :param expire: ``int`` TTL in seconds for recomputed value.
+        :raises TypeError: if expire argument is not ``int``
+        """
+        if not isinstance(expire, int):
+            raise TypeError('expire must be int')
+        self._loaders[key] = (loader, expire)
+
+    def unregister(self, key):
+        """Stop refreshing given key.
+
+        :param key: ``bytes`` registered key.
+        """
+        self._loaders.pop(key, None)
+
+    def start(self):
+        """Start background checks."""
+        assert not self._closed, "Refresher is closed"
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def close(self):
+        """Stop background checks and running loaders."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+        for task in self._inflight.values():
+            task.cancel()
+
+    async def wait_pending(self):
+        """Wait until all running loaders are finished."""
+        if self._inflight:
+            await asyncio.wait(list(self._inflight.values()))
+
+    async def wait_closed(self):
+        tasks = list(self._inflight.values())
+        if self._task is not None:
+            tasks.append(self._task)
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def check(self):
+        """Check TTL of all registered keys once, start loaders for keys
+        which are about to expire.
+
+        :return: ``list`` of keys scheduled for refresh.
+        """
+        keys = [key for key in self._loaders if key not in self._inflight]
+        expiring = []
+        for i in range(0, len(keys), self._batch_size):
+            batch = keys[i:i + self._batch_size]
+            async with acquire(self._gibson) as gibson:
+                futs = [gibson.meta_left(key) for key in batch]
+                lefts = await asyncio.gather(*futs)
+            # -1 means infinite TTL, None is missing key
+            expiring.extend(key for key, left in zip(batch, lefts)
+                            if left is None or 0 <= left < self._threshold)
+
+        for key in expiring:
+            task = asyncio.create_task(self._refresh(key))
+            self._inflight[key] = task
+        return expiring
+
+    async def _refresh(self, key):
+        try:
+            loader, expire = self._loaders[key]
+            async with self._semaphore:
+                value = await loader()
+                await self._gibson.set(key, value, expire)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Failed to refresh key %r: %r", key, exc)
+        finally:
+            del self._inflight[key]
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Failed to check keys TTL: %r", exc)
+            await asyncio.sleep(self._interval)
@@ -0,0 +1,164 @@
+"""Paginated iteration over keys with given prefix.
+
+``mget`` and ``keys`` commands return all matching items in single reply,
+``PrefixIterator`` walks the prefix byte by byte instead: prefix with more
+items than page budget (according to ``count`` command) is split into child
+prefixes, one per possible next key byte, until every child fits into the
+budget. So every reply stays small no matter how many keys share the prefix:
+
+.. code:: python
+
+    gibson = await create_gibson('/tmp/gibson.sock')
+    async for key, value in gibson.iter_prefix(b'user:', page_size=500):
+        print(key, value)
+
+    async for key in gibson.iter_keys(b'user:'):
+        print(key)
+
+Items are returned in lexicographical order of their keys.
+"""
+import asyncio
+from collections import deque
+
+__all__ = ['PrefixIterator']
+
+# space separates arguments in gibson protocol, so it can not be part
+# of a key
+CHILD_BYTES = [bytes((i,)) for i in range(256) if i != 0x20]
+
+
+class PrefixIterator:
+    """Asynchronous iterator over items or keys with given prefix.
+
+    Besides ``async for`` protocol, pages can be fetched one by one
+    with ``next_page`` coroutine.
+
+    :param gibson: ``Gibson`` instance.
+    :param prefix: ``bytes`` prefix of keys.
+    :param page_size: ``int`` maximum number of items in one reply.
+    :param max_bytes: ``int`` approximate maximum size of one reply,
+        estimated from average size of already fetched items.
+    :param keys_only: ``bool`` iterate over keys instead of key/value
+        pairs.
+    """
+
+    def __init__(self, gibson, prefix, *, page_size=1000, max_bytes=None,
+                 keys_only=False):
+        if not isinstance(page_size, int):
+            raise TypeError('page_size must be int')
+        if page_size <= 0:
+            raise ValueError('page_size must be positive')
+        if isinstance(prefix, str):
+            prefix = prefix.encode('utf-8')
+        self._gibson = gibson
+        self._page_size = page_size
+        self._max_bytes = max_bytes
+        self._keys_only = keys_only
+        # stack of (prefix, count, exact) where count is None when
+        # unknown, exact means only key equal to prefix is wanted
+        self._stack = [(prefix, None, False)]
+        self._buffer = deque()
+        self._items = 0
+        self._bytes = 0
+
+    def __repr__(self):
+        return '<PrefixIterator {!r}>'.format(
+            self._stack[0][0] if self._stack else None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._buffer:
+            page = await self.next_page()
+            if page is None:
+                raise StopAsyncIteration
+            self._buffer.extend(page)
+        return self._buffer.popleft()
+
+    @property
+    def budget(self):
+        """Current maximum number of items fetched with single command."""
+        if not self._max_bytes or not self._items:
+            return self._page_size
+        avg = self._bytes / self._items
+        return max(1, min(self._page_size, int(self._max_bytes / avg)))
+
+    async def next_page(self):
+        """Fetch next page of items.
+
+        :return: ``list`` of (key, value) pairs or keys, ``None`` when
+            iteration is over.
+        """
+        gibson = self._gibson
+        steps = self._steps()
+        try:
+            commands = next(steps)
+            while True:
+                # all commands of a step are pipelined in single write
+                replies = await asyncio.gather(
+                    *[getattr(gibson, method)(*args)
+                      for method, args in commands])
+                commands = steps.send(replies)
+        except StopIteration as exc:
+            return exc.value
+
+    def _steps(self):
+        # pagination without I/O, shared with blocking iterator: yields
+        # lists of (method, args) commands, receives list of their replies
+        # and returns next page or None
+        while self._stack:
+            prefix, count, exact = self._stack.pop()
+            if exact:
+                value, = yield [('get', (prefix,))]
+                if value is not None:
+                    return [prefix] if self._keys_only else [(prefix, value)]
+                continue
+
+            if count is None:
+                count, = yield [('count', (prefix,))]
+                count = count or 0
+            if not count:
+                continue
+
+            budget = self.budget
+            if count <= budget:
+                if self._keys_only:
+                    resp, = yield [('keys', (prefix,))]
+                else:
+                    resp, = yield [('mget', (prefix, budget + 1))]
+                page = self._page(resp)
+                if page is not None and len(page) <= budget:
+                    return page
+                # prefix grew in the meantime, so it has to be split
+
+            children = [prefix + byte for byte in CHILD_BYTES]
+            counts = yield [('count', (child,)) for child in children]
+            total = 0
+            for child, child_count in zip(reversed(children),
+                                          reversed(counts)):
+                if child_count:
+                    self._stack.append((child, child_count, False))
+                    total += child_count
+            if count > total:
+                self._stack.append((prefix, 1, True))
+        return None
+
+    def _page(self, resp):
+        if resp is None:
+            return None
+        if self._keys_only:
+            page = resp
+            size = sum(len(key) for key in page)
+        else:
+            page = list(zip(resp[::2], resp[1::2]))
+            size = sum(len(key) + _size(value) for key, value in page)
+        self._items += len(page)
+        self._bytes += size
+        return page
+
+
+def _size(value):
+    if isinstance(value, int):
+        return 8
+    return len(value)
@@ -0,0 +1,585 @@
+"""Pure-Python Gibson server stand-in.
+
+``GibsonServer`` speaks the gibson binary protocol on top of
+:mod:`aiogibson.consts` and :mod:`aiogibson.parser`, and is meant for tests
+and benchmarks where a real gibson binary is not available:
+
+.. code:: python
+
+    server = await create_server('/tmp/gibson.sock')
+    gibson = await create_gibson('/tmp/gibson.sock')
+    ...
+    server.close()
+    await server.wait_closed()
+
+It can also be started from command line::
+
+    $ python -m aiogibson.server --unix-socket /tmp/gibson.sock
+
+Keys live in a byte-wise trie so that prefix operations (``mget``, ``mset``,
+``count``, ...) only touch matching items. TTLs, locks and meta fields follow
+gibson semantics, additionally latency and errors can be injected in order to
+test client behavior.
+"""
+import argparse
+import asyncio
+import random
+import struct
+import time
+
+from . import consts
+from .parser import encode_reply
+
+__all__ = ['create_server', 'GibsonServer']
+
+MAX_CHUNK_SIZE = 65536
+_REQUEST_HEADER = struct.Struct('<IH')
+_VERSION = b'0.0.0-aiogibson'
+
+
+async def create_server(address, *, latency=0, error_rate=0, max_memory=None):
+    """Creates and starts ``GibsonServer``.
+
+    :param address: ``str`` for unix socket path, or ``tuple``
+        for (host, port) tcp server.
+    :param latency: ``float`` seconds each reply is delayed by.
+    :param error_rate: ``float`` probability of replying with generic error.
+    :param max_memory: ``int`` memory limit in bytes, ``None`` for no limit.
+    :return: started ``GibsonServer`` instance
+    """
+    server = GibsonServer(latency=latency, error_rate=error_rate,
+                          max_memory=max_memory)
+    await server.start(address)
+    return server
+
+
+class _Item:
+
+    __slots__ = ('value', 'encoding', 'created', 'access', 'ttl', 'expire',
+                 'lock')
+
+    def __init__(self, value, encoding, ttl, now):
+        self.value = value
+        self.encoding = encoding
+        self.created = now
+        self.access = now
+        self.ttl = ttl
+        self.expire = now + ttl if ttl > 0 else 0
+        self.lock = 0
+
+    @property
+    def size(self):
+        if self.encoding == consts.GB_ENC_NUMBER:
+            return 8
+        return len(self.value)
+
+    def expired(self, now):
+        return self.expire and self.expire <= now
+
+    def locked(self, now):
+        return self.lock == -1 or self.lock > now
+
+
+class _Node:
+
+    __slots__ = ('children', 'item')
+
+    def __init__(self):
+        self.children = {}
+        self.item = None
+
+
+class Keyspace:
+    """Trie of gibson items, every edge of the trie is one key byte."""
+
+    def __init__(self):
+        self._root = _Node()
+        self._count = 0
+        self.memory = 0
+
+    def __len__(self):
+        return self._count
+
+    def _node(self, key, create=False):
+        node = self._root
+        for byte in key:
+            child = node.children.get(byte)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[byte] = _Node()
+            node = child
+        return node
+
+    def get(self, key, now):
+        node = self._node(key)
+        if node is None or node.item is None:
+            return None
+        if node.item.expired(now):
+            self._drop(key, node)
+            return None
+        return node.item
+
+    def put(self, key, item):
+        node = self._node(key, create=True)
+        if node.item is None:
+            self._count += 1
+        else:
+            self.memory -= node.item.size
+        node.item = item
+        self.memory += item.size
+
+    def delete(self, key):
+        node = self._node(key)
+        if node is None or node.item is None:
+            return False
+        self._drop(key, node)
+        return True
+
+    def _drop(self, key, node):
+        self.memory -= node.item.size
+        self._count -= 1
+        node.item = None
+        # prune branches which do not hold items any more
+        path = [self._root]
+        for byte in key[:-1]:
+            path.append(path[-1].children[byte])
+        for parent, byte in zip(reversed(path), reversed(key)):
+            child = parent.children[byte]
+            if child.item is not None or child.children:
+                break
+            del parent.children[byte]
+
+    def prefix(self, prefix, now, limit=None):
+        """Returns sorted list of (key, item) pairs for given prefix."""
+        node = self._node(prefix)
+        if node is None:
+            return []
+        result, expired = [], []
+        stack = [(prefix, node)]
+        while stack:
+            key, node = stack.pop()
+            item = node.item
+            if item is not None:
+                if item.expired(now):
+                    expired.append(key)
+                else:
+                    result.append((key, item))
+                    if limit is not None and len(result) >= limit:
+                        break
+            for byte in sorted(node.children, reverse=True):
+                stack.append((key + bytes((byte,)), node.children[byte]))
+        for key in expired:
+            self.delete(key)
+        return result
+
+
+class GibsonServer:
+    """In-process gibson server."""
+
+    def __init__(self, *, latency=0, error_rate=0, max_memory=None):
+        self._server = None
+        self._address = None
+        self._clients = {}
+        self.keyspace = Keyspace()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_memory = max_memory
+        self._started = int(time.time())
+        self._total_requests = 0
+        self._total_connections = 0
+        self._handlers = {
+            consts.OP_SET: self._op_set,
+            consts.OP_TTL: self._op_ttl,
+            consts.OP_GET: self._op_get,
+            consts.OP_DEL: self._op_del,
+            consts.OP_INC: self._op_inc,
+            consts.OP_DEC: self._op_dec,
+            consts.OP_LOCK: self._op_lock,
+            consts.OP_UNLOCK: self._op_unlock,
+            consts.OP_MSET: self._op_mset,
+            consts.OP_MTTL: self._op_mttl,
+            consts.OP_MGET: self._op_mget,
+            consts.OP_MDEL: self._op_mdel,
+            consts.OP_MINC: self._op_minc,
+            consts.OP_MDEC: self._op_mdec,
+            consts.OP_MLOCK: self._op_mlock,
+            consts.OP_MUNLOCK: self._op_munlock,
+            consts.OP_COUNT: self._op_count,
+            consts.OP_STATS: self._op_stats,
+            consts.OP_PING: self._op_ping,
+            consts.OP_META: self._op_meta,
+            consts.OP_KEYS: self._op_keys,
+        }
+
+    def __repr__(self):
+        return '<GibsonServer {}>'.format(self._address)
+
+    @property
+    def address(self):
+        """Address server is listening on."""
+        return self._address
+
+    async def start(self, address):
+        """Start listening on given address.
+
+        :param address: ``str`` for unix socket path, or ``tuple``
+            for (host, port) tcp server.
+        """
+        assert isinstance(address, (tuple, list, str)), "tuple or str expected"
+        if isinstance(address, (list, tuple)):
+            host, port = address
+            self._server = await asyncio.start_server(
+                self._handle_client, host, port)
+            address = self._server.sockets[0].getsockname()[:2]
+        else:
+            self._server = await asyncio.start_unix_server(
+                self._handle_client, address)
+        self._address = address
+
+    def close(self):
+        """Stop listening and drop all client connections."""
+        if self._server is not None:
+            self._server.close()
+        for writer in self._clients:
+            writer.transport.close()
+
+    async def wait_closed(self):
+        if self._server is not None:
+            await self._server.wait_closed()
+        tasks = list(self._clients.values())
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def _handle_client(self, reader, writer):
+        self._clients[writer] = asyncio.current_task()
+        self._total_connections += 1
+        try:
+            await self._serve(reader, writer)
+        except ConnectionError:
+            # client went away, nothing to reply to
+            pass
+        finally:
+            del self._clients[writer]
+            writer.close()
+
+    async def _serve(self, reader, writer):
+        buffer = bytearray()
+        while True:
+            data = await reader.read(MAX_CHUNK_SIZE)
+            if not data:
+                break
+            buffer.extend(data)
+            offset, end = 0, False
+            while len(buffer) - offset >= _REQUEST_HEADER.size:
+                size, op_code = _REQUEST_HEADER.unpack_from(buffer,
+                                                            offset)
+                stop = offset + consts.REPL_SIZE + size
+                if len(buffer) < stop:
+                    break
+                start = offset + _REQUEST_HEADER.size
+                query = bytes(buffer[start:stop])
+                offset = stop
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                writer.write(self.dispatch(op_code, query))
+                if op_code == consts.OP_END:
+                    end = True
+                    break
+            del buffer[:offset]
+            if end:
+                # half close, so client sees EOF right after reply and
+                # requests sent after ``end`` are silently dropped
+                writer.write_eof()
+                while await reader.read(MAX_CHUNK_SIZE):
+                    pass
+                break
+
+    def dispatch(self, op_code, query):
+        """Execute single command and return encoded reply.
+
+        :param op_code: ``int`` gibson operation code.
+        :param query: ``bytes`` command arguments.
+        :return: ``bytes`` encoded reply
+        """
+        self._total_requests += 1
+        if self.error_rate and random.random() < self.error_rate:
+            return encode_reply(consts.REPL_ERR)
+        if op_code == consts.OP_END:
+            return encode_reply(consts.REPL_OK)
+        handler = self._handlers.get(op_code)
+        if handler is None:
+            return encode_reply(consts.REPL_ERR)
+        try:
+            return handler(query, time.time())
+        except ValueError:
+            return encode_reply(consts.REPL_ERR)
+
+    def _reply_count(self, count):
+        if not count:
+            return encode_reply(consts.REPL_ERR_NOT_FOUND)
+        return encode_reply(consts.REPL_VAL, count)
+
+    def _memory_full(self, extra):
+        return (self.max_memory is not None and
+                self.keyspace.memory + extra > self.max_memory)
+
+    def _op_set(self, query, now):
+        ttl, key, value = query.split(b' ', 2)
+        ttl = int(ttl)
+        item = self.keyspace.get(key, now)
+        if item is not None and item.locked(now):
+            return encode_reply(consts.REPL_ERR_LOCKED)
+        if self._memory_full(len(value)):
+            return encode_reply(consts.REPL_ERR_MEM)
+        self.keyspace.put(key, _Item(value, consts.GB_ENC_PLAIN, ttl, now))
+        return encode_reply(consts.REPL_VAL, value)
+
+    def _op_ttl(self, query, now):
+        key, ttl = query.split(b' ')
+        item = self.keyspace.get(key, now)
+        if item is None:
+            return encode_reply(consts.REPL_ERR_NOT_FOUND)
+        if item.locked(now):
+            return encode_reply(consts.REPL_ERR_LOCKED)
+        self._set_ttl(item, int(ttl), now)
+        return encode_reply(consts.REPL_OK)
+
+    def _set_ttl(self, item, ttl, now):
+        item.ttl = ttl
+        item.expire = now + ttl if ttl > 0 else 0
+
+    def _op_get(self, query, now):
+        item = self.keyspace.get(query, now)
+        if item is None:
+            return encode_reply(consts.REPL_ERR_NOT_FOUND)
+        item.access = now
+        return encode_reply(consts.REPL_VAL, item.value)
+
+    def _op_del(self, query, now):
+        item = self.keyspace.get(query, now)
+        if item is None:
+            return encode_reply(consts.REPL_ERR_NOT_FOUND)
+        if item.locked(now):
+            return encode_reply(consts.REPL_ERR_LOCKED)
+        self.keyspace.delete(query)
+        return encode_reply(consts.REPL_OK)
+
+    def _incr(self, item, delta):
+        if item.encoding == consts.GB_ENC_NUMBER:
+            value = item.value
+        else:
+            try:
+                value = int(item.value)
+            except ValueError:
+                return False
+        self.keyspace.memory -= item.size
+        item.value = value + delta
+        item.encoding = consts.GB_ENC_NUMBER
+        self.keyspace.memory += item.size
+        return True
+
+    def _op_incr(self, key, delta, now):
+        item = self.keyspace.get(key, now)
+        if item is None:
+            return encode_reply(consts.REPL_ERR_NOT_FOUND)
+        if item.locked(now):
+            return encode_reply(consts.REPL_ERR_LOCKED)
+        if not self._incr(item, delta):
+            return encode_reply(consts.REPL_ERR_NAN)
+        return encode_reply(consts.REPL_VAL, item.value)
+
+    def _op_inc(self, query, now):
+        return self._op_incr(query, 1, now)
+
+    def _op_dec(self, query, now):
+        return self._op_incr(query, -1, now)
+
+    def _op_lock(self, query, now):
+        key, ttl = query.split(b' ')
+        item = self.keyspace.get(key, now)
+        if item is None:
+            return encode_reply(consts.REPL_ERR_NOT_FOUND)
+        if item.locked(now):
+            return encode_reply(consts.REPL_ERR_LOCKED)
+        ttl = int(ttl)
+        item.lock = now + ttl if ttl > 0 else -1
+        return encode_reply(consts.REPL_OK)
+
+    def _op_unlock(self, query, now):
+        item = self.keyspace.get(query, now)
+        if item is None:
+            return encode_reply(consts.REPL_ERR_NOT_FOUND)
+        item.lock = 0
+        return encode_reply(consts.REPL_OK)
+
+    def _unlocked(self, prefix, now):
+        return [(key, item) for key, item in self.keyspace.prefix(prefix, now)
+                if not item.locked(now)]
+
+    def _op_mset(self, query, now):
+        prefix, value = query.split(b' ', 1)
+        items = self._unlocked(prefix, now)
+        for _, item in items:
+            self.keyspace.memory += len(value) - item.size
+            item.value = value
+            item.encoding = consts.GB_ENC_PLAIN
+        return self._reply_count(len(items))
+
+    def _op_mttl(self, query, now):
+        prefix, ttl = query.split(b' ')
+        items = self._unlocked(prefix, now)
+        for _, item in items:
+            self._set_ttl(item, int(ttl), now)
+        return self._reply_count(len(items))
+
+    def _op_mget(self, query, now):
+        args = query.split(b' ')
+        limit = int(args[1]) if len(args) > 1 else None
+        items = self.keyspace.prefix(args[0], now, limit)
+        if not items:
+            return encode_reply(consts.REPL_ERR_NOT_FOUND)
+        for _, item in items:
+            item.access = now
+        return encode_reply(consts.REPL_KVAL, [
+            (key, item.value) for key, item in items])
+
+    def _op_mdel(self, query, now):
+        items = self._unlocked(query, now)
+        for key, _ in items:
+            self.keyspace.delete(key)
+        return self._reply_count(len(items))
+
+    def _op_mincr(self, prefix, delta, now):
+        count = 0
+        for _, item in self._unlocked(prefix, now):
+            count += self._incr(item, delta)
+        return self._reply_count(count)
+
+    def _op_minc(self, query, now):
+        return self._op_mincr(query, 1, now)
+
+    def _op_mdec(self, query, now):
+        return self._op_mincr(query, -1, now)
+
+    def _op_mlock(self, query, now):
+        prefix, ttl = query.split(b' ')
+        ttl = int(ttl)
+        items = self._unlocked(prefix, now)
+        for _, item in items:
+            item.lock = now + ttl if ttl > 0 else -1
+        return self._reply_count(len(items))
+
+    def _op_munlock(self, query, now):
+        items = self.keyspace.prefix(query, now)
+        for _, item in items:
+            item.lock = 0
+        return self._reply_count(len(items))
+
+    def _op_count(self, query, now):
+        return self._reply_count(len(self.keyspace.prefix(query, now)))
+
+    def _op_stats(self, query, now):
+        keyspace = self.keyspace
+        total = len(keyspace)
+        stats = [
+            (b'server_version', _VERSION),
+            (b'server_build_datetime', b''),
+            (b'server_allocator', b'python'),
+            (b'server_arch', b'64'),
+            (b'server_started', self._started),
+            (b'server_time', int(now)),
+            (b'first_item_seen', self._started),
+            (b'last_item_seen', int(now)),
+            (b'total_items', total),
+            (b'total_compressed_items', 0),
+            (b'total_clients', len(self._clients)),
+            (b'total_cron_done', 0),
+            (b'total_connections', self._total_connections),
+            (b'total_requests', self._total_requests),
+            (b'memory_available', self.max_memory or 0),
+            (b'memory_usable', self.max_memory or 0),
+            (b'memory_used', keyspace.memory),
+            (b'memory_peak', keyspace.memory),
+            (b'memory_fragmentation', b'1.0'),
+            (b'item_size_avg', keyspace.memory // total if total else 0),
+            (b'compr_rate_avg', 0),
+            (b'reqs_per_client_avg', 0),
+        ]
+        return encode_reply(consts.REPL_KVAL, stats)
+
+    def _op_ping(self, query, now):
+        return encode_reply(consts.REPL_OK)
+
+    def _op_meta(self, query, now):
+        key, field = query.split(b' ')
+        item = self.keyspace.get(key, now)
+        if item is None:
+            return encode_reply(consts.REPL_ERR_NOT_FOUND)
+        if field == b'size':
+            value = item.size
+        elif field == b'encoding':
+            value = item.encoding
+        elif field == b'access':
+            value = int(item.access)
+        elif field == b'created':
+            value = int(item.created)
+        elif field == b'ttl':
+            value = item.ttl if item.ttl > 0 else -1
+        elif field == b'left':
+            value = int(item.expire - now) if item.expire else -1
+        elif field == b'lock':
+            if item.lock == -1:
+                value = -1
+            else:
+                value = max(int(item.lock - now), 0)
+        else:
+            return encode_reply(consts.REPL_ERR)
+        return encode_reply(consts.REPL_VAL, value)
+
+    def _op_keys(self, query, now):
+        items = self.keyspace.prefix(query, now)
+        if not items:
+            return encode_reply(consts.REPL_ERR_NOT_FOUND)
+        return encode_reply(consts.REPL_KVAL, [
+            (str(i).encode('ascii'), key) for i, (key, _) in enumerate(items)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m aiogibson.server',
+        description='In-process Gibson server stand-in.')
+    parser.add_argument('--unix-socket', default='/tmp/gibson.sock')
+    parser.add_argument('--host', help='listen on tcp instead of unix socket')
+    parser.add_argument('--port', type=int, default=10128)
+    parser.add_argument('--latency', type=float, default=0,
+                        help='seconds each reply is delayed by')
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help='probability of generic error reply')
+    parser.add_argument('--max-memory', type=int, default=None,
+                        help='memory limit in bytes')
+    args = parser.parse_args(argv)
+
+    address = args.unix_socket
+    if args.host:
+        address = (args.host, args.port)
+
+    async def serve():
+        server = await create_server(
+            address, latency=args.latency, error_rate=args.error_rate,
+            max_memory=args.max_memory)
+        try:
+            # run till interrupted
+            await asyncio.get_running_loop().create_future()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,412 @@
+"""Snapshot dump and bulk restore of gibson keyspace.
+
+``dump`` streams items with given prefix page by page, reads remaining TTL
+of every item and writes them to snapshot file, ``restore`` loads it back
+with pipelined ``set`` commands over several connections:
+
+.. code:: python
+
+    count = await dump(gibson, '/tmp/cache.snap', b'user:', compress=True)
+    ...
+    pool = await create_pool('/tmp/gibson.sock', minsize=4, maxsize=4)
+    count = await restore(pool, '/tmp/cache.snap', connections=4,
+                          rate=100000)
+
+or from command line::
+
+    $ python -m aiogibson.snapshot dump /tmp/gibson.sock /tmp/cache.snap
+    $ python -m aiogibson.snapshot restore /tmp/gibson.sock /tmp/cache.snap
+
+TTLs are counted from the moment dump started, time passed before restore is
+subtracted and already expired items are skipped.
+
+Snapshot file is ``HEADER`` followed by blocks of length prefixed records,
+optionally compressed with zlib, index of blocks and ``FOOTER`` pointing to
+the index. Blocks hold items in key order and index keeps first key of every
+block, so ``Snapshot`` reads file through ``mmap`` and decodes only blocks
+that may hold keys with requested prefix.
+"""
+import argparse
+import asyncio
+import bisect
+import logging
+import mmap
+import struct
+import sys
+import time
+import zlib
+from collections import namedtuple
+
+from . import consts
+from .connection import parse_address
+from .errors import GibsonError
+from .pool import acquire, create_pool
+
+__all__ = ['dump', 'restore', 'Snapshot', 'BlockInfo']
+
+MAGIC = b'AGBSNP\x00\x01'
+# magic, flags, dump timestamp
+HEADER = struct.Struct('<8sBd')
+# stored size, raw size, number of records
+BLOCK = struct.Struct('<III')
+# key size, encoding, ttl (-1 is infinite), value size
+RECORD = struct.Struct('<HBiI')
+# block offset, stored size, number of records, first key size
+INDEX = struct.Struct('<QIIH')
+# index offset, number of blocks, magic
+FOOTER = struct.Struct('<QI8s')
+
+FLAG_ZLIB = 0x01
+
+BlockInfo = namedtuple('BlockInfo', 'offset size records first_key')
+
+logger = logging.getLogger(__name__)
+
+
+class _SnapshotWriter:
+
+    def __init__(self, path, compress, block_size, timestamp):
+        self._file = open(path, 'wb')
+        self._compress = compress
+        self._block_size = block_size
+        self._file.write(HEADER.pack(MAGIC, FLAG_ZLIB if compress else 0,
+                                     timestamp))
+        self._offset = HEADER.size
+        self._block = bytearray()
+        self._block_records = 0
+        self._first_key = None
+        self._index = []
+        self.count = 0
+
+    def add(self, key, value, ttl):
+        if isinstance(value, int):
+            encoding, value = consts.GB_ENC_NUMBER, str(value).encode('ascii')
+        else:
+            encoding = consts.GB_ENC_PLAIN
+        if self._first_key is None:
+            self._first_key = key
+        self._block += RECORD.pack(len(key), encoding, ttl, len(value))
+        self._block += key
+        self._block += value
+        self._block_records += 1
+        self.count += 1
+        if len(self._block) >= self._block_size:
+            self._flush_block()
+
+    def _flush_block(self):
+        if not self._block_records:
+            return
+        data = self._block
+        if self._compress:
+            data = zlib.compress(data)
+        self._file.write(BLOCK.pack(len(data), len(self._block),
+                                    self._block_records))
+        self._file.write(data)
+        self._index.append((self._offset, BLOCK.size + len(data),
+                            self._block_records, self._first_key))
+        self._offset += BLOCK.size + len(data)
+        self._block = bytearray()
+        self._block_records = 0
+        self._first_key = None
+
+    def close(self):
+        self._flush_block()
+        for offset, size, records, first_key in self._index:
+            self._file.write(INDEX.pack(offset, size, records,
+                                        len(first_key)))
+            self._file.write(first_key)
+        self._file.write(FOOTER.pack(self._offset, len(self._index), MAGIC))
+        self._file.close()
+
+    def abort(self):
+        self._file.close()
+
+
+class Snapshot:
+    """Read only view of snapshot file.
+
+    :param path: ``str`` path of snapshot file.
+    :raises ValueError: if file is not a valid snapshot
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_index()
+        except (ValueError, struct.error):
+            self._mmap.close()
+            raise ValueError('{!r} is not a gibson snapshot'.format(path))
+
+    def _read_index(self):
+        buf = self._mmap
+        magic, flags, self.timestamp = HEADER.unpack_from(buf, 0)
+        offset, count, end_magic = FOOTER.unpack_from(
+            buf, len(buf) - FOOTER.size)
+        if magic != MAGIC or end_magic != MAGIC:
+            raise ValueError()
+        self.compressed = bool(flags & FLAG_ZLIB)
+        self.blocks = []
+        for _ in range(count):
+            block_offset, size, records, key_size = INDEX.unpack_from(
+                buf, offset)
+            offset += INDEX.size
+            first_key = buf[offset:offset + key_size]
+            offset += key_size
+            self.blocks.append(BlockInfo(block_offset, size, records,
+                                         first_key))
+
+    def __len__(self):
+        return sum(block.records for block in self.blocks)
+
+    def __iter__(self):
+        for block in self.blocks:
+            yield from self.records(block)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Unmap snapshot file."""
+        self._mmap.close()
+
+    def blocks_for_prefix(self, prefix):
+        """Blocks which may hold keys with given prefix.
+
+        :param prefix: ``bytes`` key prefix.
+        :return: ``list`` of ``BlockInfo``
+        """
+        if not prefix:
+            return list(self.blocks)
+        first_keys = [block.first_key for block in self.blocks]
+        # last block starting before prefix may still hold matching keys
+        start = max(bisect.bisect_left(first_keys, prefix) - 1, 0)
+        result = []
+        for block in self.blocks[start:]:
+            if block.first_key > prefix and \
+                    not block.first_key.startswith(prefix):
+                break
+            result.append(block)
+        return result
+
+    def records(self, block, prefix=b''):
+        """Decode records of the block.
+
+        :param block: ``BlockInfo`` instance.
+        :param prefix: ``bytes`` only records with given key prefix are
+            returned.
+        :return: iterator of (key, value, ttl, encoding) tuples, ``ttl``
+            is ``-1`` for items without expiration, ``value`` of
+            ``GB_ENC_NUMBER`` encoded item is its decimal text.
+        """
+        stored, raw, count = BLOCK.unpack_from(self._mmap, block.offset)
+        start = block.offset + BLOCK.size
+        # block is copied out of mmap, so the file can be closed while
+        # records are still iterated
+        data = self._mmap[start:start + stored]
+        if self.compressed:
+            data = zlib.decompress(data)
+        data = memoryview(data)
+        offset = 0
+        for _ in range(count):
+            key_size, encoding, ttl, value_size = RECORD.unpack_from(
+                data, offset)
+            offset += RECORD.size
+            key = bytes(data[offset:offset + key_size])
+            offset += key_size
+            if key.startswith(prefix):
+                yield (key, bytes(data[offset:offset + value_size]), ttl,
+                       encoding)
+            offset += value_size
+
+
+async def dump(gibson, path, prefix=b'', *, compress=False, block_size=1048576,
+               page_size=1000):
+    """Write items with given prefix to snapshot file.
+
+    :param gibson: ``Gibson`` or ``GibsonPool`` instance.
+    :param path: ``str`` path of snapshot file, it is truncated.
+    :param prefix: ``bytes`` prefix of dumped keys.
+    :param compress: ``bool`` compress blocks with zlib.
+    :param block_size: ``int`` approximate size of uncompressed block.
+    :param page_size: ``int`` maximum number of items fetched at once.
+    :return: ``int`` number of dumped items.
+    """
+    writer = _SnapshotWriter(path, compress, block_size, time.time())
+    try:
+        # pools and blocking clients page with their own iterators
+        it = gibson.iter_prefix(prefix, page_size=page_size)
+        while True:
+            page = await it.next_page()
+            if page is None:
+                break
+            # index relies on key order, mget replies are in server order
+            page.sort()
+            metas = await gibson.meta_many([key for key, _ in page],
+                                           fields=('left',))
+            for (key, value), meta in zip(page, metas):
+                # item could expire or be deleted meanwhile
+                if meta is not None:
+                    writer.add(key, value, meta.left)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return writer.count
+
+
+class _RateLimiter:
+
+    def __init__(self, rate):
+        self._rate = rate
+        self._loop = asyncio.get_running_loop()
+        self._next = self._loop.time()
+
+    async def wait(self, count):
+        now = self._loop.time()
+        start = max(self._next, now)
+        self._next = start + count / self._rate
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+def _restore_item(conn, key, value, ttl, encoding):
+    if encoding != consts.GB_ENC_NUMBER:
+        return conn.set(key, value, ttl)
+    # there is no command storing number directly, inc of its predecessor
+    # leaves number encoded item, so inc and dec behave as before dump;
+    # both commands are sent right away, one after another
+    return asyncio.gather(conn.set(key, int(value) - 1, ttl), conn.inc(key))
+
+
+async def restore(gibson, path, prefix=b'', *, connections=4, pipeline=256,
+                  rate=None):
+    """Load items from snapshot file.
+
+    :param gibson: ``Gibson`` or ``GibsonPool`` instance, every worker
+        acquires own connection from the pool.
+    :param path: ``str`` path of snapshot file.
+    :param prefix: ``bytes`` restore only keys with given prefix.
+    :param connections: ``int`` number of concurrent workers.
+    :param pipeline: ``int`` number of ``set`` commands sent at once.
+    :param rate: ``float`` maximum number of items per second, ``None``
+        for unlimited.
+    :return: ``int`` number of restored items, items rejected by server
+        (for instance locked ones) are skipped.
+    """
+    limiter = _RateLimiter(rate) if rate else None
+    restored = failed = 0
+
+    with Snapshot(path) as snapshot:
+        blocks = iter(snapshot.blocks_for_prefix(prefix))
+        elapsed = int(time.time() - snapshot.timestamp)
+
+        def batches():
+            batch = []
+            for block in blocks:
+                for key, value, ttl, encoding in snapshot.records(block,
+                                                                  prefix):
+                    if ttl >= 0:
+                        ttl -= elapsed
+                        if ttl <= 0:
+                            continue
+                    else:
+                        ttl = 0
+                    batch.append((key, value, ttl, encoding))
+                    if len(batch) >= pipeline:
+                        yield batch
+                        batch = []
+            if batch:
+                yield batch
+
+        # workers share the generator, so every batch is sent once
+        source = batches()
+
+        async def worker():
+            nonlocal restored, failed
+            async with acquire(gibson) as conn:
+                for batch in source:
+                    if limiter is not None:
+                        await limiter.wait(len(batch))
+                    results = await asyncio.gather(
+                        *[_restore_item(conn, *item) for item in batch],
+                        return_exceptions=True)
+                    for res in results:
+                        if isinstance(res, GibsonError):
+                            failed += 1
+                        elif isinstance(res, BaseException):
+                            raise res
+                        else:
+                            restored += 1
+
+        await asyncio.gather(*[worker() for _ in range(connections)])
+    if failed:
+        logger.warning("%d snapshot items were not restored", failed)
+    return restored
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m aiogibson.snapshot',
+        description='Dump and restore gibson keyspace.')
+    subparsers = parser.add_subparsers(dest='action')
+    dump_parser = subparsers.add_parser('dump', help='write snapshot')
+    restore_parser = subparsers.add_parser('restore', help='load snapshot')
+    for sub in (dump_parser, restore_parser):
+        sub.add_argument('address', help='unix socket path or host:port')
+        sub.add_argument('path', help='snapshot file')
+        sub.add_argument('--prefix', default='',
+                         help='only keys with given prefix')
+    dump_parser.add_argument('--compress', action='store_true',
+                             help='compress snapshot with zlib')
+    dump_parser.add_argument('--page-size', type=int, default=1000)
+    restore_parser.add_argument('--connections', type=int, default=4)
+    restore_parser.add_argument('--pipeline', type=int, default=256,
+                                help='set commands sent at once')
+    restore_parser.add_argument('--rate', type=float, default=None,
+                                help='maximum items per second')
+    info_parser = subparsers.add_parser('info', help='describe snapshot')
+    info_parser.add_argument('path', help='snapshot file')
+    args = parser.parse_args(argv)
+
+    if args.action == 'info':
+        with Snapshot(args.path) as snapshot:
+            sys.stdout.write('{} items in {} blocks, compressed: {}, '
+                             'taken {}\n'.format(
+                                 len(snapshot), len(snapshot.blocks),
+                                 snapshot.compressed,
+                                 time.ctime(snapshot.timestamp)))
+        return
+    if args.action is None:
+        parser.print_help()
+        return
+
+    prefix = args.prefix.encode('utf-8')
+
+    async def go():
+        size = args.connections if args.action == 'restore' else 1
+        pool = await create_pool(parse_address(args.address),
+                                 minsize=size, maxsize=size)
+        try:
+            if args.action == 'dump':
+                return await dump(pool, args.path, prefix,
+                                  compress=args.compress,
+                                  page_size=args.page_size)
+            return await restore(pool, args.path, prefix,
+                                 connections=args.connections,
+                                 pipeline=args.pipeline, rate=args.rate)
+        finally:
+            await pool.clear()
+
+    started = time.monotonic()
+    count = asyncio.run(go())
+    sys.stdout.write('{} {} items in {:.3f}s\n'.format(
+        'Dumped' if args.action == 'dump' else 'Restored', count,
+        time.monotonic() - started))
+
+
+if __name__ == '__main__':
+    main()
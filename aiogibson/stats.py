@@ -0,0 +1,275 @@
+"""Structured server stats and periodic collector.
+
+``Gibson.stats`` returns flat list of names and values, ``Stats`` turns it
+into snapshot object with typed attributes:
+
+.. code:: python
+
+    stats = Stats.from_reply(await gibson.stats())
+    print(stats.memory_used, stats.total_items)
+
+``StatsCollector`` polls stats in background, computes rates from
+successive snapshots and passes them to listeners. There is single shared
+collector per ``Gibson``/``GibsonPool``, so every component interested in
+capacity signals reuses the same poller:
+
+.. code:: python
+
+    collector = StatsCollector.shared(pool, interval=10)
+    collector.add_listener(lambda stats, rates: print(rates.requests_rate))
+    collector.start()
+"""
+import asyncio
+import logging
+import time
+import weakref
+
+__all__ = ['Stats', 'StatsRates', 'StatsCollector']
+
+logger = logging.getLogger(__name__)
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return str(value)
+
+
+def _number(value):
+    if isinstance(value, (bytes, str)):
+        value = float(value)
+    return value
+
+
+_FIELDS = (
+    ('server_version', _text),
+    ('server_build_datetime', _text),
+    ('server_allocator', _text),
+    ('server_arch', _text),
+    ('server_started', int),
+    ('server_time', int),
+    ('first_item_seen', int),
+    ('last_item_seen', int),
+    ('total_items', int),
+    ('total_compressed_items', int),
+    ('total_clients', int),
+    ('total_cron_done', int),
+    ('total_connections', int),
+    ('total_requests', int),
+    ('memory_available', int),
+    ('memory_usable', int),
+    ('memory_used', int),
+    ('memory_peak', int),
+    ('memory_fragmentation', _number),
+    ('item_size_avg', _number),
+    ('compr_rate_avg', _number),
+    ('reqs_per_client_avg', _number),
+)
+
+
+class Stats:
+    """Snapshot of gibson server stats.
+
+    Known stats are available as attributes (``None`` if server did not
+    report them), all reported stats are kept in ``raw`` dict.
+    """
+
+    __slots__ = tuple(name for name, _ in _FIELDS) + ('raw', 'timestamp')
+
+    def __init__(self, raw, timestamp=None):
+        self.raw = raw
+        self.timestamp = time.monotonic() if timestamp is None else timestamp
+        for name, type_ in _FIELDS:
+            value = raw.get(name)
+            if value is not None:
+                try:
+                    value = type_(value)
+                except ValueError:
+                    value = None
+            setattr(self, name, value)
+
+    @classmethod
+    def from_reply(cls, reply, timestamp=None):
+        """Build snapshot from ``Gibson.stats`` reply.
+
+        :param reply: ``list`` of stat names and values.
+        :param timestamp: ``float`` monotonic time snapshot was taken at.
+        :return: ``Stats`` instance
+        """
+        raw = {_text(name): value
+               for name, value in zip(reply[::2], reply[1::2])}
+        return cls(raw, timestamp)
+
+    def __repr__(self):
+        return '<Stats items={} memory_used={}>'.format(
+            self.total_items, self.memory_used)
+
+    def as_dict(self):
+        """Known stats as ``dict``."""
+        return {name: getattr(self, name) for name, _ in _FIELDS}
+
+
+class StatsRates:
+    """Rates computed from two successive snapshots, per second.
+
+    :param previous: ``Stats`` older snapshot.
+    :param current: ``Stats`` newer snapshot.
+    """
+
+    __slots__ = ('elapsed', 'requests_rate', 'connections_rate',
+                 'items_rate', 'memory_rate', 'memory_usage')
+
+    def __init__(self, previous, current):
+        elapsed = current.timestamp - previous.timestamp
+        self.elapsed = elapsed
+        self.requests_rate = _rate(previous.total_requests,
+                                   current.total_requests, elapsed)
+        self.connections_rate = _rate(previous.total_connections,
+                                      current.total_connections, elapsed)
+        self.items_rate = _rate(previous.total_items,
+                                current.total_items, elapsed)
+        self.memory_rate = _rate(previous.memory_used,
+                                 current.memory_used, elapsed)
+        if current.memory_usable and current.memory_used is not None:
+            self.memory_usage = current.memory_used / current.memory_usable
+        else:
+            self.memory_usage = None
+
+    def __repr__(self):
+        return '<StatsRates requests={} memory={}>'.format(
+            self.requests_rate, self.memory_rate)
+
+    def as_dict(self):
+        """Rates as ``dict``."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _rate(old, new, elapsed):
+    if old is None or new is None or elapsed <= 0:
+        return None
+    return (new - old) / elapsed
+
+
+class StatsCollector:
+    """Background poller of server stats.
+
+    :param gibson: ``Gibson`` or ``GibsonPool`` instance.
+    :param interval: ``float`` seconds between polls.
+    """
+
+    _shared = weakref.WeakKeyDictionary()
+
+    def __init__(self, gibson, *, interval=10.0):
+        self._gibson = gibson
+        self._interval = interval
+        self._listeners = []
+        self._latest = None
+        self._rates = None
+        self._task = None
+        self._closed = False
+
+    @classmethod
+    def shared(cls, gibson, *, interval=10.0):
+        """Return collector shared by all users of given ``Gibson`` or
+        ``GibsonPool``, creating it if needed.
+
+        :param gibson: ``Gibson`` or ``GibsonPool`` instance.
+        :param interval: ``float`` seconds between polls, only used when
+            collector is created.
+        :return: ``StatsCollector`` instance
+        """
+        collector = cls._shared.get(gibson)
+        if collector is None or collector.closed:
+            collector = cls(gibson, interval=interval)
+            cls._shared[gibson] = collector
+        return collector
+
+    def __repr__(self):
+        return '<StatsCollector {!r}>'.format(self._gibson)
+
+    @property
+    def latest(self):
+        """Most recent ``Stats`` snapshot or ``None``."""
+        return self._latest
+
+    @property
+    def rates(self):
+        """``StatsRates`` computed from two most recent snapshots or
+        ``None``."""
+        return self._rates
+
+    @property
+    def closed(self):
+        """True if collector is closed."""
+        return self._closed
+
+    def add_listener(self, callback):
+        """Add callback called as ``callback(stats, rates)`` after every
+        poll, ``rates`` is ``None`` after the first one.
+
+        :param callback: callable
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """Remove previously added callback.
+
+        :param callback: callable
+        """
+        self._listeners.remove(callback)
+
+    def metrics(self):
+        """Flat ``dict`` of latest stats and rates suitable for metric
+        exporters, keys are names of ``Stats`` and ``StatsRates``
+        attributes."""
+        result = {}
+        if self._latest is not None:
+            result.update(self._latest.as_dict())
+        if self._rates is not None:
+            result.update(self._rates.as_dict())
+        return result
+
+    def start(self):
+        """Start background polling."""
+        assert not self._closed, "StatsCollector is closed"
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def close(self):
+        """Stop background polling."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+
+    async def wait_closed(self):
+        if self._task is not None:
+            await asyncio.wait([self._task])
+
+    async def poll(self):
+        """Take snapshot now, update rates and notify listeners.
+
+        :return: ``Stats`` snapshot
+        """
+        reply = await self._gibson.stats()
+        stats = Stats.from_reply(reply)
+        if self._latest is not None:
+            self._rates = StatsRates(self._latest, stats)
+        self._latest = stats
+        for callback in list(self._listeners):
+            try:
+                callback(stats, self._rates)
+            except Exception:
+                logger.exception("Stats listener %r failed", callback)
+        return stats
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Failed to poll stats: %r", exc)
+            await asyncio.sleep(self._interval)
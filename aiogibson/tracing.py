@@ -0,0 +1,242 @@
+"""Client side command instrumentation.
+
+Tracer installed into connection is notified when every command is sent and
+when its reply is received:
+
+.. code:: python
+
+    histogram = LatencyHistogram()
+    gibson = await create_gibson('/tmp/gibson.sock', tracer=histogram)
+    ...
+    print(histogram.summary())
+
+Connections without tracer pay only for single ``is None`` check per command
+and per reply.
+"""
+import logging
+import time
+from collections import deque, namedtuple
+
+from . import consts
+
+__all__ = ['Tracer', 'MultiTracer', 'LatencyHistogram', 'SlowLog',
+           'SlowCommand', 'command_name']
+
+logger = logging.getLogger(__name__)
+
+_COMMAND_NAMES = {op_code: command.decode('ascii')
+                  for command, op_code in consts.command_map.items()}
+_SEND_HEADER_SIZE = consts.REPL_SIZE + consts.OP_CODE_SIZE
+
+
+def command_name(op_code):
+    """Name of gibson command for given operation code."""
+    return _COMMAND_NAMES.get(op_code, str(op_code))
+
+
+class _Span:
+
+    __slots__ = ('op_code', 'args_size', 'queue_depth', 'started')
+
+    def __init__(self, op_code, args_size, queue_depth, started):
+        self.op_code = op_code
+        self.args_size = args_size
+        self.queue_depth = queue_depth
+        self.started = started
+
+
+class Tracer:
+    """Base tracer, subclasses usually override only ``on_command``.
+
+    ``on_send`` is called when command is written to connection, its
+    return value is passed to ``on_reply`` along with parsed reply.
+    """
+
+    clock = time.perf_counter
+
+    def on_send(self, op_code, data, queue_depth):
+        """Command is about to be sent.
+
+        :param op_code: ``int`` gibson operation code.
+        :param data: ``bytes`` encoded command.
+        :param queue_depth: ``int`` number of commands waiting for reply
+            on the connection.
+        :return: trace context passed to ``on_reply``
+        """
+        return _Span(op_code, len(data) - _SEND_HEADER_SIZE, queue_depth,
+                     self.clock())
+
+    def on_reply(self, span, reply, reply_size):
+        """Reply for the command is received.
+
+        :param span: value returned by ``on_send``.
+        :param reply: parsed reply or ``GibsonError`` instance.
+        :param reply_size: ``int`` size of reply payload in bytes.
+        """
+        error = reply if isinstance(reply, Exception) else None
+        self.on_command(span.op_code, span.args_size, reply_size,
+                        span.queue_depth, self.clock() - span.started, error)
+
+    def on_command(self, op_code, args_size, reply_size, queue_depth,
+                   latency, error):
+        """Command is completed.
+
+        :param op_code: ``int`` gibson operation code.
+        :param args_size: ``int`` size of command arguments in bytes.
+        :param reply_size: ``int`` size of reply payload in bytes.
+        :param queue_depth: ``int`` number of commands waiting for reply
+            when the command was sent.
+        :param latency: ``float`` seconds between send and reply.
+        :param error: ``GibsonError`` returned by server or ``None``.
+        """
+
+
+class MultiTracer(Tracer):
+    """Passes notifications to several tracers, since connection accepts
+    only one:
+
+    .. code:: python
+
+        tracer = MultiTracer(LatencyHistogram(), SlowLog(threshold=0.1))
+    """
+
+    def __init__(self, *tracers):
+        self.tracers = tracers
+
+    def on_send(self, op_code, data, queue_depth):
+        return [tracer.on_send(op_code, data, queue_depth)
+                for tracer in self.tracers]
+
+    def on_reply(self, spans, reply, reply_size):
+        for tracer, span in zip(self.tracers, spans):
+            tracer.on_reply(span, reply, reply_size)
+
+
+class _Histogram:
+    # HDR-style log-linear histogram of integer microseconds: values are
+    # grouped by power of two, every power is split into 2 ** SUB_BITS
+    # linear buckets, so relative error stays below 2 ** -SUB_BITS
+
+    SUB_BITS = 4
+    SUB_COUNT = 1 << SUB_BITS
+
+    __slots__ = ('counts', 'total', 'max')
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value):
+        if value < self.SUB_COUNT:
+            return value
+        shift = value.bit_length() - self.SUB_BITS - 1
+        return (shift + 1) * self.SUB_COUNT + (value >> shift) - self.SUB_COUNT
+
+    def _lowest(self, index):
+        if index < self.SUB_COUNT:
+            return index
+        shift = index // self.SUB_COUNT - 1
+        return (index % self.SUB_COUNT + self.SUB_COUNT) << shift
+
+    def record(self, value):
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        if not self.total:
+            return 0
+        rank = max(1, int(self.total * q / 100.0 + 0.5))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                # highest value of the bucket, so q=100 gives exact max
+                return min(self._lowest(index + 1) - 1, self.max)
+        return self.max
+
+
+class LatencyHistogram(Tracer):
+    """Latency histogram per gibson command, values are recorded with
+    microsecond resolution and ~6% precision."""
+
+    def __init__(self):
+        self._histograms = {}
+
+    def on_command(self, op_code, args_size, reply_size, queue_depth,
+                   latency, error):
+        histogram = self._histograms.get(op_code)
+        if histogram is None:
+            histogram = self._histograms[op_code] = _Histogram()
+        histogram.record(int(latency * 1000000))
+
+    def count(self, command):
+        """Number of recorded replies for the command.
+
+        :param command: ``bytes`` gibson command, for instance ``b'get'``.
+        """
+        histogram = self._histograms.get(consts.command_map[command])
+        return histogram.total if histogram else 0
+
+    def percentile(self, command, q):
+        """Latency percentile of the command in seconds.
+
+        :param command: ``bytes`` gibson command, for instance ``b'get'``.
+        :param q: ``float`` percentile in range 0..100.
+        """
+        histogram = self._histograms.get(consts.command_map[command])
+        if histogram is None:
+            return 0.0
+        return histogram.percentile(q) / 1000000
+
+    def summary(self, percentiles=(50, 90, 99, 99.9)):
+        """Latency summary for every seen command.
+
+        :return: ``dict`` mapping command name to ``dict`` with ``count``,
+            ``max`` and ``pXX`` latencies in seconds.
+        """
+        result = {}
+        for op_code, histogram in self._histograms.items():
+            item = {'count': histogram.total, 'max': histogram.max / 1000000}
+            for q in percentiles:
+                item['p{:g}'.format(q)] = histogram.percentile(q) / 1000000
+            result[command_name(op_code)] = item
+        return result
+
+    def reset(self):
+        """Drop all recorded values."""
+        self._histograms = {}
+
+
+SlowCommand = namedtuple('SlowCommand', [
+    'timestamp', 'command', 'args_size', 'reply_size', 'queue_depth',
+    'latency', 'error'])
+
+
+class SlowLog(Tracer):
+    """Keeps last ``maxlen`` commands slower than ``threshold``.
+
+    :param threshold: ``float`` latency in seconds.
+    :param maxlen: ``int`` number of kept entries.
+    :param log: ``bool`` also log slow commands with ``logging`` module.
+    """
+
+    def __init__(self, threshold=0.01, maxlen=128, log=False):
+        self.threshold = threshold
+        self.entries = deque(maxlen=maxlen)
+        self._log = log
+
+    def on_command(self, op_code, args_size, reply_size, queue_depth,
+                   latency, error):
+        if latency < self.threshold:
+            return
+        entry = SlowCommand(time.time(), command_name(op_code), args_size,
+                            reply_size, queue_depth, latency, error)
+        self.entries.append(entry)
+        if self._log:
+            logger.warning("Slow gibson command %s: %.6fs, args %d bytes, "
+                           "reply %d bytes, queue depth %d", entry.command,
+                           latency, args_size, reply_size, queue_depth)
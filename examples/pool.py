@@ -2,19 +2,14 @@ import asyncio
 from aiogibson import create_pool
 
 
-loop = asyncio.get_event_loop()
+async def go():
+    pool = await create_pool('/tmp/gibson.sock', minsize=5, maxsize=10)
 
-
-@asyncio.coroutine
-def go():
-    pool = yield from create_pool('/tmp/gibson.sock', minsize=5, maxsize=10,
-                                  loop=loop)
-
-    with (yield from pool) as gibson:
-        yield from gibson.set('foo', 'bar')
-        value = yield from gibson.get('foo')
+    async with pool.acquire() as gibson:
+        await gibson.set('foo', 'bar')
+        value = await gibson.get('foo')
         print(value)
 
-    pool.clear()
+    await pool.clear()
 
-loop.run_until_complete(go())
+asyncio.run(go())
@@ -8,12 +8,8 @@ install_requires = []
 
 PY_VER = sys.version_info
 
-if PY_VER >= (3, 4):
-    pass
-elif PY_VER >= (3, 3):
-    install_requires.append('asyncio')
-else:
-    raise RuntimeError("aiogibson doesn't support Python version prior 3.3")
+if PY_VER < (3, 7):
+    raise RuntimeError("aiogibson doesn't support Python version prior 3.7")
 
 
 def read(*parts):
@@ -39,8 +35,9 @@ classifiers = [
     'Development Status :: 4 - Beta',
     'Programming Language :: Python',
     'Programming Language :: Python :: 3',
-    'Programming Language :: Python :: 3.3',
-    'Programming Language :: Python :: 3.4',
+    'Programming Language :: Python :: 3.7',
+    'Programming Language :: Python :: 3.8',
+    'Programming Language :: Python :: 3.9',
     'Operating System :: POSIX',
     'Environment :: Web Environment',
     'Intended Audience :: Developers',
@@ -60,5 +57,6 @@ setup(name='aiogibson',
       license="MIT",
       packages=find_packages(exclude=["tests"]),
       install_requires=install_requires,
+      python_requires=">=3.7",
       include_package_data=True,
       )
\ No newline at end of file
@@ -1,14 +1,53 @@
 import asyncio
+import os
+import tempfile
+import threading
 import unittest
 
 from functools import wraps
 from aiogibson.commands import create_gibson
+from aiogibson.connection import parse_address
+from aiogibson.server import create_server
 
+_server_address = None
+_server_lock = threading.Lock()
+
+
+def gibson_address():
+    """Address of gibson server used by tests.
+
+    Real server is used if ``GIBSON_SOCKET`` environment variable is set
+    (unix socket path or host:port), otherwise in-process server is started
+    in background thread.
+    """
+    global _server_address
+    with _server_lock:
+        if _server_address is None:
+            address = os.environ.get('GIBSON_SOCKET')
+            if address:
+                _server_address = parse_address(address)
+            else:
+                _server_address = _start_server()
+        return _server_address
 
-def run_until_complete(fun):
-    if not asyncio.iscoroutinefunction(fun):
-        fun = asyncio.coroutine(fun)
 
+def _start_server():
+    path = os.path.join(tempfile.mkdtemp(), 'gibson.sock')
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(create_server(path))
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return path
+
+
+def run_until_complete(fun):
     @wraps(fun)
     def wrapper(test, *args, **kw):
         loop = test.loop
@@ -23,7 +62,7 @@ class BaseTest(unittest.TestCase):
 
     def setUp(self):
         self.loop = asyncio.new_event_loop()
-        self.gibson_socket = '/tmp/gibson.sock'
+        self.gibson_socket = gibson_address()
 
     def tearDown(self):
         self.loop.close()
@@ -35,7 +74,7 @@ class GibsonTest(BaseTest):
     def setUp(self):
         super().setUp()
         self.gibson = self.loop.run_until_complete(create_gibson(
-            self.gibson_socket, loop=self.loop))
+            self.gibson_socket))
 
     def tearDown(self):
         if not self.gibson.closed:
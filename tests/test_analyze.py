@@ -0,0 +1,59 @@
+import io
+
+from ._testutil import GibsonTest, run_until_complete
+from aiogibson.analyze import analyze, format_report
+from aiogibson.connection import parse_address
+
+
+class AnalyzeTest(GibsonTest):
+
+    @run_until_complete
+    async def test_analyze(self):
+        for i in range(30):
+            key = 'test:user:{}:name'.format(i).encode('ascii')
+            await self.gibson.set(key, b'x' * 10, 100)
+        for i in range(5):
+            key = 'test:session:{}'.format(i).encode('ascii')
+            await self.gibson.set(key, b'y' * 100)
+        await self.gibson.set(b'test:plain', b'z')
+
+        report = await analyze(self.gibson, b'test:', depth=2,
+                               sample=10, page_size=7, batch_size=4)
+        self.assertEqual(report.keys, 36)
+        self.assertEqual(sorted(report.children),
+                         [b'test:session:', b'test:user:'])
+        user = report.children[b'test:user:']
+        self.assertEqual(user.keys, 30)
+        self.assertEqual(user.sampled, 10)
+        self.assertEqual(user.avg_value_size, 10)
+        self.assertEqual(user.ttl_histogram['<3600s'], 10)
+        self.assertEqual(len(user.children), 30)
+        self.assertEqual(user.children[b'test:user:7:'].keys, 1)
+        session = report.children[b'test:session:']
+        self.assertEqual(session.approx_bytes,
+                         sum(len('test:session:{}'.format(i)) + 100
+                             for i in range(5)))
+        self.assertEqual(session.ttl_histogram['none'], 5)
+        self.assertEqual(session.children, {})
+        self.assertTrue(report.avg_idle < 5)
+        self.assertEqual(len(list(report.walk())), 33)
+
+        data = report.as_dict()
+        self.assertEqual(data['prefix'], 'test:')
+        self.assertEqual(data['children'][0]['keys'], 5)
+        out = io.StringIO()
+        format_report(report, out)
+        self.assertEqual(len(out.getvalue().splitlines()), 34)
+
+    @run_until_complete
+    async def test_empty(self):
+        report = await analyze(self.gibson, b'test:nope')
+        self.assertEqual(report.keys, 0)
+        self.assertEqual(report.approx_bytes, 0)
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address('/tmp/gibson.sock'),
+                         '/tmp/gibson.sock')
+        self.assertEqual(parse_address('localhost:10128'),
+                         ('localhost', 10128))
+        self.assertEqual(parse_address('./gibson:1.sock'), './gibson:1.sock')
@@ -0,0 +1,88 @@
+import io
+import json
+import random
+import sys
+import unittest
+from collections import Counter
+
+from ._testutil import GibsonTest, run_until_complete
+from aiogibson import bench
+
+
+class MicroBenchTest(unittest.TestCase):
+
+    def test_zipf(self):
+        zipf = bench.ZipfGenerator(100, 1.2, random.Random(1))
+        counts = Counter(zipf() for _ in range(10000))
+        self.assertTrue(all(0 <= value < 100 for value in counts))
+        self.assertEqual(counts.most_common(1)[0][0], 0)
+        self.assertTrue(counts[0] > counts[1] > counts[10])
+        uniform = bench.ZipfGenerator(1, 0)
+        self.assertEqual(uniform(), 0)
+        with self.assertRaises(ValueError):
+            bench.ZipfGenerator(0)
+
+    def test_parse_value_sizes(self):
+        self.assertEqual(bench.parse_value_sizes('64:0.9, 4096:0.1'),
+                         [(64, 0.9), (4096, 0.1)])
+        self.assertEqual(bench.parse_value_sizes('10'), [(10, 1.0)])
+        with self.assertRaises(ValueError):
+            bench.parse_value_sizes('10:0')
+        with self.assertRaises(ValueError):
+            bench.parse_value_sizes('big')
+
+    def test_micro(self):
+        res = bench.bench_encode(number=100)
+        self.assertEqual(res['name'], 'encode')
+        self.assertTrue(res['ops'] > 0)
+        res = bench.bench_parse(number=100, chunk_size=7)
+        self.assertEqual(res['name'], 'parse')
+        res = bench.bench_parse(number=10, pairs=3)
+        self.assertEqual(res['name'], 'parse_kv')
+        self.assertTrue(res['bytes'] > 0)
+
+    def test_main_in_process(self):
+        out, sys.stdout = sys.stdout, io.StringIO()
+        try:
+            bench.main(['--in-process', '--workload', 'set,get',
+                        '--connections', '2', '--requests', '20',
+                        '--keys', '5', '--json'])
+            res = [json.loads(line)
+                   for line in sys.stdout.getvalue().splitlines()]
+        finally:
+            sys.stdout = out
+        self.assertEqual([r['name'] for r in res], ['set', 'get'])
+        self.assertEqual(res[1]['requests'], 20)
+
+
+class WorkloadTest(GibsonTest):
+
+    @run_until_complete
+    async def test_workloads(self):
+        for workload in bench.WORKLOADS:
+            res = await bench.run_workload(
+                self.gibson_socket, workload, connections=2, pipeline=4,
+                requests=50, keys=30, value_sizes=[(10, 1), (100, 1)],
+                prefix=b'test:bench:', seed=1)
+            self.assertEqual(res['name'], workload)
+            self.assertEqual(res['requests'], 50)
+            self.assertTrue(res['throughput'] > 0)
+            latency = res['latency']
+            self.assertTrue(0 < latency['p50'] <= latency['p99'] <=
+                            latency['max'])
+        res = await self.gibson.count(b'test:bench:')
+        self.assertEqual(res, 30)
+        with self.assertRaises(ValueError):
+            await bench.run_workload(self.gibson_socket, 'del')
+
+    def test_main(self):
+        out, sys.stdout = sys.stdout, io.StringIO()
+        try:
+            bench.main([self.gibson_socket, '--workload', 'get',
+                        '--connections', '1', '--requests', '10',
+                        '--keys', '5', '--prefix', 'test:bench:', '--json'])
+            res = json.loads(sys.stdout.getvalue())
+        finally:
+            sys.stdout = out
+        self.assertEqual(res['name'], 'get')
+        self.assertEqual(res['requests'], 10)
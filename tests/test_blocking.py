@@ -0,0 +1,199 @@
+import threading
+import unittest
+
+from ._testutil import gibson_address
+from aiogibson import errors
+from aiogibson.blocking import create_client, ClientPool, GibsonClient
+from aiogibson.commands import KeyMeta
+from aiogibson.tracing import LatencyHistogram
+
+
+class GibsonClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.address = gibson_address()
+        self.gibson = create_client(self.address)
+
+    def tearDown(self):
+        if not self.gibson.closed:
+            self.gibson.mdelete(b'test:')
+        self.gibson.close()
+
+    def test_commands(self):
+        key = b'test:blocking'
+        self.assertEqual(self.gibson.set(key, b'bar', 10), b'bar')
+        self.assertEqual(self.gibson.get(key), b'bar')
+        self.assertIs(self.gibson.ttl(key, 20), True)
+        self.assertEqual(self.gibson.keys(b'test:'), [key])
+        self.assertEqual(self.gibson.count(b'test:'), 1)
+        self.assertIs(self.gibson.delete(key), True)
+        self.assertIs(self.gibson.delete(key), False)
+        self.assertIsNone(self.gibson.get(key))
+        self.assertTrue(self.gibson.ping())
+        with self.assertRaises(TypeError):
+            self.gibson.set(key, b'bar', expire='one')
+
+    def test_error_reply(self):
+        key = b'test:blocking:locked'
+        self.gibson.set(key, b'bar')
+        self.gibson.lock(key, 10)
+        with self.assertRaises(errors.KeyLockedError):
+            self.gibson.set(key, b'baz')
+        # connection stays usable after error reply
+        self.assertTrue(self.gibson.unlock(key))
+        self.assertEqual(self.gibson.set(key, b'baz'), b'baz')
+
+    def test_encoding(self):
+        client = create_client(self.address, encoding='utf-8')
+        with client:
+            client.set(b'test:blocking:enc', 'значение')
+            self.assertEqual(client.get(b'test:blocking:enc'), 'значение')
+            self.assertEqual(client._conn.execute(
+                b'get', b'test:blocking:enc', encoding=None),
+                'значение'.encode('utf-8'))
+        self.assertTrue(client.closed)
+
+    def test_meta(self):
+        key = b'test:blocking:meta'
+        self.gibson.set(key, b'bar', 100)
+        meta = self.gibson.meta(key, fields=('size', 'ttl'))
+        self.assertEqual(meta, KeyMeta(size=3, ttl=100))
+        self.assertEqual(self.gibson.meta_many([key, b'test:nokey'],
+                                               fields=('size',)),
+                         [KeyMeta(size=3), None])
+
+    def test_batch(self):
+        batch = self.gibson.batch()
+        batch.set(b'test:b1', b'1').set(b'test:b2', b'2')
+        batch.get(b'test:b1').delete(b'test:b2').inc(b'test:b1')
+        self.assertEqual(len(batch), 5)
+        self.assertEqual(batch.execute(), [b'1', b'2', b'1', True, 2])
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(batch.execute(), [])
+        with self.assertRaises(AttributeError):
+            batch.meta(b'test:b1')
+
+    def test_batch_errors(self):
+        self.gibson.set(b'test:b1', b'bar')
+        self.gibson.lock(b'test:b1', 10)
+        batch = self.gibson.batch().set(b'test:b1', b'x').get(b'test:b1')
+        with self.assertRaises(errors.KeyLockedError):
+            batch.execute()
+        batch.set(b'test:b1', b'x').get(b'test:b1')
+        res = batch.execute(raise_on_error=False)
+        self.assertIsInstance(res[0], errors.KeyLockedError)
+        self.assertEqual(res[1], b'bar')
+        self.gibson.unlock(b'test:b1')
+
+    def test_iter_prefix(self):
+        batch = self.gibson.batch()
+        keys = [b'test:it:' + bytes((i,)) * 2 for i in range(97, 107)]
+        for key in keys:
+            batch.set(key, key)
+        batch.execute()
+        self.assertEqual(list(self.gibson.iter_prefix(b'test:it:', 3)),
+                         [(key, key) for key in keys])
+        self.assertEqual(list(self.gibson.iter_keys(b'test:it:', 3)), keys)
+
+    def test_chunked(self):
+        value = bytes(range(256)) * 10
+        self.assertEqual(self.gibson.set_chunked(
+            b'test:chunked', value, chunk_size=1000), 3)
+        self.assertEqual(self.gibson.get_chunked(b'test:chunked'), value)
+        self.gibson.set_chunked(b'test:chunked', b'short', chunk_size=1000)
+        self.assertEqual(self.gibson.get_chunked(b'test:chunked'), b'short')
+        self.assertEqual(self.gibson.count(b'test:chunked'), 2)
+        self.gibson.set_chunked(b'test:chunked:#x', b'other', chunk_size=2)
+        self.assertEqual(self.gibson.ttl_chunked(b'test:chunked', 20), 2)
+        self.assertEqual(self.gibson.delete_chunked(b'test:chunked'), 2)
+        self.assertIsNone(self.gibson.get_chunked(b'test:chunked'))
+        self.assertEqual(self.gibson.get_chunked(b'test:chunked:#x'),
+                         b'other')
+
+    def test_tracer(self):
+        histogram = LatencyHistogram()
+        with create_client(self.address, tracer=histogram) as client:
+            client.set(b'test:traced', b'bar')
+            client.batch().get(b'test:traced').get(b'test:traced').execute()
+        self.assertEqual(histogram.summary()['get']['count'], 2)
+        self.assertEqual(histogram.summary()['set']['count'], 1)
+
+    def test_end(self):
+        self.assertTrue(self.gibson.end())
+        self.assertTrue(self.gibson.closed)
+
+
+class ClientPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ClientPool(gibson_address(), minsize=1, maxsize=2)
+
+    def tearDown(self):
+        self.pool.mdelete(b'test:')
+        self.pool.close()
+
+    def test_commands(self):
+        self.assertEqual(self.pool.size, 1)
+        self.assertEqual(self.pool.set(b'test:pool', b'bar'), b'bar')
+        self.assertEqual(self.pool.get(b'test:pool'), b'bar')
+        self.assertEqual(self.pool.freesize, 1)
+        with self.pool.acquire() as gibson:
+            self.assertIsInstance(gibson, GibsonClient)
+            self.assertEqual(self.pool.freesize, 0)
+        self.assertEqual(self.pool.freesize, 1)
+        with self.assertRaises(AttributeError):
+            self.pool.no_such_command
+
+    def test_maxsize(self):
+        with self.pool.acquire(), self.pool.acquire():
+            self.assertEqual(self.pool.size, 2)
+            with self.assertRaises(TimeoutError):
+                self.pool.acquire(timeout=0.01)
+        self.assertEqual(self.pool.freesize, 2)
+
+    def test_iter_prefix(self):
+        keys = ['test:it:{:02d}'.format(i).encode('ascii') for i in range(10)]
+        for key in keys:
+            self.pool.set(key, key)
+        it = self.pool.iter_prefix(b'test:it:', 3)
+        self.assertEqual(next(it), (keys[0], keys[0]))
+        # connection is held by the iterator between pages
+        self.assertEqual(self.pool.freesize, 0)
+        self.assertEqual([key for key, _ in it], keys[1:])
+        self.assertEqual(self.pool.freesize, 1)
+        self.assertEqual(list(self.pool.iter_keys(b'test:it:', 3)), keys)
+        self.assertEqual(self.pool.freesize, 1)
+
+        with self.pool.iter_keys(b'test:it:', 3) as it:
+            self.assertEqual(next(it), keys[0])
+            self.assertEqual(self.pool.freesize, 0)
+        self.assertEqual(self.pool.freesize, 1)
+        self.assertEqual(list(it), [])
+
+    def test_threads(self):
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(50):
+                    key = 'test:thread:{}:{}'.format(n, i).encode('ascii')
+                    self.pool.set(key, key)
+                    self.assertEqual(self.pool.get(key), key)
+            except Exception as exc:  # pragma: no cover
+                errors.append(exc)
+
+        threads = [threading.Thread(target=worker, args=(n,))
+                   for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(self.pool.size, 2)
+        self.assertEqual(self.pool.count(b'test:thread:'), 400)
+
+    def test_broken_connection_dropped(self):
+        with self.pool.acquire() as gibson:
+            gibson.close()
+        self.assertEqual(self.pool.size, 0)
+        self.assertTrue(self.pool.ping())
@@ -0,0 +1,92 @@
+import concurrent.futures
+import threading
+import unittest
+
+from ._testutil import gibson_address
+from aiogibson import errors
+from aiogibson.bridge import GibsonBridge
+
+
+class GibsonBridgeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bridge = GibsonBridge(gibson_address(), maxsize=2)
+
+    def tearDown(self):
+        if not self.bridge.closed:
+            self.bridge.mdelete(b'test:').result()
+            self.bridge.close()
+
+    def test_commands(self):
+        fut = self.bridge.set(b'test:bridge', b'bar')
+        self.assertIsInstance(fut, concurrent.futures.Future)
+        self.assertEqual(fut.result(), b'bar')
+        self.assertEqual(self.bridge.get(b'test:bridge').result(), b'bar')
+        # coroutine methods are scheduled as well
+        self.assertIs(self.bridge.delete(b'test:bridge').result(), True)
+        meta = self.bridge.meta(b'test:nokey').result()
+        self.assertIsNone(meta)
+        with self.assertRaises(AttributeError):
+            self.bridge.no_such_command
+
+    def test_errors(self):
+        self.bridge.set(b'test:locked', b'bar').result()
+        self.bridge.lock(b'test:locked', 10).result()
+        with self.assertRaises(errors.KeyLockedError):
+            self.bridge.set(b'test:locked', b'baz').result()
+        with self.assertRaises(TypeError):
+            self.bridge.set(b'test:locked', b'baz', 'one').result()
+        self.assertTrue(self.bridge.unlock(b'test:locked').result())
+
+    def test_batching(self):
+        # loop thread is busy, so commands pile up in the queue
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait()
+        self.bridge.loop.call_soon_threadsafe(block)
+        started.wait()
+        before = self.bridge.counters
+        futs = [self.bridge.set('test:batch:{}'.format(i), i)
+                for i in range(100)]
+        release.set()
+        self.assertEqual([fut.result() for fut in futs],
+                         [str(i).encode('ascii') for i in range(100)])
+        counters = self.bridge.counters
+        self.assertEqual(counters['commands'] - before['commands'], 100)
+        self.assertEqual(counters['wakeups'] - before['wakeups'], 1)
+        self.assertEqual(counters['batches'] - before['batches'], 1)
+
+    def test_threads(self):
+        def worker(n):
+            futs = [self.bridge.set('test:thread:{}:{}'.format(n, i), i)
+                    for i in range(50)]
+            return [fut.result() for fut in futs]
+
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(worker, range(8)))
+        self.assertEqual(results,
+                         [[str(i).encode('ascii') for i in range(50)]] * 8)
+        self.assertEqual(self.bridge.count(b'test:thread:').result(), 400)
+
+    def test_cancelled(self):
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait()
+        self.bridge.loop.call_soon_threadsafe(block)
+        started.wait()
+        fut = self.bridge.set(b'test:cancelled', b'bar')
+        self.assertTrue(fut.cancel())
+        release.set()
+        self.assertIsNone(self.bridge.get(b'test:cancelled').result())
+
+    def test_close(self):
+        with GibsonBridge(gibson_address()) as bridge:
+            fut = bridge.ping()
+        self.assertTrue(fut.result())
+        self.assertTrue(bridge.closed)
+        with self.assertRaises(errors.GibsonError):
+            bridge.ping()
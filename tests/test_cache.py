@@ -0,0 +1,142 @@
+import asyncio
+
+from ._testutil import GibsonTest, run_until_complete
+from aiogibson.cache import cached, CacheAside, LOCK_SUFFIX
+
+
+class CacheTest(GibsonTest):
+
+    @run_until_complete
+    async def test_cached(self):
+        calls = []
+
+        @cached(self.gibson, expire=10, prefix=b'test:cache:')
+        async def square(x):
+            calls.append(x)
+            return x * x
+
+        res = await square(3)
+        self.assertEqual(res, 9)
+        res = await square(3)
+        self.assertEqual(res, 9)
+        res = await square(4)
+        self.assertEqual(res, 16)
+        self.assertEqual(calls, [3, 4])
+
+        res = await self.gibson.count(b'test:cache:')
+        self.assertEqual(res, 2)
+        res = await self.gibson.meta_ttl(
+            square.cache._default_key(square.__wrapped__, (3,), {}))
+        self.assertTrue(9 <= res <= 10)
+
+    @run_until_complete
+    async def test_stampede(self):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return b'value'
+
+        cache = CacheAside(self.gibson, expire=10)
+        res = await asyncio.gather(
+            *[cache.load(b'test:stampede', compute) for _ in range(10)])
+        self.assertEqual(res, [b'value'] * 10)
+        self.assertEqual(calls, [1])
+        # lock is released after value is computed
+        res = await self.gibson.get(b'test:stampede:lock')
+        self.assertEqual(res, None)
+
+    @run_until_complete
+    async def test_serve_stale(self):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return b'new'
+
+        async def old():
+            return b'old'
+
+        cache = CacheAside(self.gibson, expire=5, stale=10)
+        key = b'test:stale'
+        await cache._compute(key, old, (), {})
+        # shrink TTL so value is logically expired but still in stale window
+        await self.gibson.ttl(key, 8)
+
+        # somebody else recomputes value, stale one is returned
+        token = await cache._acquire(key)
+        res = await cache.load(key, compute)
+        self.assertEqual(res, b'old')
+        await cache.wait_pending()
+        self.assertEqual(calls, [])
+        await cache._release(key, token)
+
+        res = await cache.load(key, compute)
+        self.assertEqual(res, b'old')
+        await cache.wait_pending()
+        self.assertEqual(calls, [1])
+        res = await cache.load(key, compute)
+        self.assertEqual(res, b'new')
+        res = await self.gibson.meta_left(key)
+        self.assertTrue(res > 10)
+
+    @run_until_complete
+    async def test_invalidate(self):
+        async def compute(value):
+            return value
+
+        cache = CacheAside(self.gibson, expire=5)
+        res = await cache.load(b'test:invalidate', compute, 1)
+        self.assertEqual(res, 1)
+        res = await cache.invalidate(b'test:invalidate')
+        self.assertTrue(res)
+        res = await cache.load(b'test:invalidate', compute, 2)
+        self.assertEqual(res, 2)
+
+        with self.assertRaises(TypeError):
+            CacheAside(self.gibson, expire='one')
+
+    @run_until_complete
+    async def test_foreign_lock(self):
+        cache = CacheAside(self.gibson, expire=5, lock_timeout=10)
+        key = b'test:foreign'
+        token = await cache._acquire(key)
+        self.assertIsNotNone(token)
+        self.assertIsNone(await cache._acquire(key))
+        # lock expired meanwhile and other worker took it
+        await self.gibson.unlock(key + LOCK_SUFFIX)
+        await self.gibson.delete(key + LOCK_SUFFIX)
+        other = await cache._acquire(key)
+        self.assertNotEqual(other, token)
+        await cache._release(key, token)
+        self.assertTrue(await self.gibson.meta_lock(key + LOCK_SUFFIX))
+        self.assertEqual(await self.gibson.get(key + LOCK_SUFFIX), other)
+        await cache._release(key, other)
+        self.assertIsNone(await self.gibson.get(key + LOCK_SUFFIX))
+
+    @run_until_complete
+    async def test_failed_refresh_logged(self):
+        async def fail():
+            raise ValueError('backend is down')
+
+        cache = CacheAside(self.gibson, expire=5, stale=10)
+        key = b'test:refresh'
+        token = await cache._acquire(key)
+        with self.assertLogs('aiogibson.cache', 'WARNING') as logs:
+            await cache._refresh(key, fail, (), {}, token)
+        self.assertIn('backend is down', logs.output[0])
+        self.assertIsNone(await self.gibson.get(key + LOCK_SUFFIX))
+
+    @run_until_complete
+    async def test_short_ttl_jitter(self):
+        async def compute():
+            return 1
+
+        cache = CacheAside(self.gibson, expire=5, jitter=0.1)
+        ttls = set()
+        for i in range(30):
+            key = 'test:jitter:{}'.format(i).encode('ascii')
+            await cache._compute(key, compute, (), {})
+            ttls.add(await self.gibson.meta_ttl(key))
+        self.assertEqual(ttls, {4, 5})
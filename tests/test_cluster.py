@@ -0,0 +1,211 @@
+import os
+import tempfile
+import unittest
+
+from ._testutil import BaseTest, run_until_complete
+from aiogibson import create_gibson
+from aiogibson.cluster import HashRing, ShardedGibson, rebalance
+from aiogibson.server import create_server
+
+
+class HashRingTest(unittest.TestCase):
+
+    def test_distribution(self):
+        keys = ['key:{}'.format(i).encode('ascii') for i in range(3000)]
+        ring = HashRing(['a', 'b', 'c'])
+        owners = [ring.get_node(key) for key in keys]
+        for node in 'abc':
+            self.assertTrue(700 < owners.count(node) < 1300)
+        self.assertEqual(ring.get_node('key:1'), ring.get_node(b'key:1'))
+
+        # only keys moved to the new node change owner
+        bigger = HashRing(['a', 'b', 'c', 'd'])
+        moved = [(old, bigger.get_node(key))
+                 for old, key in zip(owners, keys)
+                 if old != bigger.get_node(key)]
+        self.assertTrue(500 < len(moved) < 1000)
+        self.assertTrue(all(new == 'd' for _, new in moved))
+
+        with self.assertRaises(ValueError):
+            HashRing([])
+
+
+class ClusterTest(BaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.servers = {}
+        self.nodes = {}
+        for name in ('a', 'b', 'c'):
+            path = os.path.join(tempfile.mkdtemp(), 'gibson.sock')
+            self.servers[name] = self.loop.run_until_complete(
+                create_server(path))
+            self.nodes[name] = self.loop.run_until_complete(
+                create_gibson(path))
+
+    def tearDown(self):
+        for name, gibson in self.nodes.items():
+            gibson.close()
+            self.loop.run_until_complete(gibson.wait_closed())
+            self.servers[name].close()
+            self.loop.run_until_complete(self.servers[name].wait_closed())
+        super().tearDown()
+
+    def _keys(self, name):
+        return len(self.servers[name].keyspace)
+
+    @run_until_complete
+    async def test_sharding(self):
+        gibson = ShardedGibson(self.nodes)
+        for i in range(60):
+            await gibson.set('test:{:02d}'.format(i), i, 100)
+        self.assertEqual(sum(self._keys(name) for name in 'abc'), 60)
+        self.assertTrue(all(self._keys(name) for name in 'abc'))
+        owner = gibson.node_for(b'test:07')
+        res = await self.nodes[owner].get(b'test:07')
+        self.assertEqual(res, b'7')
+
+        self.assertEqual((await gibson.get(b'test:07')), b'7')
+        self.assertEqual((await gibson.inc(b'test:07')), 8)
+        self.assertEqual((await gibson.meta_ttl(b'test:07')), 100)
+        self.assertEqual((await gibson.count(b'test:')), 60)
+        self.assertEqual((await gibson.count(b'nothing')), None)
+        keys = await gibson.keys(b'test:1')
+        self.assertEqual(sorted(keys), ['test:1{}'.format(i).encode('ascii')
+                                        for i in range(10)])
+        res = await gibson.mget(b'test:', 5)
+        self.assertTrue(len(res) <= 10)
+        self.assertEqual((await gibson.mdelete(b'test:')), 60)
+        self.assertFalse(gibson.migrating)
+        with self.assertRaises(AttributeError):
+            gibson.stats
+        with self.assertRaises(ValueError):
+            ShardedGibson(self.nodes, previous=['x'])
+
+    @run_until_complete
+    async def test_migration(self):
+        old = ShardedGibson({'a': self.nodes['a'], 'b': self.nodes['b']})
+        keys = ['test:{:03d}'.format(i).encode('ascii') for i in range(200)]
+        for key in keys:
+            await old.set(key, key, 1000 if key.endswith(b'0') else 0)
+
+        gibson = ShardedGibson(self.nodes, previous=['a', 'b'])
+        moved = [key for key in keys
+                 if gibson.node_for(key) != old.node_for(key)]
+        self.assertTrue(moved)
+        self.assertTrue(all(gibson.node_for(key) == 'c' for key in moved))
+        self.assertEqual(self._keys('c'), 0)
+        # reads of moved keys fall back to old owner
+        self.assertEqual((await gibson.get(moved[0])), moved[0])
+        # writes go to the new owner and drop old copy
+        await gibson.set(moved[1], b'new')
+        self.assertEqual((await self.nodes['c'].get(moved[1])), b'new')
+        self.assertEqual(
+            (await self.nodes[old.node_for(moved[1])].get(moved[1])),
+            None)
+
+        stats = await rebalance(self.nodes, ['a', 'b'], ['a', 'b', 'c'],
+                                b'test:', page_size=16, delete=True)
+        self.assertEqual(stats['scanned'], 199)
+        self.assertEqual(stats['moved'], len(moved) - 1)
+        self.assertEqual(stats['deleted'], len(moved) - 1)
+        self.assertEqual(stats['failed'], 0)
+        self.assertEqual(self._keys('c'), len(moved))
+        self.assertEqual(sum(self._keys(name) for name in 'abc'), 200)
+        for key in moved[2:]:
+            ttl = await self.nodes['c'].meta_ttl(key)
+            if key.endswith(b'0'):
+                self.assertTrue(998 <= ttl <= 1000)
+            else:
+                self.assertEqual(ttl, -1)
+
+        gibson.finish_migration()
+        self.assertFalse(gibson.migrating)
+        self.assertEqual((await gibson.get(moved[2])), moved[2])
+
+    @run_until_complete
+    async def test_migration_bool_commands(self):
+        old = ShardedGibson({'a': self.nodes['a'], 'b': self.nodes['b']})
+        keys = ['test:{:03d}'.format(i).encode('ascii') for i in range(50)]
+        for key in keys:
+            await old.set(key, key)
+        gibson = ShardedGibson(self.nodes, previous=['a', 'b'])
+        moved = [key for key in keys
+                 if gibson.node_for(key) != old.node_for(key)]
+        self.assertTrue(len(moved) > 1)
+        # keys are still held by old owner only
+        owner = self.nodes[old.node_for(moved[0])]
+        self.assertTrue(await gibson.ttl(moved[0], 100))
+        self.assertTrue(98 <= (await owner.meta_ttl(moved[0])) <= 100)
+        owner = self.nodes[old.node_for(moved[1])]
+        self.assertTrue(await gibson.lock(moved[1], 10))
+        self.assertTrue(await owner.meta_lock(moved[1]))
+        self.assertTrue(await gibson.unlock(moved[1]))
+        self.assertFalse(await gibson.ttl(b'test:none', 100))
+
+    @run_until_complete
+    async def test_rebalance_prefix_count(self):
+        old = ShardedGibson({'a': self.nodes['a'], 'b': self.nodes['b']})
+        keys = ['test:{:03d}'.format(i).encode('ascii') for i in range(100)]
+        for key in keys:
+            await old.set(key, key)
+        gibson = ShardedGibson(self.nodes, previous=['a', 'b'])
+        await rebalance(self.nodes, ['a', 'b'], ['a', 'b', 'c'], b'test:')
+        gibson.finish_migration()
+        # copies are dropped from old owners, nothing is counted twice
+        self.assertEqual(await gibson.count(b'test:'), 100)
+        self.assertEqual(sorted(await gibson.keys(b'test:')), keys)
+
+    @run_until_complete
+    async def test_rebalance_throttled(self):
+        old = ShardedGibson({'a': self.nodes['a']})
+        for i in range(40):
+            await old.set('test:{:02d}'.format(i), b'x')
+        self.servers['b'].latency = 0.002
+        stats = await rebalance(self.nodes, ['a'], ['a', 'b'],
+                                page_size=10, max_latency=0.001,
+                                rate=1000, delete=False)
+        self.assertEqual(stats['scanned'], 40)
+        self.assertTrue(stats['moved'] > 0)
+        self.assertEqual(stats['deleted'], 0)
+        self.assertTrue(stats['throttled'] > 0.01)
+
+    @run_until_complete
+    async def test_rebalance_concurrent_writes(self):
+        old = ShardedGibson({'a': self.nodes['a']})
+        keys = ['test:{:02d}'.format(i).encode('ascii') for i in range(40)]
+        for key in keys:
+            await old.set(key, b'old')
+        gibson = ShardedGibson({'a': self.nodes['a'], 'b': self.nodes['b']},
+                               previous=['a'])
+        moved = [key for key in keys if gibson.node_for(key) == 'b']
+        self.assertTrue(len(moved) > 1)
+        updated, deleted = moved[:2]
+
+        class _WriteDuringCopy:
+            # client writes land between page read and copy
+            def __init__(self, node):
+                self._node = node
+
+            async def meta_many(self, keys, **kw):
+                result = await self._node.meta_many(keys, **kw)
+                if updated in keys:
+                    await gibson.set(updated, b'new')
+                    await gibson.delete(deleted)
+                return result
+
+            def __getattr__(self, name):
+                return getattr(self._node, name)
+
+        nodes = {'a': _WriteDuringCopy(self.nodes['a']),
+                 'b': self.nodes['b']}
+        stats = await rebalance(nodes, ['a'], ['a', 'b'], b'test:',
+                                page_size=50, delete=True)
+        self.assertEqual(stats['scanned'], 40)
+        self.assertEqual(stats['skipped'], 2)
+        self.assertEqual(stats['moved'], len(moved) - 2)
+        self.assertEqual(stats['failed'], 0)
+        self.assertEqual((await self.nodes['b'].get(updated)), b'new')
+        self.assertIsNone((await self.nodes['b'].get(deleted)))
+        self.assertIsNone((await self.nodes['a'].get(deleted)))
+        self.assertEqual(self._keys('b'), len(moved) - 1)
@@ -9,105 +9,106 @@ class CommandsTest(GibsonTest):
     """
 
     @run_until_complete
-    def test_set(self):
+    async def test_set(self):
         key, value = b'test:set', b'bar'
-        response = yield from self.gibson.set(key, value, expire=3)
+        response = await self.gibson.set(key, value, expire=3)
         self.assertEqual(response, value)
         with self.assertRaises(TypeError):
-            yield from self.gibson.set(key, value, expire='one')
+            await self.gibson.set(key, value, expire='one')
 
     @run_until_complete
-    def test_get(self):
+    async def test_get(self):
         key, value = b'test:get', b'bar'
-        resp = yield from self.gibson.set(key, value, expire=3)
+        resp = await self.gibson.set(key, value, expire=3)
         self.assertEqual(resp, value)
-        resp = yield from self.gibson.get(key)
+        resp = await self.gibson.get(key)
         self.assertEqual(resp, value)
 
     @run_until_complete
-    def test_delete(self):
+    async def test_delete(self):
         key, value = b'test:delete', b'zap'
-        resp = yield from self.gibson.set(key, value, expire=3)
+        resp = await self.gibson.set(key, value, expire=3)
         self.assertEqual(resp, value)
-        resp = yield from self.gibson.delete(key)
+        resp = await self.gibson.delete(key)
         self.assertEqual(resp, True)
 
-        resp = yield from self.gibson.delete(key)
+        resp = await self.gibson.delete(key)
         self.assertEqual(resp, False)
 
-        resp = yield from self.gibson.get(key)
+        resp = await self.gibson.get(key)
         self.assertEqual(resp, None)
 
     @run_until_complete
-    def test_ttl(self):
+    async def test_ttl(self):
         key, value = b'test:ttl', b'zap'
-        resp = yield from self.gibson.set(key, value, 3)
+        resp = await self.gibson.set(key, value, 3)
         self.assertEqual(resp, value)
 
-        resp = yield from self.gibson.ttl(key, 10)
+        resp = await self.gibson.ttl(key, 10)
         self.assertEqual(resp, True)
         with self.assertRaises(TypeError):
-            yield from self.gibson.ttl(key, expire='one')
+            await self.gibson.ttl(key, expire='one')
 
     @run_until_complete
-    def test_inc(self):
+    async def test_inc(self):
         key, value = b'test:inc', 78
-        resp = yield from self.gibson.set(key, value, expire=3)
-        resp = yield from self.gibson.get(key)
+        resp = await self.gibson.set(key, value, expire=3)
+        resp = await self.gibson.get(key)
         self.assertEqual(resp, b'78')
-        resp = yield from self.gibson.inc(key)
+        resp = await self.gibson.inc(key)
         self.assertEqual(resp, 79)
-        resp = yield from self.gibson.get(key)
+        resp = await self.gibson.get(key)
         self.assertEqual(resp, 79)
 
     @run_until_complete
-    def test_dec(self):
+    async def test_dec(self):
         key, value = b'test:dec', 78
-        resp = yield from self.gibson.set(key, value, expire=3)
-        resp = yield from self.gibson.get(key)
+        resp = await self.gibson.set(key, value, expire=3)
+        resp = await self.gibson.get(key)
         self.assertEqual(resp, b'78')
-        resp = yield from self.gibson.dec(key)
+        resp = await self.gibson.dec(key)
         self.assertEqual(resp, 77)
-        resp = yield from self.gibson.get(key)
+        resp = await self.gibson.get(key)
         self.assertEqual(resp, 77)
 
     @run_until_complete
-    def test_lock(self):
+    async def test_lock(self):
         key, value = b'test:lock', b'zap'
-        resp = yield from self.gibson.set(key, value, 3)
+        resp = await self.gibson.set(key, value, 3)
         self.assertEqual(resp, value)
 
-        resp = yield from self.gibson.lock(key, 10)
+        resp = await self.gibson.lock(key, 10)
         self.assertEqual(resp, True)
         with self.assertRaises(errors.KeyLockedError):
-            yield from self.gibson.set(key, value, 3)
-        yield from self.gibson.unlock(key)
+            await self.gibson.set(key, value, 3)
+        await self.gibson.unlock(key)
 
         with self.assertRaises(TypeError):
-            yield from self.gibson.lock(key, expire='one')
+            await self.gibson.lock(key, expire='one')
 
-    def test_unlock(self):
+    @run_until_complete
+    async def test_unlock(self):
         key, value = b'test:unlock', b'zap'
-        resp = yield from self.gibson.set(key, value, 3)
+        resp = await self.gibson.set(key, value, 3)
         self.assertEqual(resp, value)
 
-        resp = yield from self.gibson.lock(key, 10)
+        resp = await self.gibson.lock(key, 10)
         self.assertEqual(resp, True)
         with self.assertRaises(errors.KeyLockedError):
-            yield from self.gibson.set(key, value, 3)
+            await self.gibson.set(key, value, 3)
 
-        resp = yield from self.gibson.unlock(key)
+        resp = await self.gibson.unlock(key)
         self.assertEqual(resp, True)
-        resp = yield from self.gibson.set(key, 'foo', 3)
+        resp = await self.gibson.set(key, 'foo', 3)
         self.assertEqual(resp, b'foo')
 
     @run_until_complete
-    def test_stats(self):
+    async def test_stats(self):
         key, value = b'test:stats', b'zap'
-        resp = yield from self.gibson.set(key, value, 3)
+        resp = await self.gibson.set(key, value, 3)
         self.assertEqual(resp, value)
 
-        resp = yield from self.gibson.stats()
+        resp = await self.gibson.stats()
         test_keys = set([k for i, k in enumerate(resp) if not i % 2])
 
         expected_keys = set([b'server_version', b'server_build_datetime',
@@ -125,142 +126,237 @@ class CommandsTest(GibsonTest):
         self.assertTrue(expected_keys.issubset(test_keys))
 
     @run_until_complete
-    def test_keys(self):
+    async def test_keys(self):
         key1, value1 = b'test:keys_1', b'keys:bar'
         key2, value2 = b'test:keys_2', b'keys:zap'
-        yield from self.gibson.set(key1, value1, 3)
-        yield from self.gibson.set(key2, value2, 3)
-        resp = yield from self.gibson.keys(b'test:keys')
+        await self.gibson.set(key1, value1, 3)
+        await self.gibson.set(key2, value2, 3)
+        resp = await self.gibson.keys(b'test:keys')
         self.assertEqual(resp, [key1, key2])
 
     @run_until_complete
-    def test_ping(self):
-        result = yield from self.gibson.ping()
+    async def test_ping(self):
+        result = await self.gibson.ping()
         self.assertTrue(result)
 
     @run_until_complete
-    def test_meta(self):
+    async def test_meta(self):
         key, value = b'test:meta_size', b'bar'
-        response = yield from self.gibson.set(key, value, expire=10)
+        response = await self.gibson.set(key, value, expire=10)
         self.assertEqual(response, value)
 
-        res = yield from self.gibson.meta_size(key)
+        res = await self.gibson.meta_size(key)
         self.assertEqual(res, 3)
 
-        res = yield from self.gibson.meta_encoding(key)
+        res = await self.gibson.meta_encoding(key)
         self.assertEqual(res, 0)
 
-        res = yield from self.gibson.meta_access(key)
+        res = await self.gibson.meta_access(key)
         self.assertTrue(1405555555 < res)
 
-        res = yield from self.gibson.meta_created(key)
+        res = await self.gibson.meta_created(key)
         self.assertTrue(1405555555 < res)
 
-        res = yield from self.gibson.meta_ttl(key)
+        res = await self.gibson.meta_ttl(key)
         self.assertEqual(res, 10)
 
-        res = yield from self.gibson.meta_left(key)
+        res = await self.gibson.meta_left(key)
         self.assertTrue(10 >= res)
 
-        res = yield from self.gibson.meta_lock(key)
+        res = await self.gibson.meta_lock(key)
         self.assertEqual(res, 0)
 
     @run_until_complete
-    def test_end(self):
+    async def test_end(self):
         self.assertTrue(self.gibson.__repr__().startswith("<Gibson"))
-        yield from self.gibson.end()
+        await self.gibson.end()
         self.assertTrue(self.gibson.closed)
 
     @run_until_complete
-    def test_mset_mget(self):
+    async def test_mset_mget(self):
         key1, value1 = b'test:mset:1', 10
         key2, value2 = b'test:mset:2', 20
-        yield from self.gibson.set(key1, value1, 3)
-        yield from self.gibson.set(key2, value2, 130)
-        res = yield from self.gibson.mset(b'test:mset', 42)
+        await self.gibson.set(key1, value1, 3)
+        await self.gibson.set(key2, value2, 130)
+        res = await self.gibson.mset(b'test:mset', 42)
         self.assertEqual(res, 2)
-        res = yield from self.gibson.mget(b'test:mset')
+        res = await self.gibson.mget(b'test:mset')
         self.assertEqual(res, [key1, b'42', key2, b'42'])
 
     @run_until_complete
-    def test_mget_limit(self):
+    async def test_mget_limit(self):
         key1, value1 = b'test:mget_limit:1', b'10'
         key2, value2 = b'test:mget_limit:2', b'20'
         key3, value3 = b'test:mget_limit:3', b'30'
-        yield from self.gibson.set(key1, value1, 100)
-        yield from self.gibson.set(key2, value2, 100)
-        yield from self.gibson.set(key3, value3, 100)
-        res = yield from self.gibson.mget(b'test:mget_limit', 2)
+        await self.gibson.set(key1, value1, 100)
+        await self.gibson.set(key2, value2, 100)
+        await self.gibson.set(key3, value3, 100)
+        res = await self.gibson.mget(b'test:mget_limit', 2)
         self.assertEqual(len(res), 2*2)
-        self.assertEquals(res, [key1, value1, key2, value2])
+        self.assertEqual(res, [key1, value1, key2, value2])
         with self.assertRaises(TypeError):
-            yield from self.gibson.mget(key1, limit='one')
+            await self.gibson.mget(key1, limit='one')
 
     @run_until_complete
-    def test_mttl(self):
+    async def test_mttl(self):
         key1, value1 = b'test:mttl:1', b'mttl:bar'
         key2, value2 = b'test:mttl:2', b'mttl:zap'
-        yield from self.gibson.set(key1, value1, 3)
-        yield from self.gibson.set(key2, value2, 3)
-        resp = yield from self.gibson.mttl(b'test:mttl', 10)
+        await self.gibson.set(key1, value1, 3)
+        await self.gibson.set(key2, value2, 3)
+        resp = await self.gibson.mttl(b'test:mttl', 10)
         self.assertEqual(resp, 2)
         with self.assertRaises(TypeError):
-            yield from self.gibson.mttl(key1, expire='one')
+            await self.gibson.mttl(key1, expire='one')
 
     @run_until_complete
-    def test_minc(self):
+    async def test_minc(self):
         key1, value1 = b'test:minc:1', 10
         key2, value2 = b'test:minc:2', 20
-        yield from self.gibson.set(key1, value1, 3)
-        yield from self.gibson.set(key2, value2, 3)
-        res = yield from self.gibson.minc(b'test:minc')
+        await self.gibson.set(key1, value1, 3)
+        await self.gibson.set(key2, value2, 3)
+        res = await self.gibson.minc(b'test:minc')
         self.assertEqual(res, 2)
-        res = yield from self.gibson.mget(b'test:minc')
+        res = await self.gibson.mget(b'test:minc')
         self.assertEqual(res, [key1, 11, key2, 21])
 
     @run_until_complete
-    def test_mdec(self):
+    async def test_mdec(self):
         key1, value1 = b'test:mdec:1', 10
         key2, value2 = b'test:mdec:2', 20
-        yield from self.gibson.set(key1, value1, 3)
-        yield from self.gibson.set(key2, value2, 3)
-        res = yield from self.gibson.mdec(b'test:mdec')
+        await self.gibson.set(key1, value1, 3)
+        await self.gibson.set(key2, value2, 3)
+        res = await self.gibson.mdec(b'test:mdec')
         self.assertEqual(res, 2)
-        res = yield from self.gibson.mget(b'test:mdec')
+        res = await self.gibson.mget(b'test:mdec')
         self.assertEqual(res, [key1, 9, key2, 19])
 
     @run_until_complete
-    def test_mdelete(self):
+    async def test_mdelete(self):
         key1, value1 = b'test:mdelete:1', 10
         key2, value2 = b'test:mdelete:2', 20
-        yield from self.gibson.set(key1, value1, 3)
-        yield from self.gibson.set(key2, value2, 3)
-        res = yield from self.gibson.mdelete(b'test:mdelete')
+        await self.gibson.set(key1, value1, 3)
+        await self.gibson.set(key2, value2, 3)
+        res = await self.gibson.mdelete(b'test:mdelete')
         self.assertEqual(res, 2)
-        res = yield from self.gibson.mget(b'test:mdelete')
+        res = await self.gibson.mget(b'test:mdelete')
         self.assertEqual(res, None)
 
     @run_until_complete
-    def test_mlock_munlock(self):
+    async def test_mlock_munlock(self):
         key1, value1 = b'test:mlock:1', 10
         key2, value2 = b'test:mlock:2', 20
-        yield from self.gibson.set(key1, value1, 3)
-        yield from self.gibson.set(key2, value2, 3)
-        yield from self.gibson.mlock(b'test:mlock', expire=3)
+        await self.gibson.set(key1, value1, 3)
+        await self.gibson.set(key2, value2, 3)
+        await self.gibson.mlock(b'test:mlock', expire=3)
 
         with self.assertRaises(errors.KeyLockedError):
-            yield from self.gibson.delete(key1)
-        yield from self.gibson.munlock(b'test:mlock')
-        res = yield from self.gibson.mdelete(b'test:mlock')
+            await self.gibson.delete(key1)
+        await self.gibson.munlock(b'test:mlock')
+        res = await self.gibson.mdelete(b'test:mlock')
         self.assertEqual(res, 2)
         with self.assertRaises(TypeError):
-            yield from self.gibson.mlock(key1, expire='one')
+            await self.gibson.mlock(key1, expire='one')
 
     @run_until_complete
-    def test_count(self):
+    async def test_count(self):
         key1, value1 = b'test:count:1', 10
         key2, value2 = b'test:count:2', 20
-        yield from self.gibson.set(key1, value1, 3)
-        yield from self.gibson.set(key2, value2, 3)
-        res = yield from self.gibson.count(b'test:count')
+        await self.gibson.set(key1, value1, 3)
+        await self.gibson.set(key2, value2, 3)
+        res = await self.gibson.count(b'test:count')
+        self.assertEqual(res, 2)
+
+    @run_until_complete
+    async def test_chunked(self):
+        key, value = b'test:chunked', bytes(range(256)) * 41
+        res = await self.gibson.set_chunked(key, value, 10,
+                                            chunk_size=1000)
+        self.assertEqual(res, 11)
+        res = await self.gibson.count(b'test:chunked:#')
+        self.assertEqual(res, 12)
+        res = await self.gibson.get_chunked(key)
+        self.assertEqual(res, value)
+
+        res = await self.gibson.ttl_chunked(key, 20)
+        self.assertEqual(res, 12)
+        res = await self.gibson.meta_ttl(b'test:chunked:#0010')
+        self.assertEqual(res, 20)
+
+        # shorter value replaces longer one, tail chunks are dropped
+        res = await self.gibson.set_chunked(key, b'zap', chunk_size=2)
         self.assertEqual(res, 2)
+        res = await self.gibson.count(b'test:chunked:#')
+        self.assertEqual(res, 3)
+        res = await self.gibson.get_chunked(key)
+        self.assertEqual(res, b'zap')
+
+        res = await self.gibson.delete_chunked(key)
+        self.assertEqual(res, 3)
+        res = await self.gibson.get_chunked(key)
+        self.assertEqual(res, None)
+        with self.assertRaises(TypeError):
+            await self.gibson.set_chunked(key, value, expire='one')
+
+    @run_until_complete
+    async def test_chunked_bytearray(self):
+        key, value = b'test:chunked', bytearray(b'foobarbaz')
+        res = await self.gibson.set_chunked(key, value, chunk_size=4)
+        self.assertEqual(res, 3)
+        res = await self.gibson.get_chunked(key)
+        self.assertEqual(res, value)
+        await self.gibson.delete_chunked(key)
+
+    @run_until_complete
+    async def test_chunked_torn(self):
+        key = b'test:torn'
+        await self.gibson.set_chunked(key, b'foobar', chunk_size=3)
+        await self.gibson.set(b'test:torn:#0001', b'zap')
+        res = await self.gibson.get_chunked(key)
+        self.assertEqual(res, None)
+        await self.gibson.delete(b'test:torn:#0001')
+        res = await self.gibson.get_chunked(key)
+        self.assertEqual(res, None)
+
+    @run_until_complete
+    async def test_chunked_neighbour(self):
+        # chunks of b'test:nb:#x' share b'test:nb:#' prefix
+        await self.gibson.set_chunked(b'test:nb', b'foobar', chunk_size=3)
+        await self.gibson.set_chunked(b'test:nb:#x', b'bazbaz', chunk_size=3)
+        res = await self.gibson.ttl_chunked(b'test:nb', 20)
+        self.assertEqual(res, 3)
+        res = await self.gibson.meta_ttl(b'test:nb:#x:#0000')
+        self.assertEqual(res, -1)
+        res = await self.gibson.delete_chunked(b'test:nb')
+        self.assertEqual(res, 3)
+        res = await self.gibson.get_chunked(b'test:nb:#x')
+        self.assertEqual(res, b'bazbaz')
+        res = await self.gibson.delete_chunked(b'test:nokey')
+        self.assertEqual(res, 0)
+
+    @run_until_complete
+    async def test_meta_many(self):
+        await self.gibson.set(b'test:meta:1', b'bar', expire=10)
+        await self.gibson.set(b'test:meta:2', b'zapzap')
+        res = await self.gibson.meta(b'test:meta:1')
+        self.assertEqual(res.size, 3)
+        self.assertEqual(res.encoding, 0)
+        self.assertEqual(res.ttl, 10)
+        self.assertTrue(res.left <= 10)
+        self.assertEqual(res.lock, 0)
+        self.assertTrue(1405555555 < res.access)
+        self.assertTrue(1405555555 < res.created)
+
+        res = await self.gibson.meta_many(
+            [b'test:meta:1', b'test:meta:nope', b'test:meta:2'],
+            fields=('size', 'ttl'))
+        self.assertEqual(res[0].size, 3)
+        self.assertEqual(res[0].ttl, 10)
+        self.assertEqual(res[0].left, None)
+        self.assertEqual(res[1], None)
+        self.assertEqual(res[2].size, 6)
+        self.assertEqual(res[2].ttl, -1)
+
+        res = await self.gibson.meta_many([])
+        self.assertEqual(res, [])
+        with self.assertRaises(ValueError):
+            await self.gibson.meta(b'test:meta:1', fields=['zap'])
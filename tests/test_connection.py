@@ -1,84 +1,120 @@
 import asyncio
+import gc
+import tracemalloc
+
 from ._testutil import BaseTest, run_until_complete
 from aiogibson import create_connection, ProtocolError
 
+# allocations made by client code, server may run in the same process
+_CLIENT_TRACES = [tracemalloc.Filter(True, '*/aiogibson/*'),
+                  tracemalloc.Filter(False, '*/aiogibson/server.py')]
 
-class ConnectionTest(BaseTest):
 
-    @run_until_complete
-    def test_connect_unixsocket(self):
-        conn = yield from create_connection(self.gibson_socket, loop=self.loop)
-        res = yield from conn.execute(b'ping')
-        self.assertTrue(res)
-        self.assertTrue(conn._loop, self.loop)
-        conn.close()
-        yield from conn.wait_closed()
+def _allocated(old, new):
+    old = old.filter_traces(_CLIENT_TRACES)
+    new = new.filter_traces(_CLIENT_TRACES)
+    return sum(stat.size_diff for stat in new.compare_to(old, 'filename'))
+
+
+class ConnectionTest(BaseTest):
 
     @run_until_complete
-    def test_global_loop(self):
-        asyncio.set_event_loop(self.loop)
-        conn = yield from create_connection(self.gibson_socket)
-        res = yield from conn.execute(b'ping')
-        self.assertTrue(conn._loop, self.loop)
+    async def test_connect_unixsocket(self):
+        conn = await create_connection(self.gibson_socket)
+        res = await conn.execute(b'ping')
         self.assertTrue(res)
+        self.assertIs(conn._loop, self.loop)
         conn.close()
-        yield from conn.wait_closed()
+        await conn.wait_closed()
 
     @run_until_complete
-    def test_cancel_future_loop(self):
-        conn = yield from create_connection(self.gibson_socket, loop=self.loop)
+    async def test_cancel_future_loop(self):
+        conn = await create_connection(self.gibson_socket)
         res = conn.execute(b'ping')
         res.cancel()
-        res = yield from conn.execute(b'ping', encoding='utf-8')
+        res = await conn.execute(b'ping', encoding='utf-8')
         self.assertTrue(res)
         conn.close()
-        yield from conn.wait_closed()
+        await conn.wait_closed()
 
     @run_until_complete
-    def test_cancel_futures_in_case_of_close(self):
-        conn = yield from create_connection(self.gibson_socket, loop=self.loop)
+    async def test_cancel_futures_in_case_of_close(self):
+        conn = await create_connection(self.gibson_socket)
         res1 = conn.execute(b'ping')
         res2 = conn.execute(b'ping')
         conn.close()
-        yield from conn.wait_closed()
+        await conn.wait_closed()
         self.assertTrue(res1.cancelled)
         self.assertTrue(res2.cancelled)
 
     @run_until_complete
-    def test_failed_to_decode(self):
-        conn = yield from create_connection(self.gibson_socket, loop=self.loop)
+    async def test_failed_to_decode(self):
+        conn = await create_connection(self.gibson_socket)
         with self.assertRaises(LookupError):
-            yield from conn.execute(b'set', 1, b'fo', b'bar',
-                                    encoding='utf-10')
+            await conn.execute(b'set', 1, b'fo', b'bar',
+                               encoding='utf-10')
         conn.close()
-        yield from conn.wait_closed()
+        await conn.wait_closed()
 
     @run_until_complete
-    def test_protocol_error(self):
+    async def test_protocol_error(self):
         with self.assertRaises(ProtocolError):
-            conn = yield from create_connection(self.gibson_socket,
-                                                loop=self.loop)
+            conn = await create_connection(self.gibson_socket)
             conn._parser.feed(b'\x06\x00\x05\x03\x00\x00\x00bar')
-            yield from conn.execute(b'ping')
+            await conn.execute(b'ping')
 
     @run_until_complete
-    def test_encoding_property(self):
-        conn = yield from create_connection(self.gibson_socket,
-                                            encoding='utf-8', loop=self.loop)
+    async def test_encoding_property(self):
+        conn = await create_connection(self.gibson_socket,
+                                       encoding='utf-8')
         self.assertEqual(conn.encoding, 'utf-8')
         conn.close()
-        yield from conn.wait_closed()
+        await conn.wait_closed()
 
     @run_until_complete
-    def test_execute(self):
-        conn = yield from create_connection(self.gibson_socket, loop=self.loop)
-        res = yield from conn.execute(b'ping')
+    async def test_execute(self):
+        conn = await create_connection(self.gibson_socket)
+        res = await conn.execute(b'ping')
         self.assertTrue(res)
 
         with self.assertRaises(TypeError):
-            yield from conn.execute(None)
+            await conn.execute(None)
 
         with self.assertRaises(TypeError):
-            yield from conn.execute(b'set', None)
+            await conn.execute(b'set', None)
+        conn.close()
+        await conn.wait_closed()
+
+    @run_until_complete
+    async def test_request_memory(self):
+        conn = await create_connection(self.gibson_socket)
+        key = b'test:memory'
+        await conn.execute(b'set', 0, key, b'x' * 10)
+        number = 1000
+        # warm up free lists of tuples and futures, blocks kept there are
+        # not leaks
+        await asyncio.gather(*[conn.execute(b'get', key)
+                               for _ in range(number)])
+        gc.collect()
+
+        tracemalloc.start()
+        try:
+            start = tracemalloc.take_snapshot()
+            futs = [conn.execute(b'get', key) for _ in range(number)]
+            pending = tracemalloc.take_snapshot()
+            for fut in futs:
+                self.assertEqual((await fut), b'x' * 10)
+            del futs, fut
+            gc.collect()
+            done = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        # future of command in flight together with its bookkeeping
+        self.assertLess(_allocated(start, pending) / number, 256)
+        # nothing is left behind once replies are received, except for
+        # blocks deque of waiters keeps for reuse
+        self.assertLess(_allocated(start, done), 16 * 1024)
+
+        await conn.execute(b'del', key)
         conn.close()
-        yield from conn.wait_closed()
+        await conn.wait_closed()
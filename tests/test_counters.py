@@ -0,0 +1,115 @@
+import asyncio
+
+from ._testutil import GibsonTest, run_until_complete
+from aiogibson.counters import CounterAggregator
+
+
+class CounterAggregatorTest(GibsonTest):
+
+    @run_until_complete
+    async def test_flush(self):
+        counters = CounterAggregator(self.gibson, expire=10)
+        await self.gibson.set(b'test:counter:existing', 10, 10)
+        for _ in range(5):
+            counters.incr(b'test:counter:existing')
+            counters.incr(b'test:counter:new', 2)
+            counters.decr(b'test:counter:negative')
+        counters.incr(b'test:counter:zero', 3)
+        counters.decr(b'test:counter:zero', 3)
+        self.assertEqual(counters.pending, {
+            b'test:counter:existing': 5, b'test:counter:new': 10,
+            b'test:counter:negative': -5, b'test:counter:zero': 0})
+
+        res = await counters.flush()
+        self.assertEqual(res, 3)
+        self.assertEqual(counters.pending, {})
+        res = await self.gibson.mget(b'test:counter:')
+        self.assertEqual(res, [b'test:counter:existing', 15,
+                               b'test:counter:negative', b'-5',
+                               b'test:counter:new', b'10'])
+
+        counters.incr(b'test:counter:new', 3)
+        counters.decr(b'test:counter:negative', 2)
+        res = await counters.flush()
+        self.assertEqual(res, 2)
+        res = await self.gibson.mget(b'test:counter:')
+        self.assertEqual(res, [b'test:counter:existing', 15,
+                               b'test:counter:negative', -7,
+                               b'test:counter:new', 13])
+        res = await self.gibson.meta_ttl(b'test:counter:new')
+        self.assertEqual(res, 10)
+
+        with self.assertRaises(TypeError):
+            counters.incr(b'test:counter:new', 'one')
+        with self.assertRaises(TypeError):
+            CounterAggregator(self.gibson, expire='one')
+
+    @run_until_complete
+    async def test_failed_flush(self):
+        counters = CounterAggregator(self.gibson)
+        await self.gibson.set(b'test:counter:locked', 1)
+        await self.gibson.lock(b'test:counter:locked', 10)
+        await self.gibson.set(b'test:counter:nan', b'zap')
+        counters.incr(b'test:counter:locked', 2)
+        counters.incr(b'test:counter:nan')
+        counters.incr(b'test:counter:ok')
+        res = await counters.flush()
+        self.assertEqual(res, 1)
+        self.assertEqual(counters.pending, {b'test:counter:locked': 2,
+                                            b'test:counter:nan': 1})
+        await self.gibson.unlock(b'test:counter:locked')
+
+    @run_until_complete
+    async def test_bounds_and_close(self):
+        counters = CounterAggregator(self.gibson, max_keys=2, interval=10)
+        counters.start()
+        for i in range(5):
+            counters.incr('test:counter:{}'.format(i).encode('ascii'))
+        self.assertEqual(counters.dropped, 1)
+        self.assertEqual(len(counters.pending), 4)
+        # size triggered flush
+        await asyncio.sleep(0.05)
+        self.assertEqual(counters.pending, {})
+
+        counters.incr(b'test:counter:0', 4)
+        counters.close()
+        await counters.wait_closed()
+        self.assertTrue(counters.closed)
+        self.assertEqual(counters.pending, {})
+        res = await self.gibson.get(b'test:counter:0')
+        self.assertEqual(res, 5)
+        res = await self.gibson.count(b'test:counter:')
+        self.assertEqual(res, 4)
+
+    @run_until_complete
+    async def test_max_burst(self):
+        counters = CounterAggregator(self.gibson, max_burst=10)
+        await self.gibson.set(b'test:counter:a', 0)
+        await self.gibson.set(b'test:counter:b', 0)
+        counters.incr(b'test:counter:a', 8)
+        counters.decr(b'test:counter:b', 20)
+        res = await counters.flush()
+        self.assertEqual(res, 2)
+        # one command per key and ten repeated ones, rest is carried over
+        self.assertEqual(counters.pending, {b'test:counter:b': -16})
+        self.assertEqual(await self.gibson.get(b'test:counter:a'), 8)
+        self.assertEqual(await self.gibson.get(b'test:counter:b'), -4)
+
+        counters.close()
+        await counters.wait_closed()
+        self.assertEqual(counters.pending, {})
+        self.assertEqual(await self.gibson.get(b'test:counter:b'), -20)
+
+    @run_until_complete
+    async def test_close_during_flush(self):
+        counters = CounterAggregator(self.gibson, max_keys=2)
+        await self.gibson.set(b'test:counter:0', 0)
+        counters.incr(b'test:counter:0', 3)
+        counters.incr(b'test:counter:1', 2)
+        # size triggered flush is in flight when aggregator is closed
+        self.assertIsNotNone(counters._flushing)
+        counters.close()
+        await counters.wait_closed()
+        self.assertEqual(counters.pending, {})
+        res = await self.gibson.mget(b'test:counter:')
+        self.assertEqual(res, [b'test:counter:0', 3, b'test:counter:1', b'2'])
@@ -0,0 +1,161 @@
+import asyncio
+import unittest
+
+from ._testutil import GibsonTest, run_until_complete
+from aiogibson import consts
+from aiogibson.commands import Gibson
+from aiogibson.connection import create_connection
+from aiogibson.hotkeys import CountMinSketch, HotKeyTracer, HotCache, _TopK
+
+
+class CountMinSketchTest(unittest.TestCase):
+
+    def test_estimates(self):
+        sketch = CountMinSketch(256, 4)
+        for i in range(1000):
+            sketch.add('key:{}'.format(i % 100).encode('ascii'))
+        self.assertEqual(sketch.add(b'hot', 500), sketch.estimate(b'hot'))
+        self.assertEqual(sketch.total, 1500)
+        for i in range(100):
+            # never underestimated
+            self.assertGreaterEqual(
+                sketch.estimate('key:{}'.format(i).encode('ascii')), 10)
+        self.assertGreaterEqual(sketch.estimate(b'hot'), 500)
+        self.assertLess(sketch.estimate(b'hot'), 600)
+        sketch.halve()
+        self.assertEqual(sketch.total, 750)
+        self.assertGreaterEqual(sketch.estimate(b'hot'), 250)
+
+
+class TopKTest(unittest.TestCase):
+
+    def test_floor_follows_growth(self):
+        top = _TopK(2)
+        top.offer(b'a', 1)
+        top.offer(b'b', 1)
+        top.offer(b'a', 5)
+        top.offer(b'b', 5)
+        # rarer newcomer does not replace keys which grew meanwhile
+        top.offer(b'c', 2)
+        self.assertEqual(top.counts, {b'a': 5, b'b': 5})
+        top.offer(b'c', 6)
+        self.assertEqual(sorted(top.counts.values()), [5, 6])
+
+
+class HotKeyTracerTest(unittest.TestCase):
+
+    def test_hot_keys(self):
+        tracer = HotKeyTracer(sample=1.0, top=4, window=1000)
+        for i in range(200):
+            tracer.observe(b'get', b'cold:' + str(i).encode('ascii'))
+            tracer.observe(b'get', b'user:1')
+            if i % 2:
+                tracer.observe(b'get', b'user:2')
+        tracer.observe(b'set', b'user:3')
+        hot = tracer.hot_keys(b'get', 2)
+        self.assertEqual([key for key, rate in hot], [b'user:1', b'user:2'])
+        self.assertGreater(hot[0][1], hot[1][1])
+        self.assertEqual(tracer.rate(b'get', b'user:1'), hot[0][1])
+        self.assertEqual(tracer.hot_keys(b'set'), [(b'user:3', 1 / 1500)])
+        self.assertEqual(tracer.hot_keys(b'inc'), [])
+        prefixes = tracer.hot_prefixes(b'get', separator=b':')
+        self.assertEqual(prefixes[0][0], b'user:')
+        tracer.reset()
+        self.assertEqual(tracer.hot_keys(b'get'), [])
+        self.assertEqual(tracer.rate(b'get', b'user:1'), 0.0)
+
+    def test_window(self):
+        tracer = HotKeyTracer(sample=1.0, window=10)
+        now = [0.0]
+        tracer.clock = lambda: now[0]
+        tracer.reset()
+        for _ in range(8):
+            tracer.observe(b'get', b'user:1')
+        now[0] = 25.0
+        tracer.observe(b'get', b'user:2')
+        # two windows passed, counters halved twice
+        self.assertEqual(tracer.hot_keys(b'get'),
+                         [(b'user:1', 2 / 15), (b'user:2', 1 / 15)])
+
+    def test_sampling(self):
+        tracer = HotKeyTracer(sample=0.1)
+        values = iter([0.05, 0.5] * 50)
+        tracer._random = lambda: next(values)
+        for _ in range(100):
+            tracer.observe(b'get', b'user:1')
+        self.assertEqual(tracer.hot_keys(b'get'), [(b'user:1', 50.0 / 1.5)])
+
+
+class HotKeysConnectionTest(GibsonTest):
+
+    @run_until_complete
+    async def test_tracer(self):
+        tracer = HotKeyTracer(sample=1.0)
+        conn = await create_connection(self.gibson_socket,
+                                       tracer=tracer)
+        gibson = Gibson(conn)
+        try:
+            await gibson.set(b'test:hot', b'bar', 100)
+            for _ in range(3):
+                await gibson.get(b'test:hot')
+            await gibson.get(b'test:cold')
+            await gibson.mset(b'test:', b'baz')
+            await gibson.ping()
+        finally:
+            conn.close()
+            await conn.wait_closed()
+        self.assertEqual(tracer.hot_keys(b'get'),
+                         [(b'test:hot', 0.2), (b'test:cold', 0.2 / 3)])
+        self.assertEqual([key for key, _ in tracer.hot_keys(b'set')],
+                         [b'test:hot'])
+        self.assertEqual([key for key, _ in tracer.hot_keys(b'mset')],
+                         [b'test:'])
+        self.assertNotIn(consts.OP_PING, tracer._sketches)
+
+    @run_until_complete
+    async def test_hot_cache(self):
+        # rate of the key is equal to its count
+        tracer = HotKeyTracer(sample=1.0, window=1.0 / 1.5)
+        tracer.clock = lambda: 0.0
+        tracer.reset()
+        conn = await create_connection(self.gibson_socket,
+                                       tracer=tracer)
+        gibson = HotCache(Gibson(conn), tracer, threshold=3, ttl=60, size=1)
+        try:
+            await gibson.set(b'test:hot', b'bar')
+            await gibson.set(b'test:warm', b'baz')
+            for _ in range(2):
+                self.assertEqual(await gibson.get(b'test:hot'), b'bar')
+            self.assertEqual(gibson.keys, [])
+            # third get makes the key hot
+            self.assertEqual(await gibson.get(b'test:hot'), b'bar')
+            self.assertEqual(gibson.keys, [b'test:hot'])
+            await self.gibson.set(b'test:hot', b'new')
+            self.assertEqual(await gibson.get(b'test:hot'), b'bar')
+            self.assertEqual(gibson.counters['hits'], 1)
+            # hits are counted by tracer as well
+            self.assertEqual(tracer.hot_keys(b'get')[0][1], 4)
+
+            for _ in range(3):
+                await gibson.get(b'test:warm')
+            # less frequent key does not evict the hot one
+            self.assertEqual(gibson.keys, [b'test:hot'])
+            self.assertEqual(gibson.counters['rejected'], 1)
+
+            # writes through the wrapper drop cached copy
+            await gibson.set(b'test:hot', b'newer')
+            self.assertEqual(gibson.keys, [])
+            self.assertEqual(await gibson.get(b'test:hot'), b'newer')
+            self.assertTrue(await gibson.ping())
+            self.assertEqual(gibson.counters['admitted'], 2)
+
+            # get in flight replies old value after cached copy is dropped
+            gibson.invalidate()
+            value, _ = await asyncio.gather(
+                gibson.get(b'test:hot'), gibson.set(b'test:hot', b'newest'))
+            self.assertEqual(value, b'newer')
+            self.assertEqual(gibson.keys, [])
+            self.assertEqual(await gibson.get(b'test:hot'), b'newest')
+        finally:
+            conn.close()
+            await conn.wait_closed()
@@ -0,0 +1,82 @@
+import asyncio
+
+from ._testutil import GibsonTest, run_until_complete
+from aiogibson import errors
+from aiogibson.lanes import create_lane_pool, BULK, INTERACTIVE
+from aiogibson.tracing import LatencyHistogram
+
+
+class LanePoolTest(GibsonTest):
+
+    @run_until_complete
+    async def test_routing(self):
+        tracer = LatencyHistogram()
+        pool = await create_lane_pool(self.gibson_socket, interactive=(1, 2),
+                                      bulk=(1, 1), bulk_value_size=1024,
+                                      tracer=tracer)
+        try:
+            self.assertEqual(await pool.set(b'test:lane', b'bar'), b'bar')
+            self.assertEqual(await pool.get(b'test:lane'), b'bar')
+            self.assertEqual(await pool.keys(b'test:'), [b'test:lane'])
+            self.assertEqual(await pool.count(b'test:'), 1)
+            # big value goes to bulk lane
+            await pool.set(b'test:big', b'x' * 1024)
+            await pool.set(b'test:big2', value=b'x' * 1024)
+            with self.assertRaises(errors.GibsonError):
+                await pool.inc(b'test:lane')
+
+            interactive = pool.lane(INTERACTIVE)
+            bulk = pool.lane(BULK)
+            self.assertEqual(interactive.counters, {
+                'commands': 3, 'errors': 1, 'waits': 0, 'in_flight': 0})
+            self.assertEqual(pool.counters[BULK]['commands'], 4)
+            self.assertEqual(interactive.latency.count(b'get'), 1)
+            self.assertEqual(interactive.latency.count(b'set'), 1)
+            self.assertEqual(bulk.latency.count(b'set'), 2)
+            self.assertEqual(bulk.latency.count(b'keys'), 1)
+            self.assertEqual(bulk.latency.count(b'get'), 0)
+            # user tracer sees commands of both lanes
+            self.assertEqual(tracer.count(b'set'), 3)
+        finally:
+            await pool.clear()
+
+    @run_until_complete
+    async def test_bulk_does_not_block(self):
+        pool = await create_lane_pool(self.gibson_socket, interactive=(1, 1),
+                                      bulk=(1, 1))
+        try:
+            await pool.set(b'test:lane', b'bar')
+            async with pool.acquire(BULK):
+                # bulk lane is busy, keys waits for its connection
+                keys = asyncio.ensure_future(pool.keys(b'test:'))
+                self.assertEqual(
+                    await asyncio.wait_for(pool.get(b'test:lane'), 1),
+                    b'bar')
+                self.assertFalse(keys.done())
+                # waiting command is not in flight yet
+                self.assertEqual(pool.counters[BULK]['in_flight'], 0)
+            self.assertEqual(await keys, [b'test:lane'])
+            self.assertEqual(pool.counters[BULK]['waits'], 1)
+            self.assertEqual(pool.counters[INTERACTIVE]['waits'], 0)
+        finally:
+            await pool.clear()
+
+    @run_until_complete
+    async def test_iter_prefix(self):
+        pool = await create_lane_pool(self.gibson_socket, interactive=(1, 1),
+                                      bulk=(1, 1))
+        try:
+            keys = ['test:it:{:02d}'.format(i).encode('ascii')
+                    for i in range(10)]
+            for key in keys:
+                await pool.set(key, key)
+            items = [item async for item in pool.iter_prefix(b'test:it:', 3)]
+            self.assertEqual(items, [(key, key) for key in keys])
+            found = [key async for key in pool.iter_keys(b'test:it:', 3)]
+            self.assertEqual(found, keys)
+            self.assertEqual(pool.lane(BULK).latency.count(b'get'), 0)
+            self.assertGreater(pool.lane(BULK).latency.count(b'count'), 0)
+            self.assertEqual(pool.lane(INTERACTIVE).latency.count(b'count'),
+                             0)
+        finally:
+            await pool.clear()
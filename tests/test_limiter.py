@@ -0,0 +1,108 @@
+import asyncio
+
+from ._testutil import GibsonTest, run_until_complete
+from aiogibson import errors
+from aiogibson.limiter import AdaptiveLimiter
+
+
+class _FakeGibson:
+    # replies once test resolves the future of the command
+
+    def __init__(self):
+        self.pending = []
+
+    async def get(self, key):
+        fut = asyncio.get_running_loop().create_future()
+        self.pending.append(fut)
+        return await fut
+
+
+async def _settle():
+    # woken commands need few loop iterations to reach the server
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class AdaptiveLimiterTest(GibsonTest):
+
+    @run_until_complete
+    async def test_commands(self):
+        gibson = AdaptiveLimiter(self.gibson, initial=2)
+        self.assertEqual(await gibson.set(b'test:limit', b'bar'), b'bar')
+        values = await asyncio.gather(
+            *[gibson.get(b'test:limit') for _ in range(10)])
+        self.assertEqual(values, [b'bar'] * 10)
+        counters = gibson.counters
+        self.assertEqual(counters['commands'], 11)
+        self.assertEqual(counters['queued'], 8)
+        self.assertEqual(gibson.in_flight, 0)
+        self.assertEqual(gibson.queued, 0)
+        self.assertIsNotNone(gibson.latency)
+
+        await gibson.lock(b'test:limit', 10)
+        limit = gibson.limit
+        with self.assertRaises(errors.KeyLockedError):
+            await gibson.set(b'test:limit', b'baz')
+        self.assertEqual(gibson.counters['pushbacks'], 1)
+        self.assertLess(gibson.limit, limit)
+        self.assertTrue(await gibson.unlock(b'test:limit'))
+
+    @run_until_complete
+    async def test_aimd(self):
+        fake = _FakeGibson()
+        gibson = AdaptiveLimiter(fake, initial=4, max_limit=5,
+                                 target_latency=1.0)
+        now = [0.0]
+        gibson._clock = lambda: now[0]
+        tasks = [asyncio.ensure_future(gibson.get(b'key'))
+                 for _ in range(20)]
+        await _settle()
+        self.assertEqual((gibson.in_flight, gibson.queued), (4, 16))
+
+        # fast replies of busy limiter grow the limit by one per limit
+        for _ in range(5):
+            fake.pending.pop(0).set_result(b'bar')
+            await _settle()
+        self.assertEqual(gibson.limit, 5)
+        self.assertEqual((gibson.in_flight, gibson.queued), (5, 10))
+
+        # slow replies shrink it, once per round trip
+        now[0] = 2.0
+        for fut in fake.pending[:4]:
+            fut.set_result(b'bar')
+        fake.pending[4].set_exception(errors.MemoryLimitError())
+        del fake.pending[:5]
+        await _settle()
+        self.assertEqual(gibson.counters['decreases'], 1)
+        self.assertEqual(gibson.counters['pushbacks'], 1)
+        self.assertEqual(gibson.limit, 3)
+
+        while fake.pending:
+            fake.pending.pop(0).set_result(b'bar')
+            await _settle()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        self.assertEqual(sum(isinstance(result, errors.MemoryLimitError)
+                             for result in results), 1)
+        self.assertEqual(gibson.in_flight, 0)
+
+    @run_until_complete
+    async def test_shed(self):
+        fake = _FakeGibson()
+        gibson = AdaptiveLimiter(fake, initial=1, max_queue=1,
+                                 queue_timeout=0.01)
+        first = asyncio.ensure_future(gibson.get(b'key'))
+        second = asyncio.ensure_future(gibson.get(b'key'))
+        await asyncio.sleep(0)
+        with self.assertRaises(errors.OverloadError):
+            await gibson.get(b'key')
+        with self.assertRaises(errors.OverloadError):
+            await second
+        self.assertEqual(gibson.counters['shed'], 2)
+
+        # cancelled waiter does not take the slot
+        third = asyncio.ensure_future(gibson.get(b'key'))
+        await asyncio.sleep(0)
+        third.cancel()
+        fake.pending.pop().set_result(b'bar')
+        self.assertEqual(await first, b'bar')
+        self.assertEqual((gibson.in_flight, gibson.queued), (0, 0))
@@ -0,0 +1,153 @@
+import os
+import tempfile
+
+from ._testutil import BaseTest, run_until_complete
+from aiogibson import create_gibson, create_pool, errors
+from aiogibson.mirror import Mirror
+from aiogibson.server import create_server
+
+
+class _Reversed:
+    # secondary listing items in different order
+
+    def __init__(self, gibson):
+        self._gibson = gibson
+
+    async def keys(self, prefix):
+        return (await self._gibson.keys(prefix))[::-1]
+
+    async def mget(self, prefix):
+        resp = await self._gibson.mget(prefix)
+        pairs = list(zip(resp[::2], resp[1::2]))[::-1]
+        return [item for pair in pairs for item in pair]
+
+    def __getattr__(self, method):
+        return getattr(self._gibson, method)
+
+
+class MirrorTest(BaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.servers, self.clients = [], []
+        self.primary = self.loop.run_until_complete(self._target())
+        self.secondary = self.loop.run_until_complete(self._target())
+
+    def tearDown(self):
+        for client in self.clients:
+            self.loop.run_until_complete(client.clear())
+        for server in self.servers:
+            server.close()
+            self.loop.run_until_complete(server.wait_closed())
+        super().tearDown()
+
+    async def _target(self):
+        path = os.path.join(tempfile.mkdtemp(), 'gibson.sock')
+        server = await create_server(path)
+        self.servers.append(server)
+        pool = await create_pool(path, minsize=1, maxsize=1)
+        self.clients.append(pool)
+        return pool
+
+    @run_until_complete
+    async def test_writes(self):
+        mirror = Mirror(self.primary, self.secondary)
+        res = await mirror.set(b'foo', b'bar', 100)
+        self.assertEqual(res, b'bar')
+        await mirror.set(b'num', 1)
+        res = await mirror.inc(b'num')
+        self.assertEqual(res, 2)
+        with self.assertRaises(errors.ExpectedANumber):
+            await mirror.inc(b'foo')
+        self.assertTrue((await mirror.ping()))
+        await mirror.wait_pending()
+        self.assertEqual(mirror.pending, 0)
+
+        res = await self.secondary.get(b'foo')
+        self.assertEqual(res, b'bar')
+        res = await self.secondary.meta_ttl(b'foo')
+        self.assertEqual(res, 100)
+        res = await self.secondary.get(b'num')
+        self.assertEqual(res, 2)
+        # failed primary writes are not mirrored
+        self.assertEqual(mirror.counters['mirrored'], 3)
+        self.assertEqual(mirror.counters['secondary_errors'], 0)
+        self.assertIs(mirror.primary, self.primary)
+        self.assertIs(mirror.secondary, self.secondary)
+
+    @run_until_complete
+    async def test_chunked_writes(self):
+        mirror = Mirror(self.primary, self.secondary)
+        await mirror.set_chunked(b'big', b'foobarbaz', 100, chunk_size=4)
+        await mirror.wait_pending()
+        res = await self.secondary.get_chunked(b'big')
+        self.assertEqual(res, b'foobarbaz')
+        await mirror.ttl_chunked(b'big', 200)
+        await mirror.wait_pending()
+        res = await self.secondary.meta_ttl(b'big:#0002')
+        self.assertEqual(res, 200)
+        await mirror.delete_chunked(b'big')
+        await mirror.wait_pending()
+        res = await self.secondary.count(b'big')
+        self.assertEqual(res, None)
+        self.assertEqual(mirror.counters['mirrored'], 3)
+
+    @run_until_complete
+    async def test_slow_and_failing_secondary(self):
+        server = self.servers[1]
+        server.latency = 0.2
+        mirror = Mirror(self.primary, self.secondary, max_pending=2)
+        started = self.loop.time()
+        for i in range(3):
+            await mirror.set(b'foo', i)
+        self.assertTrue(self.loop.time() - started < 0.1)
+        self.assertEqual(mirror.pending, 2)
+        self.assertEqual(mirror.counters['dropped'], 1)
+        await mirror.wait_pending()
+
+        server.latency = 0
+        server.error_rate = 1
+        await mirror.delete(b'foo')
+        await mirror.wait_pending()
+        self.assertEqual(mirror.counters['secondary_errors'], 1)
+
+    @run_until_complete
+    async def test_shadow_reads(self):
+        diverged = []
+        mirror = Mirror(self.primary, self.secondary, shadow_reads=1,
+                        on_divergence=lambda *args: diverged.append(args))
+        await mirror.set(b'foo', b'bar')
+        await self.primary.set(b'zap', b'baz')
+        self.assertEqual((await mirror.get(b'foo')), b'bar')
+        self.assertEqual((await mirror.get(b'zap')), b'baz')
+        self.assertEqual((await mirror.count(b'')), 2)
+        await mirror.wait_pending()
+
+        counters = mirror.counters
+        self.assertEqual(counters['shadow_reads'], 3)
+        self.assertEqual(counters['divergences'], 2)
+        self.assertEqual(diverged, [('get', (b'zap',), b'baz', None),
+                                    ('count', (b'',), 2, 1)])
+
+    @run_until_complete
+    async def test_shadow_reads_unordered(self):
+        mirror = Mirror(self.primary, _Reversed(self.secondary),
+                        shadow_reads=1)
+        for key in (b'a:1', b'a:2', b'a:3'):
+            await mirror.set(key, key)
+        self.assertEqual((await mirror.keys(b'a:')),
+                         [b'a:1', b'a:2', b'a:3'])
+        res = await mirror.mget(b'a:')
+        self.assertEqual(res[:2], [b'a:1', b'a:1'])
+        await mirror.wait_pending()
+        self.assertEqual(mirror.counters['shadow_reads'], 2)
+        self.assertEqual(mirror.counters['divergences'], 0)
+
+    @run_until_complete
+    async def test_closed_secondary(self):
+        gibson = await create_gibson(self.servers[1].address)
+        gibson.close()
+        await gibson.wait_closed()
+        mirror = Mirror(self.primary, gibson)
+        await mirror.set(b'foo', b'bar')
+        self.assertEqual(mirror.counters['secondary_errors'], 1)
@@ -0,0 +1,122 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from ._testutil import GibsonTest, run_until_complete
+from aiogibson.nearcache import SharedCache, NearCache, BUCKET_SIZE
+
+
+def _fill(path, count):
+    with SharedCache(path, slots=64, slot_size=64) as cache:
+        for i in range(count):
+            cache.set('key:{}'.format(i), i, 60)
+
+
+class SharedCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'near.cache')
+        self.cache = SharedCache(self.path, slots=64, slot_size=64)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.dir)
+
+    def test_get_set(self):
+        cache = self.cache
+        self.assertIsNone(cache.get(b'foo'))
+        self.assertTrue(cache.set(b'foo', b'bar', 10))
+        self.assertEqual(cache.get(b'foo'), b'bar')
+        self.assertTrue(cache.set(b'foo', b'baz', 10))
+        self.assertEqual(cache.get(b'foo'), b'baz')
+        cache.set(b'num', 42, 10)
+        self.assertEqual(cache.get(b'num'), 42)
+        cache.set(b'str', 'значение', 10)
+        self.assertEqual(cache.get(b'str'), 'значение')
+        self.assertTrue(cache.delete(b'foo'))
+        self.assertFalse(cache.delete(b'foo'))
+        self.assertIsNone(cache.get(b'foo'))
+        cache.clear()
+        self.assertIsNone(cache.get(b'num'))
+
+    def test_too_large(self):
+        self.cache.set(b'foo', b'bar', 10)
+        self.assertFalse(self.cache.set(b'foo', b'x' * 64, 10))
+        self.assertIsNone(self.cache.get(b'foo'))
+        self.assertEqual(self.cache.max_item_size, 64 - 27)
+
+    def test_expire(self):
+        self.cache.set(b'foo', b'bar', 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get(b'foo'))
+
+    def test_eviction(self):
+        # 64 slots, every bucket keeps at most BUCKET_SIZE keys
+        for i in range(200):
+            self.cache.set('key:{}'.format(i).encode('ascii'), i, 60 + i)
+        cached = [i for i in range(200)
+                  if self.cache.get('key:{}'.format(i)) == i]
+        self.assertLessEqual(len(cached), 64)
+        self.assertGreater(len(cached), 64 - BUCKET_SIZE * 2)
+        # the latest value always survives
+        self.assertIn(199, cached)
+
+    def test_geometry(self):
+        with self.assertRaises(ValueError):
+            SharedCache(self.path, slots=128, slot_size=64)
+        with self.assertRaises(ValueError):
+            SharedCache(self.path + '2', slots=64, slot_size=16)
+
+    def test_shared_between_processes(self):
+        proc = multiprocessing.Process(target=_fill, args=(self.path, 20))
+        proc.start()
+        proc.join()
+        self.assertEqual(proc.exitcode, 0)
+        self.assertEqual([self.cache.get('key:{}'.format(i))
+                          for i in range(20)], list(range(20)))
+
+
+class NearCacheTest(GibsonTest):
+
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.mkdtemp()
+        self.cache = SharedCache(os.path.join(self.dir, 'near.cache'),
+                                 slots=64, slot_size=128)
+        self.near = NearCache(self.gibson, self.cache, ttl=60)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.dir)
+        super().tearDown()
+
+    @run_until_complete
+    async def test_get(self):
+        near = self.near
+        await near.set(b'test:near', b'bar')
+        self.assertEqual(await near.get(b'test:near'), b'bar')
+        self.assertEqual(await near.get(b'test:near'), b'bar')
+        self.assertEqual((near.hits, near.misses), (1, 1))
+        self.assertIsNone(await near.get(b'test:missing'))
+        self.assertEqual(near.misses, 2)
+
+        await near.set(b'test:near', b'baz')
+        self.assertEqual(await near.get(b'test:near'), b'baz')
+        self.assertTrue(await near.delete(b'test:near'))
+        self.assertIsNone(await near.get(b'test:near'))
+        # other commands are passed through
+        self.assertTrue(await near.ping())
+
+    @run_until_complete
+    async def test_stale_until_ttl(self):
+        await self.near.set(b'test:near', b'bar')
+        await self.near.get(b'test:near')
+        # write bypassing near cache is not seen
+        await self.gibson.set(b'test:near', b'baz')
+        self.assertEqual(await self.near.get(b'test:near'), b'bar')
+        self.near.invalidate(b'test:near')
+        self.assertEqual(await self.near.get(b'test:near'), b'baz')
@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+
+from ._testutil import GibsonTest, run_until_complete
+from aiogibson.negative import BloomFilter, NegativeCache
+
+
+class BloomFilterTest(unittest.TestCase):
+
+    def test_filter(self):
+        bloom = BloomFilter(1000, 0.01)
+        keys = ['key:{}'.format(i).encode('ascii') for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertEqual(bloom.count, 1000)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum('other:{}'.format(i) in bloom
+                              for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class NegativeCacheTest(GibsonTest):
+
+    @run_until_complete
+    async def test_recent_misses(self):
+        gibson = NegativeCache(self.gibson, ttl=60)
+        self.assertIsNone(await gibson.get(b'test:neg'))
+        self.assertIsNone(await gibson.get(b'test:neg'))
+        self.assertEqual(gibson.counters['miss_skips'], 1)
+        # set through the wrapper makes key visible immediately
+        await gibson.set(b'test:neg', b'bar')
+        self.assertEqual(await gibson.get(b'test:neg'), b'bar')
+
+        self.assertIsNone(await gibson.get(b'test:neg2'))
+        await self.gibson.set(b'test:neg2', b'bar')
+        self.assertIsNone(await gibson.get(b'test:neg2'))
+        gibson.invalidate(b'test:neg2')
+        self.assertEqual(await gibson.get(b'test:neg2'), b'bar')
+        self.assertEqual(gibson.counters['lookups'], 6)
+        self.assertTrue(await gibson.ping())
+
+    @run_until_complete
+    async def test_set_during_get(self):
+        gibson = NegativeCache(self.gibson, ttl=60)
+        # get is sent first and replies None, set runs before the reply
+        value, _ = await asyncio.gather(gibson.get(b'test:neg'),
+                                        gibson.set(b'test:neg', b'bar'))
+        self.assertIsNone(value)
+        self.assertEqual(await gibson.get(b'test:neg'), b'bar')
+        self.assertEqual(gibson.counters['miss_skips'], 0)
+        self.assertEqual(gibson._lookups, {})
+
+    @run_until_complete
+    async def test_expire_and_bound(self):
+        gibson = NegativeCache(self.gibson, ttl=0.01, max_misses=2)
+        for key in (b'test:n1', b'test:n2', b'test:n3'):
+            await gibson.get(key)
+        self.assertEqual(list(gibson._misses), [b'test:n2', b'test:n3'])
+        await asyncio.sleep(0.02)
+        await self.gibson.set(b'test:n3', b'bar')
+        self.assertEqual(await gibson.get(b'test:n3'), b'bar')
+
+    @run_until_complete
+    async def test_bloom(self):
+        await self.gibson.set(b'test:bloom:1', b'one')
+        gibson = NegativeCache(self.gibson, ttl=0, bloom_prefix=b'test:bloom:',
+                               rebuild_interval=0.05)
+        gibson.start()
+        await asyncio.sleep(0.01)
+        self.assertEqual(gibson.bloom.count, 1)
+        self.assertEqual(await gibson.get(b'test:bloom:1'), b'one')
+        self.assertIsNone(await gibson.get(b'test:bloom:2'))
+        self.assertEqual(gibson.counters['bloom_skips'], 1)
+        # keys outside of prefix always go to the server
+        self.assertIsNone(await gibson.get(b'test:other'))
+        self.assertEqual(gibson.counters['bloom_skips'], 1)
+
+        await gibson.set(b'test:bloom:2', b'two')
+        self.assertEqual(await gibson.get(b'test:bloom:2'), b'two')
+        # key created by other client is seen after rebuild
+        await self.gibson.set(b'test:bloom:3', b'three')
+        await asyncio.sleep(0.1)
+        self.assertEqual(await gibson.get(b'test:bloom:3'), b'three')
+        self.assertGreaterEqual(gibson.counters['rebuilds'], 2)
+
+        await self.gibson.delete(b'test:bloom:1')
+        self.assertIsNone(await gibson.get(b'test:bloom:1'))
+        self.assertEqual(gibson.counters['false_positives'], 1)
+        gibson.close()
+        await gibson.wait_closed()
+        self.assertIsNone(gibson.bloom)
+        self.assertTrue(gibson.closed)
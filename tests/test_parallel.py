@@ -0,0 +1,94 @@
+import asyncio
+import concurrent.futures
+import operator
+
+from ._testutil import GibsonTest, run_until_complete
+from aiogibson.parallel import split_prefix, iter_parallel, reduce_parallel
+
+
+def _value_bytes(page):
+    return sum(len(value) for key, value in page)
+
+
+def _keys(page):
+    return set(page)
+
+
+class ParallelScanTest(GibsonTest):
+
+    async def _fill(self, count=300):
+        keys = [b'test:par:' + '{:04d}'.format(i).encode('ascii')
+                for i in range(count)]
+        await asyncio.gather(*[self.gibson.set(key, key) for key in keys])
+        # key equal to prefix of other keys
+        await self.gibson.set(b'test:par:01', b'x')
+        return keys + [b'test:par:01']
+
+    @run_until_complete
+    async def test_split_prefix(self):
+        keys = await self._fill()
+        parts = await split_prefix(self.gibson, b'test:par:', 8)
+        self.assertGreaterEqual(len(parts), 8)
+        self.assertIn((b'test:par:01', True), parts)
+        covered = [key for key in keys for prefix, exact in parts
+                   if key == prefix or not exact and key.startswith(prefix)]
+        self.assertEqual(sorted(covered), sorted(keys))
+        self.assertEqual(await split_prefix(self.gibson, b'test:none:'), [])
+        self.assertEqual(await split_prefix(self.gibson, b'test:par:0001'),
+                         [(b'test:par:0001', False)])
+
+    @run_until_complete
+    async def test_iter_parallel(self):
+        keys = await self._fill()
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            pages = [page async for page in iter_parallel(
+                self.gibson_socket, b'test:par:', page_size=50,
+                executor=executor)]
+            self.assertEqual(sorted(key for page in pages
+                                    for key, _ in page), sorted(keys))
+            found = set()
+            async for page in iter_parallel(
+                    self.gibson_socket, b'test:par:', _keys,
+                    keys_only=True, executor=executor):
+                found |= page
+            self.assertEqual(found, set(keys))
+
+    @run_until_complete
+    async def test_iter_parallel_streaming(self):
+        keys = await self._fill()
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            # workers wait for every page to be consumed
+            pages = iter_parallel(self.gibson_socket, b'test:par:',
+                                  page_size=10, executor=executor,
+                                  queue_size=1)
+            found = []
+            async for page in pages:
+                self.assertLessEqual(len(page), 10)
+                found.extend(key for key, _ in page)
+            self.assertEqual(sorted(found), sorted(keys))
+
+            pages = iter_parallel(self.gibson_socket, b'test:par:',
+                                  page_size=10, executor=executor,
+                                  queue_size=1)
+            async for page in pages:
+                break
+            await pages.aclose()
+            # blocked workers are released
+            found = set()
+            async for page in iter_parallel(
+                    self.gibson_socket, b'test:par:', _keys,
+                    keys_only=True, executor=executor):
+                found |= page
+            self.assertEqual(found, set(keys))
+
+    @run_until_complete
+    async def test_reduce_parallel(self):
+        keys = await self._fill()
+        total = await reduce_parallel(
+            self.gibson_socket, b'test:par:', _value_bytes, operator.add,
+            processes=2, page_size=64)
+        self.assertEqual(total, sum(len(key) for key in keys) - 10)
+        total = await reduce_parallel(
+            self.gibson_socket, b'test:none:', _value_bytes, operator.add,
+            0, processes=2)
+        self.assertEqual(total, 0)
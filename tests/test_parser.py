@@ -1,6 +1,6 @@
 import unittest
-from aiogibson import errors
-from aiogibson.parser import Reader, encode_command
+from aiogibson import consts, errors
+from aiogibson.parser import Reader, encode_command, encode_reply
 
 
 class ParserTest(unittest.TestCase):
@@ -117,3 +117,17 @@ class ParserTest(unittest.TestCase):
 
         with self.assertRaises(TypeError):
             encode_command(b'set', b'3600', b'foo', object())
+
+    def test_encode_reply(self):
+        res = encode_reply(consts.REPL_VAL, b'bar')
+        self.assertEqual(res, b'\x06\x00\x00\x03\x00\x00\x00bar')
+        res = encode_reply(consts.REPL_VAL, 77)
+        self.assertEqual(res, b'\x06\x00\x02\x08\x00\x00\x00M'
+                              b'\x00\x00\x00\x00\x00\x00\x00')
+        res = encode_reply(consts.REPL_ERR_NOT_FOUND)
+        self.assertEqual(res, b'\x01\x00\x00\x01\x00\x00\x00\x00')
+
+        parser = Reader()
+        parser.feed(encode_reply(consts.REPL_KVAL, [(b'foo', b'bar'),
+                                                    (b'zap', -1)]))
+        self.assertEqual(parser.gets(), [b'foo', b'bar', b'zap', -1])
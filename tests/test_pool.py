@@ -16,173 +16,182 @@ class PoolTest(BaseTest):
         self.assertEqual(pool.freesize, 10)
 
     @run_until_complete
-    def test_connect(self):
-        pool = yield from create_pool(self.gibson_socket, loop=self.loop)
+    async def test_connect(self):
+        pool = await create_pool(self.gibson_socket)
         self._assert_defaults(pool)
-        yield from pool.clear()
+        await pool.clear()
 
     @run_until_complete
-    def test_global_loop(self):
-        asyncio.set_event_loop(self.loop)
-        pool = yield from create_pool(self.gibson_socket)
+    async def test_clear(self):
+        pool = await create_pool(
+            self.gibson_socket)
         self._assert_defaults(pool)
-        yield from pool.clear()
 
-    @run_until_complete
-    def test_clear(self):
-        pool = yield from create_pool(
-            self.gibson_socket, loop=self.loop)
-        self._assert_defaults(pool)
-
-        yield from pool.clear()
+        await pool.clear()
         self.assertEqual(pool.freesize, 0)
 
     @run_until_complete
-    def test_no_yield_from(self):
-        pool = yield from create_pool(
-            self.gibson_socket, loop=self.loop)
+    async def test_no_yield_from(self):
+        pool = await create_pool(
+            self.gibson_socket)
 
         with self.assertRaises(RuntimeError):
             with pool:
                 pass
-        yield from pool.clear()
+        await pool.clear()
 
     @run_until_complete
-    def test_simple_command(self):
-        pool = yield from create_pool(
+    async def test_simple_command(self):
+        pool = await create_pool(
             self.gibson_socket,
-            minsize=10, loop=self.loop)
+            minsize=10)
 
-        with (yield from pool) as conn:
-            msg = yield from conn.ping()
+        async with pool.acquire() as conn:
+            msg = await conn.ping()
             self.assertTrue(msg)
             self.assertEqual(pool.size, 10)
             self.assertEqual(pool.freesize, 9)
         self.assertEqual(pool.size, 10)
         self.assertEqual(pool.freesize, 10)
-        yield from pool.clear()
+        await pool.clear()
 
     @run_until_complete
-    def test_simple_without_context_manager(self):
-        pool = yield from create_pool(
+    async def test_simple_without_context_manager(self):
+        pool = await create_pool(
             self.gibson_socket,
-            minsize=10, loop=self.loop)
+            minsize=10)
 
-        msg = yield from pool.ping()
+        msg = await pool.ping()
         self.assertTrue(msg)
-        yield from pool.set(b'foo', b'bar', 7)
-        result = yield from pool.get(b'foo')
+        await pool.set(b'foo', b'bar', 7)
+        result = await pool.get(b'foo')
         self.assertEqual(result, b'bar')
-        resp = yield from pool.delete(b'foo')
+        resp = await pool.delete(b'foo')
         self.assertTrue(resp)
 
         with self.assertRaises(AttributeError):
-            yield from pool.zadd(b'foo')
+            await pool.zadd(b'foo')
 
         self.assertEqual(pool.size, 10)
         self.assertEqual(pool.freesize, 10)
-        yield from pool.clear()
+        await pool.clear()
 
     @run_until_complete
-    def test_create_new(self):
-        pool = yield from create_pool(
+    async def test_create_new(self):
+        pool = await create_pool(
             self.gibson_socket,
-            minsize=1, loop=self.loop)
+            minsize=1)
         self.assertEqual(pool.size, 1)
         self.assertEqual(pool.freesize, 1)
 
-        with (yield from pool):
+        async with pool.acquire():
             self.assertEqual(pool.size, 1)
             self.assertEqual(pool.freesize, 0)
 
-            with (yield from pool):
+            async with pool.acquire():
                 self.assertEqual(pool.size, 2)
                 self.assertEqual(pool.freesize, 0)
 
         self.assertEqual(pool.size, 2)
         self.assertEqual(pool.freesize, 2)
-        yield from pool.clear()
+        await pool.clear()
 
     @run_until_complete
-    def test_create_constraints(self):
-        pool = yield from create_pool(
+    async def test_create_constraints(self):
+        pool = await create_pool(
             self.gibson_socket,
-            minsize=1, maxsize=1, loop=self.loop)
+            minsize=1, maxsize=1)
         self.assertEqual(pool.size, 1)
         self.assertEqual(pool.freesize, 1)
 
-        with (yield from pool):
+        async with pool.acquire():
             self.assertEqual(pool.size, 1)
             self.assertEqual(pool.freesize, 0)
 
             with self.assertRaises(asyncio.TimeoutError):
-                yield from asyncio.wait_for(pool.acquire(),
-                                            timeout=0.2,
-                                            loop=self.loop)
-        yield from pool.clear()
+                await asyncio.wait_for(pool.acquire(),
+                                       timeout=0.2)
+        await pool.clear()
 
     @run_until_complete
-    def test_create_no_minsize(self):
-        pool = yield from create_pool(
+    async def test_create_no_minsize(self):
+        pool = await create_pool(
             self.gibson_socket,
-            minsize=0, maxsize=1, loop=self.loop)
+            minsize=0, maxsize=1)
         self.assertEqual(pool.size, 0)
         self.assertEqual(pool.freesize, 0)
 
-        with (yield from pool):
+        async with pool.acquire():
             self.assertEqual(pool.size, 1)
             self.assertEqual(pool.freesize, 0)
 
-            with (yield from pool):
+            async with pool.acquire():
                 self.assertEqual(pool.size, 2)
                 self.assertEqual(pool.freesize, 0)
         self.assertEqual(pool.size, 1)
         self.assertEqual(pool.freesize, 1)
-        yield from pool.clear()
+        await pool.clear()
 
     @run_until_complete
-    def test_release_closed(self):
-        pool = yield from create_pool(
+    async def test_release_closed(self):
+        pool = await create_pool(
             self.gibson_socket,
-            minsize=1, loop=self.loop)
+            minsize=1)
         self.assertEqual(pool.size, 1)
         self.assertEqual(pool.freesize, 1)
 
-        with (yield from pool) as gibson:
+        async with pool.acquire() as gibson:
             gibson.close()
-            yield from gibson.wait_closed()
+            await gibson.wait_closed()
         self.assertEqual(pool.size, 0)
         self.assertEqual(pool.freesize, 0)
-        yield from pool.clear()
+        await pool.clear()
 
     @run_until_complete
-    def test_release_bad_connection(self):
-        pool = yield from create_pool(
-            self.gibson_socket,
-            loop=self.loop)
-        conn = yield from pool.acquire()
-        other_conn = yield from create_gibson(
-            self.gibson_socket,
-            loop=self.loop)
+    async def test_release_bad_connection(self):
+        pool = await create_pool(
+            self.gibson_socket)
+        conn = await pool.acquire()
+        other_conn = await create_gibson(
+            self.gibson_socket)
         with self.assertRaises(AssertionError):
             pool.release(other_conn)
 
-        yield from pool.clear()
+        await pool.clear()
         conn.close()
-        yield from conn.wait_closed()
+        await conn.wait_closed()
         other_conn.close()
-        yield from other_conn.wait_closed()
+        await other_conn.wait_closed()
 
     @run_until_complete
-    def test_response_decoding(self):
-        pool = yield from create_pool(
+    async def test_response_decoding(self):
+        pool = await create_pool(
             self.gibson_socket,
-            encoding='utf-8', loop=self.loop)
+            encoding='utf-8')
 
         self.assertEqual(pool.encoding, 'utf-8')
-        with (yield from pool) as gibson:
-            yield from gibson.set('key', 'value')
-        with (yield from pool) as gibson:
-            res = yield from gibson.get('key')
+        async with pool.acquire() as gibson:
+            await gibson.set('key', 'value')
+        async with pool.acquire() as gibson:
+            res = await gibson.get('key')
             self.assertEqual(res, 'value')
-        yield from pool.clear()
+        await pool.clear()
+
+    @run_until_complete
+    async def test_iter_prefix(self):
+        pool = await create_pool(self.gibson_socket, minsize=1, maxsize=1)
+        keys = ['test:pit:{:03d}'.format(i).encode('ascii')
+                for i in range(50)]
+        for key in keys:
+            await pool.set(key, key)
+        it = pool.iter_prefix(b'test:pit:', page_size=7)
+        items = []
+        async for item in it:
+            items.append(item)
+            # connection is back in the pool between pages
+            self.assertEqual(pool.freesize, 1)
+        self.assertEqual(items, [(key, key) for key in keys])
+        res = [key async for key in pool.iter_keys(b'test:pit:', 7)]
+        self.assertEqual(res, keys)
+        await pool.mdelete(b'test:pit:')
+        await pool.clear()
@@ -0,0 +1,103 @@
+import io
+import json
+import os
+import sys
+import tempfile
+
+from ._testutil import GibsonTest, run_until_complete
+from aiogibson import consts, create_gibson
+from aiogibson.record import Recorder, read_log, replay, main
+from aiogibson.tracing import MultiTracer, LatencyHistogram
+
+
+class RecordTest(GibsonTest):
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(tempfile.mkdtemp(), 'gibson.rec')
+
+    @run_until_complete
+    async def test_record_replay(self):
+        recorder = Recorder(self.path, buffer_size=64)
+        histogram = LatencyHistogram()
+        gibson = await create_gibson(
+            self.gibson_socket, tracer=MultiTracer(recorder, histogram))
+        await gibson.set(b'test:record:1', b'foo bar', 100)
+        await gibson.get(b'test:record:1')
+        await gibson.ping()
+        await gibson.end()
+        recorder.close()
+        self.assertTrue(recorder.closed)
+        self.assertEqual(recorder.recorded, 4)
+        self.assertEqual(histogram.count(b'get'), 1)
+
+        records = list(read_log(self.path))
+        self.assertEqual([op_code for _, op_code, _ in records],
+                         [consts.OP_SET, consts.OP_GET, consts.OP_PING,
+                          consts.OP_END])
+        self.assertEqual(records[0][2], b'100 test:record:1 foo bar')
+        self.assertEqual(records[2][2], b'')
+        timestamps = [timestamp for timestamp, _, _ in records]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+        await self.gibson.delete(b'test:record:1')
+        res = await replay(self.path, self.gibson_socket, speed=0,
+                           connections=2)
+        self.assertEqual(res['commands'], 3)
+        self.assertEqual(res['errors'], 0)
+        self.assertEqual(sorted(res['latency']), ['get', 'ping', 'set'])
+        value = await self.gibson.get(b'test:record:1')
+        self.assertEqual(value, b'foo bar')
+
+    @run_until_complete
+    async def test_replay_speed(self):
+        recorder = Recorder(self.path)
+        recorder.on_send(consts.OP_PING, b'\x02\x00\x00\x00\x13\x00', 0)
+        recorder._started -= 0.2
+        recorder.on_send(consts.OP_INC, b'\x0f\x00\x00\x00\x04\x00'
+                         b'test:record', 0)
+        recorder.close()
+
+        started = self.loop.time()
+        res = await replay(self.path, self.gibson_socket, speed=2)
+        self.assertTrue(self.loop.time() - started >= 0.1)
+        self.assertEqual(res['commands'], 2)
+        # inc of missing key is not an error
+        self.assertEqual(res['errors'], 0)
+
+    def test_sample_and_limit(self):
+        recorder = Recorder(self.path, sample=0)
+        recorder.on_send(consts.OP_PING, b'\x02\x00\x00\x00\x13\x00', 0)
+        self.assertEqual(recorder.recorded, 0)
+        recorder.close()
+        self.assertEqual(list(read_log(self.path)), [])
+
+        recorder = Recorder(self.path, max_bytes=8 + 2 * 14)
+        for _ in range(3):
+            recorder.on_send(consts.OP_PING, b'\x02\x00\x00\x00\x13\x00', 0)
+        recorder.close()
+        self.assertEqual(recorder.recorded, 2)
+        self.assertEqual(recorder.dropped, 1)
+        self.assertEqual(len(list(read_log(self.path))), 2)
+        self.assertEqual(os.path.getsize(self.path), 8 + 2 * 14)
+
+        # truncated log yields only complete records
+        with open(self.path, 'r+b') as f:
+            f.truncate(8 + 14 + 5)
+        self.assertEqual(len(list(read_log(self.path))), 1)
+        with open(self.path, 'wb') as f:
+            f.write(b'garbage')
+        with self.assertRaises(ValueError):
+            list(read_log(self.path))
+
+    def test_info(self):
+        recorder = Recorder(self.path)
+        recorder.on_send(consts.OP_GET, b'\x05\x00\x00\x00\x03\x00foo', 0)
+        recorder.close()
+        out, sys.stdout = sys.stdout, io.StringIO()
+        try:
+            main(['info', self.path])
+            res = json.loads(sys.stdout.getvalue())
+        finally:
+            sys.stdout = out
+        self.assertEqual(res['commands'], {'get': {'count': 1, 'bytes': 3}})
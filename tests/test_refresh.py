@@ -0,0 +1,72 @@
+import asyncio
+
+from ._testutil import GibsonTest, run_until_complete
+from aiogibson import create_pool
+from aiogibson.refresh import Refresher
+
+
+class RefresherTest(GibsonTest):
+
+    @run_until_complete
+    async def test_check(self):
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            return b'fresh'
+
+        refresher = Refresher(self.gibson, threshold=5)
+        refresher.register(b'test:refresh:missing', loader, 10)
+        refresher.register(b'test:refresh:expiring', loader, 10)
+        refresher.register(b'test:refresh:alive', loader, 10)
+        refresher.register(b'test:refresh:forever', loader, 10)
+        self.assertEqual(len(refresher.keys), 4)
+        await self.gibson.set(b'test:refresh:expiring', b'old', 2)
+        await self.gibson.set(b'test:refresh:alive', b'old', 100)
+        await self.gibson.set(b'test:refresh:forever', b'old')
+
+        res = await refresher.check()
+        self.assertEqual(sorted(res), [b'test:refresh:expiring',
+                                       b'test:refresh:missing'])
+        await refresher.wait_pending()
+        self.assertEqual(calls, [1, 1])
+
+        res = await self.gibson.mget(b'test:refresh:')
+        self.assertEqual(res, [b'test:refresh:alive', b'old',
+                               b'test:refresh:expiring', b'fresh',
+                               b'test:refresh:forever', b'old',
+                               b'test:refresh:missing', b'fresh'])
+        res = await self.gibson.meta_ttl(b'test:refresh:missing')
+        self.assertEqual(res, 10)
+
+        refresher.unregister(b'test:refresh:alive')
+        self.assertEqual(len(refresher.keys), 3)
+        with self.assertRaises(TypeError):
+            refresher.register(b'test:refresh:bad', loader, expire='one')
+        refresher.close()
+        await refresher.wait_closed()
+
+    @run_until_complete
+    async def test_background(self):
+        pool = await create_pool(self.gibson_socket, minsize=2)
+        refresher = Refresher(pool, interval=0.01, concurrency=1)
+
+        async def loader():
+            return b'value'
+
+        async def failing():
+            raise ValueError('boom')
+
+        refresher.register(b'test:refresh:bg', loader, 10)
+        refresher.register(b'test:refresh:fail', failing, 10)
+        refresher.start()
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            res = await pool.get(b'test:refresh:bg')
+            if res is not None:
+                break
+        self.assertEqual(res, b'value')
+        refresher.close()
+        await refresher.wait_closed()
+        self.assertTrue(refresher.closed)
+        await pool.clear()
@@ -0,0 +1,68 @@
+from ._testutil import GibsonTest, run_until_complete
+
+
+class PrefixIteratorTest(GibsonTest):
+
+    async def _populate(self):
+        keys = [b'test:scan:' + '{:03d}'.format(i).encode('ascii')
+                for i in range(150)]
+        keys.append(b'test:scan:0')
+        keys.append(b'test:scan:')
+        for key in keys:
+            await self.gibson.set(key, b'v' + key, 10)
+        return sorted(keys)
+
+    @run_until_complete
+    async def test_iter_prefix(self):
+        keys = await self._populate()
+        it = self.gibson.iter_prefix(b'test:scan:', page_size=20)
+        pages = []
+        while True:
+            page = await it.next_page()
+            if page is None:
+                break
+            self.assertTrue(0 < len(page) <= 20)
+            pages.extend(page)
+        self.assertEqual(pages, [(key, b'v' + key) for key in keys])
+
+        it = self.gibson.iter_prefix(b'test:scan:01', page_size=3)
+        res = await it.__anext__()
+        self.assertEqual(res, (b'test:scan:010', b'vtest:scan:010'))
+
+        res = await self.gibson.iter_prefix(b'test:nope').next_page()
+        self.assertEqual(res, None)
+        with self.assertRaises(TypeError):
+            self.gibson.iter_prefix(b'test:scan', page_size='one')
+        with self.assertRaises(ValueError):
+            self.gibson.iter_prefix(b'test:scan', page_size=0)
+
+    @run_until_complete
+    async def test_iter_prefix_max_bytes(self):
+        await self._populate()
+        it = self.gibson.iter_prefix(b'test:scan:', page_size=100,
+                                     max_bytes=250)
+        self.assertEqual(it.budget, 100)
+        total = 0
+        while True:
+            page = await it.next_page()
+            if page is None:
+                break
+            total += len(page)
+        self.assertEqual(total, 152)
+        self.assertTrue(it.budget <= 10)
+
+    @run_until_complete
+    async def test_iter_keys(self):
+        keys = await self._populate()
+        it = self.gibson.iter_keys('test:scan:', page_size=7)
+        res = []
+        while True:
+            page = await it.next_page()
+            if page is None:
+                break
+            self.assertTrue(len(page) <= 7)
+            res.extend(page)
+        self.assertEqual(res, keys)
+
+        res = await self.gibson.keys(b'test:nope')
+        self.assertEqual(res, None)
@@ -0,0 +1,143 @@
+import os
+import tempfile
+import unittest
+
+from ._testutil import BaseTest, run_until_complete
+from aiogibson import consts, errors, create_gibson
+from aiogibson.parser import Reader
+from aiogibson.server import create_server, Keyspace, _Item
+
+
+class KeyspaceTest(unittest.TestCase):
+
+    def test_prefix(self):
+        keyspace = Keyspace()
+        for key in (b'foo', b'foo:2', b'foo:1', b'fob', b'bar'):
+            keyspace.put(key, _Item(key, consts.GB_ENC_PLAIN, 0, 100))
+        self.assertEqual(len(keyspace), 5)
+        self.assertEqual(keyspace.memory, 19)
+        self.assertEqual([key for key, _ in keyspace.prefix(b'fo', 100)],
+                         [b'fob', b'foo', b'foo:1', b'foo:2'])
+        self.assertEqual(len(keyspace.prefix(b'foo', 100, limit=2)), 2)
+        self.assertEqual(keyspace.prefix(b'baz', 100), [])
+
+        self.assertTrue(keyspace.delete(b'foo:1'))
+        self.assertFalse(keyspace.delete(b'foo:1'))
+        self.assertFalse(keyspace.delete(b'fo'))
+        self.assertEqual(len(keyspace), 4)
+        self.assertEqual(keyspace.memory, 14)
+        # empty branches are pruned
+        self.assertEqual(keyspace._node(b'foo:1'), None)
+        self.assertNotEqual(keyspace._node(b'foo:'), None)
+
+    def test_expire(self):
+        keyspace = Keyspace()
+        keyspace.put(b'foo', _Item(b'bar', consts.GB_ENC_PLAIN, 10, 100))
+        keyspace.put(b'foo:1', _Item(b'bar', consts.GB_ENC_PLAIN, 20, 100))
+        self.assertEqual(keyspace.get(b'foo', 109).value, b'bar')
+        self.assertEqual(keyspace.get(b'foo', 110), None)
+        self.assertEqual(len(keyspace), 1)
+        self.assertEqual(keyspace.prefix(b'foo', 120), [])
+        self.assertEqual(len(keyspace), 0)
+        self.assertEqual(keyspace.memory, 0)
+
+
+class ServerTest(BaseTest):
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(tempfile.mkdtemp(), 'gibson.sock')
+        self.server = self.gibson = None
+
+    def tearDown(self):
+        if self.gibson is not None:
+            self.gibson.close()
+            self.loop.run_until_complete(self.gibson.wait_closed())
+        if self.server is not None:
+            self.server.close()
+            self.loop.run_until_complete(self.server.wait_closed())
+        super().tearDown()
+
+    async def _create(self, **kw):
+        self.server = await create_server(self.path, **kw)
+        self.gibson = await create_gibson(self.path)
+        return self.server, self.gibson
+
+    @run_until_complete
+    async def test_commands(self):
+        server, gibson = await self._create()
+        self.assertEqual(server.address, self.path)
+        self.assertTrue((await gibson.set(b'foo:1', b'bar')))
+        await gibson.set(b'foo:2', 10, 100)
+        self.assertEqual((await gibson.inc(b'foo:2')), 11)
+        self.assertEqual((await gibson.mget(b'foo')),
+                         [b'foo:1', b'bar', b'foo:2', 11])
+        self.assertEqual((await gibson.keys(b'foo')),
+                         [b'foo:1', b'foo:2'])
+        self.assertEqual((await gibson.meta_ttl(b'foo:2')), 100)
+        self.assertEqual((await gibson.meta_encoding(b'foo:2')),
+                         consts.GB_ENC_NUMBER)
+        with self.assertRaises(errors.ExpectedANumber):
+            await gibson.inc(b'foo:1')
+
+        await gibson.lock(b'foo:1', 10)
+        with self.assertRaises(errors.KeyLockedError):
+            await gibson.set(b'foo:1', b'zap')
+        self.assertEqual((await gibson.mdelete(b'foo')), 1)
+        await gibson.unlock(b'foo:1')
+        self.assertEqual((await gibson.count(b'foo')), 1)
+        self.assertEqual(len(server.keyspace), 1)
+
+        stats = await gibson.stats()
+        stats = dict(zip(stats[::2], stats[1::2]))
+        self.assertEqual(stats[b'total_items'], 1)
+        self.assertEqual(stats[b'total_connections'], 1)
+
+        # end reply is sent before server closes connection
+        self.assertTrue((await gibson.end()))
+        self.assertTrue(gibson.closed)
+
+    @run_until_complete
+    async def test_tcp(self):
+        server = await create_server(('127.0.0.1', 0))
+        host, port = server.address
+        gibson = await create_gibson((host, port))
+        self.assertTrue((await gibson.ping()))
+        gibson.close()
+        server.close()
+        await server.wait_closed()
+
+    @run_until_complete
+    async def test_injected_errors(self):
+        server, gibson = await self._create(error_rate=1)
+        with self.assertRaises(errors.GibsonServerError):
+            await gibson.ping()
+        server.error_rate = 0
+        self.assertTrue((await gibson.ping()))
+
+    @run_until_complete
+    async def test_injected_latency(self):
+        server, gibson = await self._create(latency=0.05)
+        started = self.loop.time()
+        await gibson.ping()
+        self.assertTrue(self.loop.time() - started >= 0.05)
+
+    @run_until_complete
+    async def test_max_memory(self):
+        server, gibson = await self._create(max_memory=10)
+        await gibson.set(b'foo', b'x' * 10)
+        with self.assertRaises(errors.MemoryLimitError):
+            await gibson.set(b'bar', b'x')
+
+    def test_dispatch(self):
+        server = self.loop.run_until_complete(
+            create_server(self.path))
+        reader = Reader()
+        reader.feed(server.dispatch(consts.OP_SET, b'0 foo bar'))
+        reader.feed(server.dispatch(consts.OP_SET, b'zap'))
+        reader.feed(server.dispatch(0x42, b''))
+        self.assertEqual(reader.gets(), b'bar')
+        self.assertIsInstance(reader.gets(), errors.GibsonServerError)
+        self.assertIsInstance(reader.gets(), errors.GibsonServerError)
+        server.close()
+        self.loop.run_until_complete(server.wait_closed())
@@ -0,0 +1,173 @@
+import os
+import struct
+import tempfile
+import time
+
+from ._testutil import GibsonTest, run_until_complete
+from aiogibson import consts
+from aiogibson.pool import create_pool
+from aiogibson.scan import PrefixIterator
+from aiogibson.snapshot import dump, restore, Snapshot, HEADER
+
+
+class _ReversedMget:
+    # server free to return mget items in any order
+
+    def __init__(self, gibson):
+        self._gibson = gibson
+
+    async def mget(self, prefix, limit=None):
+        resp = await self._gibson.mget(prefix, limit)
+        if resp is None:
+            return None
+        pairs = list(zip(resp[::2], resp[1::2]))[::-1]
+        return [item for pair in pairs for item in pair]
+
+    def iter_prefix(self, prefix, page_size=1000):
+        return PrefixIterator(self, prefix, page_size=page_size)
+
+    def __getattr__(self, method):
+        return getattr(self._gibson, method)
+
+
+class SnapshotTest(GibsonTest):
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(tempfile.mkdtemp(), 'gibson.snap')
+
+    @run_until_complete
+    async def test_dump_restore(self):
+        for i in range(50):
+            key = 'test:snap:{:02d}'.format(i).encode('ascii')
+            await self.gibson.set(key, b'value' * i, 100 if i % 2 else 0)
+        await self.gibson.set(b'test:snap:num', 7)
+        await self.gibson.inc(b'test:snap:num')
+
+        for compress in (False, True):
+            count = await dump(self.gibson, self.path, b'test:snap:',
+                               compress=compress, block_size=500,
+                               page_size=16)
+            self.assertEqual(count, 51)
+            with Snapshot(self.path) as snapshot:
+                self.assertEqual(snapshot.compressed, compress)
+                self.assertEqual(len(snapshot), 51)
+                self.assertTrue(len(snapshot.blocks) > 5)
+                records = list(snapshot)
+                self.assertEqual(records[1][:2], (b'test:snap:01', b'value'))
+                self.assertTrue(99 <= records[1][2] <= 100)
+                self.assertEqual(records[2][2:], (-1, consts.GB_ENC_PLAIN))
+                self.assertEqual(records[-1], (b'test:snap:num', b'8', -1,
+                                               consts.GB_ENC_NUMBER))
+                keys = [key for key, _, _, _ in records]
+                self.assertEqual(keys, sorted(keys))
+
+        await self.gibson.mdelete(b'test:snap:')
+        pool = await create_pool(self.gibson_socket, minsize=3,
+                                 maxsize=3)
+        count = await restore(pool, self.path, connections=3,
+                              pipeline=7)
+        await pool.clear()
+        self.assertEqual(count, 51)
+        res = await self.gibson.get(b'test:snap:10')
+        self.assertEqual(res, b'value' * 10)
+        res = await self.gibson.meta_ttl(b'test:snap:11')
+        self.assertTrue(99 <= res <= 100)
+        res = await self.gibson.meta_ttl(b'test:snap:12')
+        self.assertEqual(res, -1)
+        # counter is restored as number
+        res = await self.gibson.get(b'test:snap:num')
+        self.assertEqual(res, 8)
+        res = await self.gibson.meta_encoding(b'test:snap:num')
+        self.assertEqual(res, consts.GB_ENC_NUMBER)
+        res = await self.gibson.inc(b'test:snap:num')
+        self.assertEqual(res, 9)
+
+    @run_until_complete
+    async def test_dump_pool(self):
+        for i in range(30):
+            key = 'test:snap:{:02d}'.format(i).encode('ascii')
+            await self.gibson.set(key, key)
+        pool = await create_pool(self.gibson_socket, minsize=1, maxsize=2)
+        try:
+            count = await dump(pool, self.path, b'test:snap:', page_size=8)
+        finally:
+            await pool.clear()
+        self.assertEqual(count, 30)
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual([key for key, _, _, _ in snapshot],
+                             ['test:snap:{:02d}'.format(i).encode('ascii')
+                              for i in range(30)])
+
+    @run_until_complete
+    async def test_dump_unsorted_pages(self):
+        for i in range(40):
+            key = 'test:snap:{:02d}'.format(i).encode('ascii')
+            await self.gibson.set(key, b'x' * 40)
+        gibson = _ReversedMget(self.gibson)
+        await dump(gibson, self.path, b'test:snap:', block_size=100,
+                   page_size=10)
+        with Snapshot(self.path) as snapshot:
+            keys = [key for key, _, _, _ in snapshot]
+            self.assertEqual(keys, sorted(keys))
+            blocks = snapshot.blocks_for_prefix(b'test:snap:3')
+            keys = [key for block in blocks
+                    for key, _, _, _ in snapshot.records(block,
+                                                         b'test:snap:3')]
+            self.assertEqual(len(keys), 10)
+
+    @run_until_complete
+    async def test_restore_prefix(self):
+        for i in range(30):
+            key = 'test:{}:{:02d}'.format('ab'[i % 2], i).encode('ascii')
+            await self.gibson.set(key, b'x' * 40)
+        await dump(self.gibson, self.path, b'test:', block_size=100)
+        await self.gibson.mdelete(b'test:')
+
+        with Snapshot(self.path) as snapshot:
+            blocks = snapshot.blocks_for_prefix(b'test:b:')
+            self.assertTrue(0 < len(blocks) < len(snapshot.blocks))
+            self.assertEqual(snapshot.blocks_for_prefix(b'zzz'),
+                             snapshot.blocks[-1:])
+            self.assertEqual(snapshot.blocks_for_prefix(b''),
+                             snapshot.blocks)
+
+        started = self.loop.time()
+        count = await restore(self.gibson, self.path, b'test:b:',
+                              pipeline=5, rate=100)
+        self.assertEqual(count, 15)
+        # first batch is sent immediately, the rest is rate limited
+        self.assertTrue(self.loop.time() - started >= 0.09)
+        res = await self.gibson.count(b'test:')
+        self.assertEqual(res, 15)
+
+    @run_until_complete
+    async def test_restore_expired_and_locked(self):
+        await self.gibson.set(b'test:snap:short', b'foo', 10)
+        await self.gibson.set(b'test:snap:long', b'bar', 1000)
+        await self.gibson.set(b'test:snap:locked', b'zap')
+        await dump(self.gibson, self.path, b'test:snap:')
+        await self.gibson.lock(b'test:snap:locked', 10)
+        await self.gibson.delete(b'test:snap:short')
+
+        # pretend snapshot was taken a minute ago
+        with open(self.path, 'r+b') as f:
+            f.write(HEADER.pack(b'AGBSNP\x00\x01', 0, time.time() - 60))
+        count = await restore(self.gibson, self.path)
+        self.assertEqual(count, 1)
+        res = await self.gibson.get(b'test:snap:short')
+        self.assertEqual(res, None)
+        res = await self.gibson.meta_ttl(b'test:snap:long')
+        self.assertTrue(res <= 940)
+        await self.gibson.unlock(b'test:snap:locked')
+
+    def test_invalid(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'garbage')
+        with self.assertRaises(ValueError):
+            Snapshot(self.path)
+        with open(self.path, 'wb') as f:
+            f.write(HEADER.pack(b'AGBSNP\x00\x01', 0, 0) +
+                    struct.pack('<QI8s', 0, 0, b'NOTMAGIC'))
+        with self.assertRaises(ValueError):
+            Snapshot(self.path)
@@ -0,0 +1,66 @@
+import asyncio
+
+from ._testutil import GibsonTest, run_until_complete
+from aiogibson.stats import Stats, StatsCollector
+
+
+class StatsTest(GibsonTest):
+
+    @run_until_complete
+    async def test_snapshot(self):
+        await self.gibson.set(b'test:stats', b'zap', 3)
+        reply = await self.gibson.stats()
+        stats = Stats.from_reply(reply)
+        self.assertIsInstance(stats.server_version, str)
+        self.assertIsInstance(stats.memory_fragmentation, float)
+        self.assertTrue(stats.total_items >= 1)
+        self.assertTrue(stats.memory_used > 0)
+        self.assertEqual(stats.raw['total_items'], stats.total_items)
+        self.assertEqual(stats.as_dict()['memory_used'], stats.memory_used)
+        self.assertTrue(repr(stats).startswith('<Stats'))
+
+        stats = Stats.from_reply([b'total_items', b'zap', b'custom', 1])
+        self.assertEqual(stats.total_items, None)
+        self.assertEqual(stats.memory_used, None)
+        self.assertEqual(stats.raw['custom'], 1)
+
+    @run_until_complete
+    async def test_collector(self):
+        collector = StatsCollector.shared(self.gibson, interval=0.01)
+        self.assertIs(StatsCollector.shared(self.gibson), collector)
+        self.assertEqual(collector.metrics(), {})
+        calls = []
+        collector.add_listener(lambda stats, rates: calls.append(rates))
+        failing = lambda stats, rates: 1 / 0  # noqa
+        collector.add_listener(failing)
+
+        await collector.poll()
+        self.assertEqual(calls, [None])
+        collector.remove_listener(failing)
+        for i in range(10):
+            await self.gibson.set(b'test:stats:' + bytes([65 + i]),
+                                  b'zap', 3)
+        await asyncio.sleep(0.01)
+        await collector.poll()
+        rates = collector.rates
+        self.assertIs(calls[1], rates)
+        self.assertTrue(rates.requests_rate > 0)
+        self.assertTrue(rates.items_rate > 0)
+        self.assertTrue(rates.memory_rate > 0)
+        metrics = collector.metrics()
+        self.assertEqual(metrics['total_items'],
+                         collector.latest.total_items)
+        self.assertEqual(metrics['requests_rate'], rates.requests_rate)
+        self.assertEqual(
+            sorted(metrics),
+            sorted(list(collector.latest.as_dict()) +
+                   ['elapsed', 'requests_rate', 'connections_rate',
+                    'items_rate', 'memory_rate', 'memory_usage']))
+
+        collector.start()
+        await asyncio.sleep(0.05)
+        self.assertTrue(len(calls) > 2)
+        collector.close()
+        await collector.wait_closed()
+        self.assertTrue(collector.closed)
+        self.assertIsNot(StatsCollector.shared(self.gibson), collector)
@@ -0,0 +1,102 @@
+import unittest
+
+from ._testutil import BaseTest, run_until_complete
+from aiogibson import create_connection, create_pool, errors
+from aiogibson.tracing import (Tracer, LatencyHistogram, SlowLog,
+                               command_name, _Histogram)
+
+
+class RecordingTracer(Tracer):
+
+    def __init__(self):
+        self.commands = []
+
+    def on_command(self, *args):
+        self.commands.append(args)
+
+
+class TracerTest(BaseTest):
+
+    @run_until_complete
+    async def test_tracer(self):
+        tracer = RecordingTracer()
+        conn = await create_connection(self.gibson_socket,
+                                       tracer=tracer)
+        self.assertIs(conn.tracer, tracer)
+        conn.execute(b'set', 10, b'test:trace', b'bar')
+        await conn.execute(b'get', b'test:trace')
+        with self.assertRaises(errors.ExpectedANumber):
+            await conn.execute(b'inc', b'test:trace')
+        await conn.execute(b'del', b'test:trace')
+
+        self.assertEqual(len(tracer.commands), 4)
+        op_code, args_size, reply_size, depth, latency, error = \
+            tracer.commands[0]
+        self.assertEqual(command_name(op_code), 'set')
+        self.assertEqual(args_size, len(b'10 test:trace bar'))
+        self.assertEqual(reply_size, 3)
+        self.assertEqual(depth, 0)
+        self.assertTrue(latency > 0)
+        self.assertEqual(error, None)
+        # get was pipelined right after set
+        self.assertEqual(tracer.commands[1][3], 1)
+        self.assertIsInstance(tracer.commands[2][5], errors.ExpectedANumber)
+        conn.close()
+        await conn.wait_closed()
+
+    @run_until_complete
+    async def test_latency_histogram(self):
+        histogram = LatencyHistogram()
+        pool = await create_pool(self.gibson_socket, minsize=2,
+                                 tracer=histogram)
+        for _ in range(20):
+            await pool.ping()
+        await pool.get(b'test:trace')
+        self.assertEqual(histogram.count(b'ping'), 20)
+        self.assertEqual(histogram.count(b'get'), 1)
+        self.assertEqual(histogram.count(b'set'), 0)
+        p50 = histogram.percentile(b'ping', 50)
+        p99 = histogram.percentile(b'ping', 99)
+        self.assertTrue(0 < p50 <= p99)
+        self.assertEqual(histogram.percentile(b'set', 50), 0)
+        summary = histogram.summary()
+        self.assertEqual(sorted(summary), ['get', 'ping'])
+        self.assertEqual(summary['ping']['count'], 20)
+        self.assertEqual(summary['ping']['p99'], p99)
+        histogram.reset()
+        self.assertEqual(histogram.summary(), {})
+        await pool.clear()
+
+    @run_until_complete
+    async def test_slow_log(self):
+        slow = SlowLog(threshold=0, maxlen=2, log=True)
+        conn = await create_connection(self.gibson_socket,
+                                       tracer=slow)
+        for _ in range(3):
+            await conn.execute(b'ping')
+        self.assertEqual(len(slow.entries), 2)
+        self.assertEqual(slow.entries[0].command, 'ping')
+
+        slow.threshold = 10
+        await conn.execute(b'get', b'test:trace')
+        self.assertEqual(slow.entries[-1].command, 'ping')
+        conn.close()
+        await conn.wait_closed()
+
+
+class HistogramTest(unittest.TestCase):
+
+    def test_precision(self):
+        histogram = _Histogram()
+        for value in range(1, 100001):
+            histogram.record(value)
+        self.assertEqual(histogram.total, 100000)
+        self.assertEqual(histogram.max, 100000)
+        for q in (1, 50, 90, 99, 99.9):
+            expected = 100000 * q / 100
+            res = histogram.percentile(q)
+            self.assertTrue(abs(res - expected) / expected < 1 / 16.,
+                            (q, res))
+        self.assertEqual(histogram.percentile(100), 100000)
+        self.assertEqual(_Histogram().percentile(50), 0)
+        self.assertEqual(command_name(0x42), '66')